@@ -0,0 +1,88 @@
+#############################################################################
+# Copyright 2016 Mass KonFuzion
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#############################################################################
+
+""" Benchmark: model-view transforms with AffineTransform vs. 4x4 Matrix
+
+    Run from the directory that contains pymkfgame:
+        python -m pymkfgame.benchmarks.bench_affine
+"""
+
+from __future__ import print_function
+
+import random
+import timeit
+
+from pymkfgame.mkfmath import vector_batch
+from pymkfgame.mkfmath.vector import Vector
+from pymkfgame.mkfmath.matrix import Matrix, mMultmat, mMultvec, mMultvecBatch
+from pymkfgame.mkfmath.affine import AffineTransform, aFromMatrix, aCompose, aApplyPoint, aApplyBatch
+
+NUM_OBJECTS = 500
+POINTS_PER_OBJECT = 8
+
+def best(func):
+    return min(timeit.repeat(func, number=1, repeat=5))
+
+def run():
+    random.seed(0)
+    matView = Matrix.matTRS((0.0, -2.0, 10.0), (0.2, 0.5, 0.0))
+    models = [ Matrix.matTRS((random.uniform(-5, 5), 0.0, random.uniform(-5, 5)), (0.0, random.uniform(0, 6.28), 0.0)) for _ in range(NUM_OBJECTS) ]
+    points = [ Vector(random.uniform(-1, 1), random.uniform(-1, 1), random.uniform(-1, 1), 1.0) for _ in range(POINTS_PER_OBJECT) ]
+
+    affView = aFromMatrix(matView)
+    affModels = [ aFromMatrix(m) for m in models ]
+
+    scratchM = Matrix()
+    scratchA = AffineTransform()
+    scratchV = Vector()
+
+    def matrixPath():
+        for m in models:
+            mMultmat(matView, m, out=scratchM)
+            for p in points:
+                mMultvec(scratchM, p, out=scratchV)
+
+    def affinePath():
+        for a in affModels:
+            aCompose(affView, a, out=scratchA)
+            for p in points:
+                aApplyPoint(scratchA, p, out=scratchV)
+
+    batch = vector_batch.VectorBatch.fromVectors(points)
+    outBatch = vector_batch.VectorBatch(POINTS_PER_OBJECT)
+
+    def matrixBatchPath():
+        for m in models:
+            mMultmat(matView, m, out=scratchM)
+            mMultvecBatch(scratchM, batch, out=outBatch)
+
+    def affineBatchPath():
+        for a in affModels:
+            aCompose(affView, a, out=scratchA)
+            aApplyBatch(scratchA, batch, out=outBatch)
+
+    print("{} objects x {} points: compose model-view, then transform the points (best of 5)".format(NUM_OBJECTS, POINTS_PER_OBJECT))
+    tMatrix = best(matrixPath)
+    tAffine = best(affinePath)
+    print("  Matrix:          mMultmat + mMultvec       {:8.3f} ms".format(tMatrix * 1000.0))
+    print("  AffineTransform: aCompose + aApplyPoint    {:8.3f} ms  ({:.0f}% less)".format(tAffine * 1000.0, 100.0 * (1.0 - tAffine / tMatrix)))
+    tMatrix = best(matrixBatchPath)
+    tAffine = best(affineBatchPath)
+    print("  Matrix:          mMultmat + mMultvecBatch  {:8.3f} ms".format(tMatrix * 1000.0))
+    print("  AffineTransform: aCompose + aApplyBatch    {:8.3f} ms  ({:.0f}% less)".format(tAffine * 1000.0, 100.0 * (1.0 - tAffine / tMatrix)))
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,106 @@
+#############################################################################
+# Copyright 2016 Mass KonFuzion
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#############################################################################
+
+""" Benchmark: memory allocations made by a physics-style tick, with and without out= scratch objects
+
+    Uses tracemalloc, so this one needs Python 3. Run from the directory that contains pymkfgame:
+        python -m pymkfgame.benchmarks.bench_alloc
+"""
+
+from __future__ import print_function
+
+import sys
+import timeit
+import tracemalloc
+
+from pymkfgame.mkfmath.vector import Vector, vAdd, vGetScaled, vCross
+from pymkfgame.mkfmath.matrix import Matrix, mMultvec, mMultmat
+
+NUM_OBJECTS = 1000
+DT = 1.0 / 60.0
+
+class _DictVector(Vector):
+    ''' A Vector subclass without __slots__, i.e. what every Vector looked like before __slots__ was added '''
+    pass
+
+def makeObjects():
+    objs = []
+    for i in range(0, NUM_OBJECTS):
+        objs.append({ 'pos': Vector(i, 0, 0, 1), 'vel': Vector(1, 2, 3), 'spin': Vector(0, 1, 0), 'angle': 0.01 * i, 'model': Vector(1, 1, 1, 1) })
+    return objs
+
+def tickAllocating(objs, results):
+    ''' One tick, written with the allocating functions. Every result is a brand new object '''
+    for o in objs:
+        o['pos'] = vAdd(o['pos'], vGetScaled(o['vel'], DT))
+        axis = vCross(o['vel'], o['spin'])
+        world = mMultmat(Matrix.matTrans(o['pos'][0], o['pos'][1], o['pos'][2]), Matrix.matRotY(o['angle']))
+        results.append(mMultvec(world, o['model']))
+        results.append(axis)
+
+def tickScratch(objs, results, scratch):
+    ''' The same tick, written with out= scratch objects. Nothing is allocated per object '''
+    tmpV, axis, matT, matR, world, xformed = scratch
+    for o in objs:
+        vAdd(o['pos'], vGetScaled(o['vel'], DT, out=tmpV), out=o['pos'])
+        vCross(o['vel'], o['spin'], out=axis)
+        mMultmat(Matrix.matTrans(o['pos'][0], o['pos'][1], o['pos'][2], out=matT), Matrix.matRotY(o['angle'], out=matR), out=world)
+        results.append(mMultvec(world, o['model'], out=xformed))
+        results.append(axis)
+
+def countAllocations(tickFunc, *args):
+    ''' Run tickFunc once under tracemalloc, and return (# of memory blocks, # of bytes) allocated by mkfmath
+
+        The tick appends its results to a list, which keeps every object the tick created alive until the
+        snapshot is taken. That way the snapshot counts every allocation, not just the ones that survive
+    '''
+    results = []
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tickFunc(*(args + (results,)))
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    mkfmathFilter = [ tracemalloc.Filter(True, "*mkfmath*") ]
+    stats = after.filter_traces(mkfmathFilter).compare_to(before.filter_traces(mkfmathFilter), 'filename')
+    return sum(s.count_diff for s in stats), sum(s.size_diff for s in stats)
+
+def run():
+    if sys.version_info < (3, 4):
+        print("bench_alloc needs tracemalloc (Python 3.4+)")
+        return
+
+    v = Vector(1, 2, 3)
+    dv = _DictVector(1, 2, 3)
+    print("Vector instance size: with __slots__ {} bytes; with __dict__ {} bytes (+{} bytes for the dict)".format(
+        sys.getsizeof(v), sys.getsizeof(dv), sys.getsizeof(dv.__dict__)))
+    print("")
+
+    objs = makeObjects()
+    scratch = (Vector(), Vector(), Matrix(), Matrix(), Matrix(), Vector())
+
+    blocks, size = countAllocations(lambda results: tickAllocating(objs, results))
+    print("{} objects, allocating functions:  {:6d} blocks, {:8d} bytes allocated per tick".format(NUM_OBJECTS, blocks, size))
+    blocks, size = countAllocations(lambda results: tickScratch(objs, results, scratch))
+    print("{} objects, out= scratch objects:  {:6d} blocks, {:8d} bytes allocated per tick".format(NUM_OBJECTS, blocks, size))
+    print("")
+
+    tAlloc = min(timeit.repeat(lambda: tickAllocating(objs, []), number=10, repeat=5)) / 10.0
+    tScratch = min(timeit.repeat(lambda: tickScratch(objs, [], scratch), number=10, repeat=5)) / 10.0
+    print("Tick time: allocating {:.3f} ms, out= scratch {:.3f} ms".format(tAlloc * 1000.0, tScratch * 1000.0))
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,158 @@
+#############################################################################
+# Copyright 2016 Mass KonFuzion
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#############################################################################
+
+""" Benchmark: python vs. numpy math backends
+
+    First runs a conformance pass: every batched operation is run on both backends, over the same inputs, and the
+    results must agree (to within common.EPSILON). Then times each operation on both backends over a range of
+    batch sizes, and reports where NumPy starts winning. Needs NumPy.
+
+    Other batched operations (e.g. collision queries) are added to OPERATIONS below, so they get the same
+    conformance check and timing. Exits with status 1 if any operation fails the conformance pass.
+
+    Run from the directory that contains pymkfgame:
+        python -m pymkfgame.benchmarks.bench_backend
+"""
+
+from __future__ import print_function
+
+import random
+import sys
+import timeit
+
+from pymkfgame.mkfmath import backend
+from pymkfgame.mkfmath import common
+from pymkfgame.mkfmath import vector_batch as vb
+from pymkfgame.mkfmath.vector import Vector
+from pymkfgame.mkfmath.matrix import Matrix, mMultvecBatch
+from pymkfgame.mkfmath.affine import aFromMatrix, aApplyBatch
+from pymkfgame.mkfmath.quaternion import qToMatrixBatch
+from pymkfgame.collision.aabb_batch import AABBBatch, aabbOverlapPairs
+from pymkfgame.collision import dist_and_xsect as dx
+from pymkfgame.collision.plane import Plane
+
+SIZES = [ 1, 4, 16, 64, 256, 1024, 4096, 16384 ]
+
+_matView = Matrix.matTRS((1.0, -2.0, 10.0), (0.2, 0.5, 0.1))
+_matView[11] = 0.05
+_affine = aFromMatrix(Matrix.matTRS((1.0, -2.0, 10.0), (0.2, 0.5, 0.1), (1.0, 2.0, 0.5)))
+_plane = Plane((0.0, 1.0, 0.0, 1.0), (0.0, 0.6, 0.8, 0.0))
+
+class _Box(object):
+    ''' A fixed box, for the AABB queries '''
+    _minPt = (-2.0, -2.0, -2.0)
+    _maxPt = (2.0, 2.0, 2.0)
+
+def _flatten(result):
+    ''' Turn an operation result (VectorBatch, list of Matrix, array of floats) into a flat list of floats '''
+    if isinstance(result, vb.VectorBatch):
+        return [ c for v in result.toVectors() for c in v.v ]
+    if isinstance(result, list) and result and isinstance(result[0], Matrix):
+        return [ c for m in result for c in m.v ]
+    return [ float(c) for c in result ]
+
+def _overlapPairs(boxes):
+    ''' aabbOverlapPairs, with the pairs sorted and flattened (the two backends return them in different forms) '''
+    return [ c for pair in sorted((int(i), int(j)) for i, j in aabbOverlapPairs(boxes)) for c in pair ]
+
+# Each operation takes a tuple of input batches (all with the same storage), and returns its result
+OPERATIONS = [
+    ("vbAdd",           lambda b: vb.vbAdd(b[0], b[1])),
+    ("vbCross",         lambda b: vb.vbCross(b[0], b[1])),
+    ("vbDot",           lambda b: vb.vbDot(b[0], b[1])),
+    ("vbLength",        lambda b: vb.vbLength(b[0])),
+    ("vbBounds",        lambda b: sum(vb.vbBounds(b[0]), ()) if b[0].n else ()),
+    ("mMultvecBatch",   lambda b: mMultvecBatch(_matView, b[0])),
+    ("aApplyBatch",     lambda b: aApplyBatch(_affine, b[0])),
+    ("qToMatrixBatch",  lambda b: qToMatrixBatch(b[2])),
+    ("matTRSBatch",     lambda b: Matrix.matTRSBatch(b[0], b[1], b[2])),
+    ("intersect_Rays_Plane", lambda b: dx.intersect_Rays_Plane(b[0], b[1], _plane)),
+    ("intersect_Rays_AABB", lambda b: dx.intersect_Rays_AABB(b[0], b[1], _Box)),
+    ("distSq_Points_AABB", lambda b: dx.distSq_Points_AABB(b[0], _Box)),
+    ("aabbOverlapPairs", lambda b: _overlapPairs(AABBBatch.fromCorners(b[0], vb.vbAdd(b[0], b[1])))),
+]
+
+def makeInputs(n, seed=0):
+    ''' Return the input Vectors: points (w = 1), vectors (w = 0), and unit quaternions '''
+    rnd = random.Random(seed)
+    points = [ Vector(rnd.uniform(-10, 10), rnd.uniform(-10, 10), rnd.uniform(-10, 10), 1.0) for _ in range(n) ]
+    vectors = [ Vector(rnd.uniform(-1, 1), rnd.uniform(-1, 1), rnd.uniform(-1, 1), 0.0) for _ in range(n) ]
+    quats = []
+    for _ in range(n):
+        q = [ rnd.uniform(-1, 1) for _ in range(4) ]
+        k = 1.0 / (sum(c * c for c in q) ** 0.5)
+        quats.append(Vector(*[ c * k for c in q ]))
+    return points, vectors, quats
+
+def makeBatches(inputs, backendName):
+    backend.setBackend(backendName)
+    return tuple(vb.VectorBatch.fromVectors(vs) for vs in inputs)
+
+def conformance():
+    ''' Run every operation on both backends; return the list of operations whose results differ '''
+    failures = []
+    for n in (0, 1, 7, 100):
+        inputs = makeInputs(n, seed=n)
+        pyBatches = makeBatches(inputs, backend.PYTHON)
+        npBatches = makeBatches(inputs, backend.NUMPY)
+        for name, op in OPERATIONS:
+            expected = _flatten(op(pyBatches))
+            result = _flatten(op(npBatches))
+            if len(expected) != len(result) or not all(a == b or common.floatEq(a, b) for a, b in zip(expected, result)):
+                failures.append("{} (n={})".format(name, n))
+    return failures
+
+def run():
+    ''' Run the conformance pass, then the timings. Returns 1 if the conformance pass fails (without timing), 0 otherwise '''
+    if backend.numpy is None:
+        print("bench_backend needs NumPy")
+        return 0
+
+    failures = conformance()
+    backend.setBackend(backend.PYTHON)
+    if failures:
+        print("CONFORMANCE FAILURES: {}".format(", ".join(failures)))
+        return 1
+    print("Conformance: all {} operations agree on both backends".format(len(OPERATIONS)))
+    print("")
+
+    print("Time per call, in microseconds (python / numpy); * marks sizes where numpy is faster")
+    print("{:<21}".format("n") + "".join("{:>18}".format(n) for n in SIZES))
+    crossovers = {}
+    rows = dict((name, []) for name, _ in OPERATIONS)
+    for n in SIZES:
+        inputs = makeInputs(n)
+        pyBatches = makeBatches(inputs, backend.PYTHON)
+        npBatches = makeBatches(inputs, backend.NUMPY)
+        number = max(1, 2000 // n)
+        for name, op in OPERATIONS:
+            tPy = min(timeit.repeat(lambda: op(pyBatches), number=number, repeat=3)) / number * 1e6
+            tNp = min(timeit.repeat(lambda: op(npBatches), number=number, repeat=3)) / number * 1e6
+            rows[name].append("{:.0f} / {:.0f}{}".format(tPy, tNp, "*" if tNp < tPy else " "))
+            if tNp < tPy and name not in crossovers:
+                crossovers[name] = n
+
+    for name, _ in OPERATIONS:
+        print("{:<21}".format(name) + "".join("{:>18}".format(cell) for cell in rows[name]))
+    print("")
+    for name, _ in OPERATIONS:
+        print("  {:<21} numpy wins from n = {}".format(name, crossovers.get(name, "(never, in this range)")))
+
+    backend.setBackend(backend.PYTHON)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(run())
@@ -0,0 +1,159 @@
+#############################################################################
+# Copyright 2016 Mass KonFuzion
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#############################################################################
+
+""" Benchmark: broadphase collision (find all overlapping pairs of moving boxes): SpatialHashGrid, AABBTree and
+    SweepAndPrune vs. brute-force isColliding loops
+
+    Run from the directory that contains pymkfgame:
+        python -m pymkfgame.benchmarks.bench_broadphase
+
+    Each frame, every box moves a little, and then all overlapping pairs are found. The times include re-indexing
+    the moved boxes (SweepAndPrune reports pair changes instead of full pair lists; the initial sort is not timed).
+    Brute force is O(n^2), so for large box counts it is timed on a subset of the boxes, and
+    scaled up (marked "est.")
+"""
+
+from __future__ import print_function
+
+import random
+import timeit
+
+from pymkfgame.collision.aabb import AABB
+from pymkfgame.collision.aabb_tree import AABBTree
+from pymkfgame.collision.broadphase import SpatialHashGrid
+from pymkfgame.collision.sweep_and_prune import SweepAndPrune
+
+BOX_COUNTS = (100, 1000, 10000)
+BOX_SIZE = 1.0
+DENSITY = 0.05          # Boxes per unit of volume
+MAX_BRUTE_FORCE = 1000  # Time brute force on at most this many boxes (and scale up)
+MAX_SAP_ONE_AXIS = 1000 # Skip 1-axis sweep and prune for more boxes than this (in this scene, it checks O(n^2) pairs per frame)
+FRAMES = 10
+
+def makeBoxes(n):
+    random.seed(n)
+    side = (n / DENSITY) ** (1.0 / 3.0)
+    boxes = []
+    for i in range(0, n):
+        box = AABB()
+        x = random.uniform(0.0, side)
+        y = random.uniform(0.0, side)
+        z = random.uniform(0.0, side)
+        box._minPt = (x, y, z)
+        box._maxPt = (x + BOX_SIZE, y + BOX_SIZE, z + BOX_SIZE)
+        boxes.append(box)
+    velocities = [ (random.uniform(-0.05, 0.05), random.uniform(-0.05, 0.05), random.uniform(-0.05, 0.05)) for i in range(0, n) ]
+    return boxes, velocities
+
+def moveBoxes(boxes, velocities):
+    for box, vel in zip(boxes, velocities):
+        mn = box._minPt
+        mx = box._maxPt
+        box._minPt = (mn[0] + vel[0], mn[1] + vel[1], mn[2] + vel[2])
+        box._maxPt = (mx[0] + vel[0], mx[1] + vel[1], mx[2] + vel[2])
+
+def bruteForcePairs(boxes):
+    pairs = []
+    n = len(boxes)
+    for i in range(0, n - 1):
+        a = boxes[i]
+        for j in range(i + 1, n):
+            if a.isColliding(boxes[j]):
+                pairs.append((i, j))
+    return pairs
+
+def perFrame(func, frames):
+    return min(timeit.repeat(func, number=1, repeat=3)) / frames
+
+def run():
+    print("Per-frame time to move n boxes and find all overlapping pairs (best of 3, {} frames)".format(FRAMES))
+    print("  {:>6}  {:>19}  {:>12}  {:>12}  {:>12}  {:>12}".format("n", "brute force", "hash grid", "AABB tree", "SAP 3 axes", "SAP 1 axis"))
+
+    for n in BOX_COUNTS:
+        boxes, velocities = makeBoxes(n)
+
+        # Brute force
+        m = min(n, MAX_BRUTE_FORCE)
+        subset = boxes[:m]
+        subsetVel = velocities[:m]
+        def bruteForce():
+            for f in range(0, FRAMES):
+                moveBoxes(subset, subsetVel)
+                bruteForcePairs(subset)
+        tBrute = perFrame(bruteForce, FRAMES) * (float(n) * (n - 1)) / (float(m) * (m - 1))
+
+        # Spatial hash grid
+        boxes, velocities = makeBoxes(n)
+        grid = SpatialHashGrid(cell_size=2.0 * BOX_SIZE)
+        handles = [ grid.insert(box) for box in boxes ]
+        pairs = []
+        def hashGrid():
+            for f in range(0, FRAMES):
+                moveBoxes(boxes, velocities)
+                for h in handles:
+                    grid.update(h)
+                grid.computePairs(out=pairs)
+        tGrid = perFrame(hashGrid, FRAMES)
+
+        # Sanity check: same pairs as brute force (handles are the box indexes here)
+        if n <= MAX_BRUTE_FORCE and sorted(pairs) != bruteForcePairs(boxes):
+            raise Exception("bench_broadphase: SpatialHashGrid pairs don't match brute force for n = {}".format(n))
+        gridStats = grid.stats
+
+        # Dynamic AABB tree
+        boxes, velocities = makeBoxes(n)
+        tree = AABBTree(margin=0.2 * BOX_SIZE)
+        handles = [ tree.insert(box) for box in boxes ]
+        def aabbTree():
+            for f in range(0, FRAMES):
+                moveBoxes(boxes, velocities)
+                for h in handles:
+                    tree.update(h)
+                tree.computePairs(out=pairs)
+        tTree = perFrame(aabbTree, FRAMES)
+
+        # (Tree handles are node numbers, so map them back to box indexes)
+        index = dict((h, i) for i, h in enumerate(handles))
+        if n <= MAX_BRUTE_FORCE and sorted((index[a], index[b]) for a, b in pairs) != bruteForcePairs(boxes):
+            raise Exception("bench_broadphase: AABBTree pairs don't match brute force for n = {}".format(n))
+
+        # Sweep and prune
+        tSap = []
+        for axes in (3, 1):
+            if axes == 1 and n > MAX_SAP_ONE_AXIS:
+                tSap.append(None)
+                continue
+
+            boxes, velocities = makeBoxes(n)
+            sap = SweepAndPrune(axes)
+            for box in boxes:
+                sap.insert(box)
+            sap.update()
+            def sweepAndPrune():
+                for f in range(0, FRAMES):
+                    moveBoxes(boxes, velocities)
+                    sap.update()
+            tSap.append(perFrame(sweepAndPrune, FRAMES))
+
+            if n <= MAX_BRUTE_FORCE and sorted(sap.getPairs()) != bruteForcePairs(boxes):
+                raise Exception("bench_broadphase: SweepAndPrune pairs don't match brute force for n = {}".format(n))
+
+        print("  {:>6}  {:>9.3f} ms {:>6}  {:>9.3f} ms  {:>9.3f} ms  {:>9.3f} ms  {:>12}".format(n, tBrute * 1000.0, "" if m == n else "(est.)", tGrid * 1000.0, tTree * 1000.0,
+                                                                                       tSap[0] * 1000.0, "-" if tSap[1] is None else "{:.3f} ms".format(tSap[1] * 1000.0)))
+        print("          grid: {} pairs ({} tested), {} cells, {:.2f} boxes/cell (max {})".format(gridStats['pairs'], gridStats['candidatePairs'], gridStats['cells'], gridStats['avgCellOccupancy'], gridStats['maxCellOccupancy']))
+
+if __name__ == "__main__":
+    run()
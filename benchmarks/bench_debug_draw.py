@@ -0,0 +1,80 @@
+#############################################################################
+# Copyright 2016 Mass KonFuzion
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#############################################################################
+
+""" Benchmark: drawing box wireframes with DebugDraw vs. one AABB.draw call per box
+
+    Run from the directory that contains pymkfgame:
+        python -m pymkfgame.benchmarks.bench_debug_draw
+
+    Draws onto an off-screen pygame Surface (no window is opened)
+"""
+
+from __future__ import print_function
+
+import math
+import random
+import timeit
+
+import pygame
+
+from pymkfgame.collision.aabb import AABB
+from pymkfgame.collision.debug_draw import DebugDraw
+from pymkfgame.mkfmath import backend
+from pymkfgame.mkfmath.matrix import Matrix, mMultmat
+
+BOX_COUNTS = (100, 1000, 5000)
+
+def makeBoxes(n):
+    random.seed(n)
+    boxes = []
+    for i in range(0, n):
+        box = AABB()
+        x, y, z = random.uniform(-10.0, 10.0), random.uniform(-10.0, 10.0), random.uniform(-10.0, 10.0)
+        box._minPt = (x, y, z)
+        box._maxPt = (x + random.uniform(0.2, 1.5), y + random.uniform(0.2, 1.5), z + random.uniform(0.2, 1.5))
+        boxes.append(box)
+    return boxes
+
+def run():
+    surface = pygame.Surface((800, 600))
+    matView = mMultmat(Matrix.matTrans(0.0, 0.0, -5.0), Matrix.matRotY(math.pi / 7.0))
+    matViewport = mMultmat(Matrix.matTrans(400.0, 300.0, 0.0), Matrix.matScale(20.0, -20.0, 1.0))
+    debugDraw = DebugDraw()
+
+    backends = [ backend.PYTHON ] + ([ backend.NUMPY ] if backend.numpy is not None else [])
+    print("Per-frame time to draw n box wireframes (best of 3)")
+    print("  {:>6}  {:>14}".format("n", "AABB.draw") + "".join("  {:>18}".format("DebugDraw " + name) for name in backends))
+
+    for n in BOX_COUNTS:
+        boxes = makeBoxes(n)
+
+        def perBox():
+            for box in boxes:
+                box.draw(surface, matView, matViewport)
+        times = [ min(timeit.repeat(perBox, number=1, repeat=3)) ]
+
+        for name in backends:
+            backend.setBackend(name)
+            def batched():
+                debugDraw.addAABBs(boxes)
+                debugDraw.draw(surface, matView, matViewport)
+            times.append(min(timeit.repeat(batched, number=1, repeat=3)))
+        backend.setBackend(backend.PYTHON)
+
+        print("  {:>6}  {:>11.2f} ms".format(n, times[0] * 1000.0) + "".join("  {:>15.2f} ms".format(t * 1000.0) for t in times[1:]))
+
+if __name__ == "__main__":
+    run()
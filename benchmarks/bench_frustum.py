@@ -0,0 +1,142 @@
+#############################################################################
+# Copyright 2016 Mass KonFuzion
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#############################################################################
+
+""" Benchmark: frustum culling from a moving ReferenceFrame camera
+
+    Run from the directory that contains pymkfgame:
+        python -m pymkfgame.benchmarks.bench_frustum
+
+    First checks the planes from Frustum.updateFromReferenceFrame for moved and rotated cameras: against the
+    projection times getLookAtMatrix for translated cameras, and, for random camera poses, that points in front of
+    the camera are inside and points behind it are outside. Then times culling a field of boxes each frame, as the
+    camera moves, with classifyAABB per box vs. classifyAABBs
+"""
+
+from __future__ import print_function
+
+import math
+import random
+import timeit
+
+from pymkfgame.collision.aabb import AABB
+from pymkfgame.collision.frustum import Frustum, CullResult
+from pymkfgame.mkfmath.matrix import mMultmat
+from pymkfgame.mkfmath.refframe import ReferenceFrame
+from pymkfgame.mkfmath.vector import Vector
+
+BOXES = (1000, 10000)
+FIELD_SIZE = 200.0
+FRAMES = 10
+FOVY, ASPECT, NEAR, FAR = 60.0, 1.3, 1.0, 100.0
+
+def makeBox(x0, y0, z0, x1, y1, z1):
+    box = AABB()
+    box._minPt = (x0, y0, z0)
+    box._maxPt = (x1, y1, z1)
+    return box
+
+def makeCamera():
+    camera = ReferenceFrame()
+    camera.getPerspectiveProjectionMatrix(FOVY, ASPECT, NEAR, FAR)
+    return camera
+
+def pointInside(frustum, p):
+    return frustum.classifyPoint(Vector(p[0], p[1], p[2])) == CullResult.inside
+
+def check():
+    ''' Raise an Exception if the frustum of a moved or rotated camera is wrong '''
+    camera = makeCamera()
+    proj = camera.getPerspectiveProjectionMatrix(FOVY, ASPECT, NEAR, FAR)
+    frustum = Frustum()
+
+    # Translated cameras, identity orientation: same planes as with the look-at view matrix, which puts the
+    # frustum along -z. (The cameras stay at z = 0: getLookAtMatrix adds, rather than subtracts, eye . z)
+    for pos in ((50.0, 0.0, 0.0), (0.0, -20.0, 0.0), (-30.0, 10.0, 0.0)):
+        camera.setPosition(*pos)
+        frustum.updateFromReferenceFrame(camera)
+        lookAt = Frustum(mMultmat(proj, camera.getLookAtMatrix(pos[0], pos[1], pos[2], pos[0], pos[1], pos[2] + 1.0, 0.0, 1.0, 0.0)))
+        front = (pos[0], pos[1], pos[2] - 10.0)
+        behind = (pos[0], pos[1], pos[2] + 10.0)
+        aside = (pos[0] - 100.0, pos[1], pos[2] - 10.0)
+        for p, expected in ((front, True), (behind, False), (aside, False)):
+            if pointInside(frustum, p) != expected or pointInside(lookAt, p) != expected:
+                raise Exception("bench_frustum: wrong frustum for a camera at {}, point {}".format(pos, p))
+
+    # Rotated cameras: the frustum points along -look (the frame's z column), whatever the pose
+    random.seed(1)
+    for k in range(0, 100):
+        yaw = random.uniform(-math.pi, math.pi)
+        pitch = random.uniform(-1.2, 1.2)
+        look = (math.cos(pitch) * math.sin(yaw), math.sin(pitch), math.cos(pitch) * math.cos(yaw))
+        up = (-math.sin(pitch) * math.sin(yaw), math.cos(pitch), -math.sin(pitch) * math.cos(yaw))
+        pos = tuple(random.uniform(-50.0, 50.0) for axis in range(0, 3))
+        camera.setLookVector(*look)
+        camera.setUpVector(*up)
+        camera.setPosition(*pos)
+        frustum.updateFromReferenceFrame(camera)
+        for dist, expected in ((10.0, True), (0.5 * (NEAR + FAR), True), (-10.0, False), (2.0 * FAR, False)):
+            p = tuple(pos[axis] - dist * look[axis] for axis in range(0, 3))
+            if pointInside(frustum, p) != expected:
+                raise Exception("bench_frustum: wrong frustum for a camera at {} looking along {}, point {}".format(pos, look, p))
+
+def makeField(n):
+    random.seed(n)
+    boxes = []
+    for i in range(0, n):
+        x = random.uniform(-FIELD_SIZE, FIELD_SIZE)
+        y = random.uniform(-10.0, 10.0)
+        z = random.uniform(-FIELD_SIZE, FIELD_SIZE)
+        s = random.uniform(0.5, 3.0)
+        boxes.append(makeBox(x, y, z, x + s, y + s, z + s))
+    return boxes
+
+def run():
+    check()
+    print("Frustum checks for moved and rotated cameras: OK")
+    print("")
+
+    print("Per-frame culling time, with the camera turning a little every frame (best of 3)")
+    for n in BOXES:
+        boxes = makeField(n)
+        camera = makeCamera()
+        frustum = Frustum()
+        state = { 'angle': 0.0 }
+
+        def turn():
+            state['angle'] += 0.01
+            a = state['angle']
+            camera.setLookVector(math.sin(a), 0.0, math.cos(a))
+            camera.setPosition(10.0 * math.cos(a), 0.0, 10.0 * math.sin(a))
+            frustum.updateFromReferenceFrame(camera)
+
+        def perBox():
+            turn()
+            classify = frustum.classifyAABB
+            for box in boxes:
+                classify(box)
+
+        def batched():
+            turn()
+            frustum.classifyAABBs(boxes)
+
+        for name, func in (("classifyAABB per box", perBox), ("classifyAABBs", batched)):
+            t = min(timeit.repeat(func, number=FRAMES, repeat=3)) / FRAMES
+            print("    {:>6} boxes, {:<22} {:>9.2f} ms".format(n, name, t * 1000.0))
+        visible = sum(1 for r in frustum.classifyAABBs(boxes) if r != CullResult.outside)
+        print("    ({} of {} visible)".format(visible, n))
+
+if __name__ == "__main__":
+    run()
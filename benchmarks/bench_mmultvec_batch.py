@@ -0,0 +1,72 @@
+#############################################################################
+# Copyright 2016 Mass KonFuzion
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#############################################################################
+
+""" Benchmark: transforming a point cloud with mMultvecBatch vs. a per-point mMultvec loop
+
+    Run from the directory that contains pymkfgame:
+        python -m pymkfgame.benchmarks.bench_mmultvec_batch
+"""
+
+from __future__ import print_function
+
+import math
+import random
+import timeit
+
+from pymkfgame.mkfmath import vector_batch
+from pymkfgame.mkfmath.vector import Vector
+from pymkfgame.mkfmath.matrix import Matrix, mMultvec, mMultvecBatch, mMultmat
+
+def makeMatrices():
+    matView = mMultmat(Matrix.matTrans(0.5, -1.0, 12.0), Matrix.matRotY(math.pi / 7.0))
+    matView[11] = 0.1   # give w a non-trivial value, so the perspective divide actually happens
+    matViewport = mMultmat(Matrix.matTrans(400.0, 300.0, 0.0), Matrix.matScale(400.0, -300.0, 1.0))
+    return matView, matViewport
+
+def run(numPoints=5000, repeat=5):
+    random.seed(0)
+    points = [ Vector(random.uniform(-10, 10), random.uniform(-10, 10), random.uniform(-10, 10), 1.0) for _ in range(numPoints) ]
+    matView, matViewport = makeMatrices()
+
+    def perPoint():
+        return [ mMultvec(matViewport, mMultvec(matView, p)) for p in points ]
+
+    batch = vector_batch.VectorBatch.fromVectors(points)
+    out = vector_batch.VectorBatch(numPoints)
+    def batched():
+        return mMultvecBatch(matView, batch, out=out, matPost=matViewport)
+
+    print("{} points, best of {} runs".format(numPoints, repeat))
+    tLoop = min(timeit.repeat(perPoint, number=1, repeat=repeat))
+    print("  per-point mMultvec loop (view + viewport):  {:8.3f} ms".format(tLoop * 1000.0))
+    tBatch = min(timeit.repeat(batched, number=1, repeat=repeat))
+    print("  mMultvecBatch, array('d'):                  {:8.3f} ms  ({:.1f}x)".format(tBatch * 1000.0, tLoop / tBatch))
+
+    if vector_batch.numpy is not None:
+        npBatch = vector_batch.VectorBatch.fromVectors(points, use_numpy=True)
+        npOut = vector_batch.VectorBatch(numPoints, use_numpy=True)
+        def batchedNumpy():
+            return mMultvecBatch(matView, npBatch, out=npOut, matPost=matViewport)
+        tNumpy = min(timeit.repeat(batchedNumpy, number=1, repeat=repeat))
+        print("  mMultvecBatch, numpy:                       {:8.3f} ms  ({:.1f}x)".format(tNumpy * 1000.0, tLoop / tNumpy))
+
+    # Sanity check: the batched result must match the per-point loop
+    expected = perPoint()
+    result = batched().toVectors()
+    assert all(expected[i] == result[i] for i in range(0, numPoints))
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,104 @@
+#############################################################################
+# Copyright 2016 Mass KonFuzion
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#############################################################################
+
+""" Benchmark: narrowphase on broadphase pairs, with and without a bounding-sphere first tier
+
+    Run from the directory that contains pymkfgame:
+        python -m pymkfgame.benchmarks.bench_narrowphase
+
+    The scene is a mix of capsules (e.g. characters) and boxes (e.g. crates). The candidate pairs are the ones whose
+    fat bounds (AABBs enlarged by a margin, as an AABBTree keeps them) overlap; each is then tested with the exact test
+    for its geometry types (narrowphase.collidePairs), either directly, or only if the bounding spheres of the pair
+    collide
+"""
+
+from __future__ import print_function
+
+import math
+import random
+import timeit
+
+from pymkfgame.collision.aabb import AABB
+from pymkfgame.collision.aabb_batch import AABBBatch, aabbOverlapPairs
+from pymkfgame.collision.capsule import Capsule
+from pymkfgame.collision.common import CollisionGeomType
+from pymkfgame.collision.sphere import BoundingSphere
+from pymkfgame.collision import narrowphase
+
+COUNTS = (500, 2000, 5000)
+DENSITY = 0.02          # Objects per unit of volume
+MARGINS = (0.0, 0.5)    # Fat bounds margins to test with
+FRAMES = 10
+
+def makeScene(n):
+    random.seed(n)
+    side = (n / DENSITY) ** (1.0 / 3.0)
+    geoms = []
+    for i in range(0, n):
+        c = [ random.uniform(0.0, side) for k in range(0, 3) ]
+        if i % 2:
+            # A capsule, 1 to 3 units long, pointing any way
+            d = [ random.gauss(0.0, 1.0) for k in range(0, 3) ]
+            k = 0.5 * random.uniform(1.0, 3.0) / math.sqrt(sum(v * v for v in d))
+            geoms.append(Capsule([ c[a] - d[a] * k for a in range(0, 3) ], [ c[a] + d[a] * k for a in range(0, 3) ], random.uniform(0.2, 0.5)))
+        else:
+            box = AABB()
+            half = [ random.uniform(0.25, 1.0) for k in range(0, 3) ]
+            box._minPt = tuple(c[k] - half[k] for k in range(0, 3))
+            box._maxPt = tuple(c[k] + half[k] for k in range(0, 3))
+            geoms.append(box)
+    return geoms
+
+class _Box(object):
+    def __init__(self, minPt, maxPt):
+        self._minPt = minPt
+        self._maxPt = maxPt
+
+def fatBoundsOf(g, margin):
+    ''' Return the bounding box of geometry g, enlarged by margin on every side '''
+    if g._type == CollisionGeomType.aabb:
+        return _Box(tuple(v - margin for v in g._minPt), tuple(v + margin for v in g._maxPt))
+    r = g._radius + margin
+    return _Box(tuple(min(g._p0[k], g._p1[k]) - r for k in range(0, 3)), tuple(max(g._p0[k], g._p1[k]) + r for k in range(0, 3)))
+
+def sphereOf(g):
+    ''' Return the BoundingSphere of geometry g '''
+    mn, mx = (g._minPt, g._maxPt) if g._type == CollisionGeomType.aabb else (g._p0, g._p1)
+    center = tuple(0.5 * (mn[k] + mx[k]) for k in range(0, 3))
+    radius = 0.5 * math.sqrt(sum((mx[k] - mn[k]) ** 2 for k in range(0, 3)))
+    if g._type == CollisionGeomType.capsule:
+        radius += g._radius
+    return BoundingSphere(center, radius)
+
+def run():
+    print("Narrowphase time per frame, for the pairs with overlapping fat bounds (best of 5)")
+    print("  {:>6}  {:>6}  {:>8}  {:>8}  {:>14}  {:>16}".format("n", "margin", "pairs", "hits", "direct", "sphere tier"))
+    for n, margin in [ (n, margin) for n in COUNTS for margin in MARGINS ]:
+        geoms = makeScene(n)
+        pairs = [ (int(i), int(j)) for i, j in aabbOverlapPairs(AABBBatch().pack([ fatBoundsOf(g, margin) for g in geoms ])) ]
+        spheres = [ sphereOf(g) for g in geoms ]
+
+        direct = narrowphase.collidePairs(geoms, pairs)
+        layered = narrowphase.collidePairs(geoms, pairs, prefilter=spheres)
+        if direct != layered:
+            raise Exception("bench_narrowphase: the sphere tier changed the result")
+
+        tDirect = min(timeit.repeat(lambda: narrowphase.collidePairs(geoms, pairs), number=FRAMES, repeat=5)) / FRAMES
+        tLayered = min(timeit.repeat(lambda: narrowphase.collidePairs(geoms, pairs, prefilter=spheres), number=FRAMES, repeat=5)) / FRAMES
+        print("  {:>6}  {:>6}  {:>8}  {:>8}  {:>11.2f} ms  {:>13.2f} ms".format(n, margin, len(pairs), len(direct), tDirect * 1000.0, tLayered * 1000.0))
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,176 @@
+#############################################################################
+# Copyright 2016 Mass KonFuzion
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#############################################################################
+
+""" Benchmark: queries on static level geometry, with a LooseOctree vs. an AABBTree
+
+    Run from the directory that contains pymkfgame:
+        python -m pymkfgame.benchmarks.bench_octree
+
+    The level is a grid of rooms, each with a floor, 4 walls and some clutter. Each frame, AGENTS agents (spread over
+    a few rooms) query the boxes around them and the boxes in their room (the same query for every agent in a room,
+    so it can come from the query cache), and cast a line of sight ray; then the camera culls the level against its
+    frustum
+"""
+
+from __future__ import print_function
+
+import math
+import os
+import random
+import tempfile
+import timeit
+
+from pymkfgame.collision.aabb import AABB
+from pymkfgame.collision.aabb_tree import AABBTree
+from pymkfgame.collision.frustum import Frustum, CullResult
+from pymkfgame.collision.octree import LooseOctree
+from pymkfgame.mkfmath.matrix import Matrix, mMultmat
+
+ROOMS = (10, 20)        # The level is ROOMS x ROOMS rooms (one size per run)
+ROOM_SIZE = 10.0
+CLUTTER = 20            # Boxes per room, besides the floor and walls
+AGENTS = 200
+AGENT_ROOMS = 8         # The agents are spread over this many rooms
+QUERY_SIZE = 3.0        # Side of the box each agent queries around itself
+FRAMES = 10
+
+def makeBox(x0, y0, z0, x1, y1, z1):
+    box = AABB()
+    box._minPt = (x0, y0, z0)
+    box._maxPt = (x1, y1, z1)
+    return box
+
+def makeLevel(rooms):
+    random.seed(rooms)
+    boxes = []
+    s = ROOM_SIZE
+    for i in range(0, rooms):
+        for k in range(0, rooms):
+            x = i * s
+            z = k * s
+            boxes.append(makeBox(x, -0.5, z, x + s, 0.0, z + s))                # Floor
+            boxes.append(makeBox(x, 0.0, z, x + s, 3.0, z + 0.2))               # Walls
+            boxes.append(makeBox(x, 0.0, z + s - 0.2, x + s, 3.0, z + s))
+            boxes.append(makeBox(x, 0.0, z, x + 0.2, 3.0, z + s))
+            boxes.append(makeBox(x + s - 0.2, 0.0, z, x + s, 3.0, z + s))
+            for c in range(0, CLUTTER):
+                cx = x + random.uniform(0.5, s - 1.5)
+                cz = z + random.uniform(0.5, s - 1.5)
+                boxes.append(makeBox(cx, 0.0, cz, cx + random.uniform(0.2, 1.0), random.uniform(0.2, 1.5), cz + random.uniform(0.2, 1.0)))
+    return boxes
+
+def makeAgents(rooms):
+    random.seed(rooms + 1)
+    homes = [ (random.randint(0, rooms - 1), random.randint(0, rooms - 1)) for r in range(0, AGENT_ROOMS) ]
+    agents = []
+    for a in range(0, AGENTS):
+        i, k = homes[a % AGENT_ROOMS]
+        agents.append((i * ROOM_SIZE + random.uniform(1.0, ROOM_SIZE - 1.0), 1.0, k * ROOM_SIZE + random.uniform(1.0, ROOM_SIZE - 1.0)))
+    return agents
+
+def roomOf(p):
+    ''' Return the (minPt, maxPt) of the room that point p is in '''
+    x = math.floor(p[0] / ROOM_SIZE) * ROOM_SIZE
+    z = math.floor(p[2] / ROOM_SIZE) * ROOM_SIZE
+    return (x, -0.5, z), (x + ROOM_SIZE, 3.0, z + ROOM_SIZE)
+
+def makeFrustum(rooms):
+    ''' A camera at one corner of the level, looking along the diagonal '''
+    f = 1.0 / math.tan(math.pi / 6.0)
+    near, far = 1.0, 100.0
+    proj = Matrix.matZero()
+    proj.v[0] = f / 1.3
+    proj.v[5] = f
+    proj.v[10] = (far + near) / (near - far)
+    proj.v[11] = -1.0
+    proj.v[14] = 2.0 * far * near / (near - far)
+    view = mMultmat(Matrix.matRotY(0.75 * math.pi), Matrix.matTrans(-1.0, -2.0, -1.0))
+    return Frustum(mMultmat(proj, view))
+
+def run():
+    print("Per-frame query times on a static level, for {} agents in {} rooms (best of 3)".format(AGENTS, AGENT_ROOMS))
+    for rooms in ROOMS:
+        boxes = makeLevel(rooms)
+        agents = makeAgents(rooms)
+        frustum = makeFrustum(rooms)
+        h = 0.5 * QUERY_SIZE
+        regions = [ ((a[0] - h, a[1] - h, a[2] - h), (a[0] + h, a[1] + h, a[2] + h)) for a in agents ]
+        rooms = [ roomOf(a) for a in agents ]
+        rays = [ (a, (agents[(n + 1) % AGENTS][0] - a[0], 0.0, agents[(n + 1) % AGENTS][2] - a[2])) for n, a in enumerate(agents) ]
+
+        t0 = timeit.default_timer()
+        octree = LooseOctree(boxes)
+        tBuild = timeit.default_timer() - t0
+        fd, filename = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+        octree.save(filename)
+        tLoad = min(timeit.repeat(lambda: LooseOctree.load(filename, boxes), number=1, repeat=3))
+        os.remove(filename)
+        cached = LooseOctree(boxes)
+        cached.enableCache()
+
+        tree = AABBTree(margin=0.0)
+        handleIndex = {}
+        for i in range(0, len(boxes)):
+            handleIndex[tree.insert(boxes[i])] = i
+
+        print("  {} boxes ({} octree nodes): build {:.1f} ms, load from file {:.1f} ms".format(len(boxes), octree.getNodeCount(), tBuild * 1000.0, tLoad * 1000.0))
+
+        def treeRegions():
+            for mn, mx in regions:
+                tree.queryRegion(mn, mx)
+        def octreeRegions():
+            for mn, mx in regions:
+                octree.queryBox(mn, mx)
+        def octreeRooms():
+            for mn, mx in rooms:
+                octree.queryBox(mn, mx)
+        def cachedRooms():
+            cached.newFrame()
+            for mn, mx in rooms:
+                cached.queryBox(mn, mx)
+        def treeRays():
+            for o, d in rays:
+                tree.rayCast(o, d, 1.0)
+        def octreeRays():
+            for o, d in rays:
+                octree.rayCast(o, d, 1.0)
+        def classifyAll():
+            frustum.classifyAABBs(boxes)
+        def octreeFrustum():
+            octree.queryFrustum(frustum)
+
+        # Same answers from every structure
+        for mn, mx in regions:
+            if sorted(handleIndex[h] for h in tree.queryRegion(mn, mx)) != sorted(octree.queryBox(mn, mx)):
+                raise Exception("bench_octree: box query mismatch")
+        for mn, mx in rooms:
+            if octree.queryBox(mn, mx) != cached.queryBox(mn, mx):
+                raise Exception("bench_octree: cached query mismatch")
+        visible = [ i for i, r in enumerate(frustum.classifyAABBs(boxes)) if r != CullResult.outside ]
+        if sorted(octree.queryFrustum(frustum)) != visible:
+            raise Exception("bench_octree: frustum query mismatch")
+
+        for name, func in ( ("box queries, AABBTree", treeRegions), ("box queries, LooseOctree", octreeRegions)
+                          , ("room queries, LooseOctree", octreeRooms), ("room queries, cached", cachedRooms)
+                          , ("rays, AABBTree", treeRays), ("rays, LooseOctree", octreeRays)
+                          , ("frustum, classifyAABBs", classifyAll), ("frustum, LooseOctree", octreeFrustum) ):
+            t = min(timeit.repeat(func, number=FRAMES, repeat=3)) / FRAMES
+            print("    {:<26} {:>9.2f} ms".format(name, t * 1000.0))
+        print("    ({} of {} visible)".format(len(visible), len(boxes)))
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,132 @@
+#############################################################################
+# Copyright 2016 Mass KonFuzion
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#############################################################################
+
+""" Benchmark: collision messages per frame, posting every colliding pair vs. PairCache begin/end events
+
+    Run from the directory that contains pymkfgame:
+        python -m pymkfgame.benchmarks.bench_pair_cache
+
+    Each frame, every box moves a little; SweepAndPrune finds the colliding pairs. Then, either a message is posted
+    for every colliding pair (what a game does when it re-derives collision state every frame), or the pairs go
+    through a PairCache, which only posts begin and end events. Either way, the messages are dequeued and handed to
+    a listener. The times cover posting and handling the messages (and updating the PairCache), not the broadphase
+"""
+
+from __future__ import print_function
+
+import random
+import timeit
+
+from pymkfgame.collision.aabb import AABB
+from pymkfgame.collision.pair_cache import PairCache
+from pymkfgame.collision.sweep_and_prune import SweepAndPrune
+from pymkfgame.core.message_queue import MessageQueue
+
+BOX_COUNTS = (1000, 5000)
+DENSITIES = (0.05, 0.2)     # Boxes per unit of volume
+SPEED = 0.02                # Max distance a box moves per frame, per axis
+FRAMES = 20
+QUEUE_SLOTS = 200000
+
+def makeBoxes(n, density):
+    random.seed(n)
+    side = (n / density) ** (1.0 / 3.0)
+    boxes = []
+    for i in range(0, n):
+        box = AABB()
+        p = (random.uniform(0.0, side), random.uniform(0.0, side), random.uniform(0.0, side))
+        box._minPt = p
+        box._maxPt = (p[0] + 1.0, p[1] + 1.0, p[2] + 1.0)
+        boxes.append(box)
+    velocities = [ (random.uniform(-SPEED, SPEED), random.uniform(-SPEED, SPEED), random.uniform(-SPEED, SPEED)) for i in range(0, n) ]
+    return boxes, velocities
+
+def moveBoxes(boxes, velocities):
+    for box, vel in zip(boxes, velocities):
+        mn = box._minPt
+        mx = box._maxPt
+        box._minPt = (mn[0] + vel[0], mn[1] + vel[1], mn[2] + vel[2])
+        box._maxPt = (mx[0] + vel[0], mx[1] + vel[1], mx[2] + vel[2])
+
+def recordFrames(n, density):
+    ''' Return, for each frame, (all colliding pairs, pairs that started, pairs that stopped) '''
+    boxes, velocities = makeBoxes(n, density)
+    sap = SweepAndPrune()
+    for box in boxes:
+        sap.insert(box)
+    sap.update()
+    frames = []
+    for f in range(0, FRAMES):
+        moveBoxes(boxes, velocities)
+        added, removed = sap.update()
+        frames.append((sap.getPairs(), added, removed))
+    return frames
+
+def dispatch(queue, handled):
+    ''' Dequeue every message, and hand it to the registered listeners '''
+    msg = queue.Dequeue()
+    while msg is not None:
+        for listener in queue.RegisteredListeners(msg['topic']):
+            listener['ref'](msg)
+        handled[0] += 1
+        msg = queue.Dequeue()
+
+def run():
+    print("Collision messages per frame, and time per frame to post and handle them (best of 3, {} frames)".format(FRAMES))
+    print("  {:>6}  {:>7}  {:>8}  {:>20}  {:>20}  {:>20}".format("n", "density", "pairs", "every pair", "PairCache.update", "PairCache.applyChanges"))
+    for n in BOX_COUNTS:
+        for density in DENSITIES:
+            frames = recordFrames(n, density)
+            queue = MessageQueue()
+            queue.Initialize(QUEUE_SLOTS)
+            handled = [0]
+            queue.RegisterListener('bench', lambda msg: None, 'collision')
+
+            def everyPair():
+                for pairs, added, removed in frames:
+                    for pair in pairs:
+                        queue.Enqueue({ 'topic': 'collision', 'payload': { 'pair': pair } })
+                    dispatch(queue, handled)
+
+            def cacheUpdate():
+                cache = PairCache()
+                cache.update(frames[0][0])  # (Start from the first frame's pairs, so the first begin events don't count)
+                for pairs, added, removed in frames[1:]:
+                    cache.update(pairs)
+                    cache.publish(queue)
+                    dispatch(queue, handled)
+
+            def cacheChanges():
+                cache = PairCache()
+                cache.update(frames[0][0])
+                for pairs, added, removed in frames[1:]:
+                    cache.applyChanges(added, removed)
+                    cache.publish(queue)
+                    dispatch(queue, handled)
+
+            results = []
+            for func, count in ((everyPair, FRAMES), (cacheUpdate, FRAMES - 1), (cacheChanges, FRAMES - 1)):
+                handled[0] = 0
+                func()
+                messages = float(handled[0]) / count
+                t = min(timeit.repeat(func, number=1, repeat=3)) / count
+                results.append("{:>7.0f} {:>7.2f} ms".format(messages, t * 1000.0))
+
+            avgPairs = sum(len(f[0]) for f in frames) / float(FRAMES)
+            print("  {:>6}  {:>7}  {:>8.0f}  {:>20}  {:>20}  {:>20}".format(n, density, avgPairs, results[0], results[1], results[2]))
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,96 @@
+#############################################################################
+# Copyright 2016 Mass KonFuzion
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#############################################################################
+
+""" Benchmark: scaling of the multi-process narrowphase (ParallelNarrowphase) with 1 to 8 workers
+
+    Run from the directory that contains pymkfgame:
+        python -m pymkfgame.benchmarks.bench_parallel
+
+    The candidate pairs are the pairs whose fat bounds (boxes enlarged by MARGIN) overlap; ParallelNarrowphase finds
+    the ones whose boxes overlap. "in-process" is workers=0: the same kernels, without the pool or shared memory.
+    Starting the pool is not timed. Speedups are limited by the number of CPUs (printed first); worker counts above
+    that only measure the pool's overhead, and are flagged in the output
+"""
+
+from __future__ import print_function
+
+import multiprocessing
+import random
+import timeit
+
+from pymkfgame.collision.aabb_batch import AABBBatch, aabbOverlapPairs
+from pymkfgame.collision.parallel import ParallelNarrowphase, shared_memory
+from pymkfgame.mkfmath import backend
+
+BOX_COUNTS = (20000, 50000)
+DENSITY = 0.05          # Boxes per unit of volume
+MARGIN = 0.5
+WORKERS = (1, 2, 4, 8)
+
+class _Box(object):
+    def __init__(self, minPt, maxPt):
+        self._minPt = minPt
+        self._maxPt = maxPt
+
+def makeWorld(n):
+    ''' Return (boxes, fat bounds) '''
+    random.seed(n)
+    side = (n / DENSITY) ** (1.0 / 3.0)
+    boxes = []
+    fat = []
+    for i in range(0, n):
+        c = [ random.uniform(0.0, side) for k in range(0, 3) ]
+        half = [ random.uniform(0.25, 1.0) for k in range(0, 3) ]
+        boxes.append(_Box(tuple(c[k] - half[k] for k in range(0, 3)), tuple(c[k] + half[k] for k in range(0, 3))))
+        fat.append(_Box(tuple(c[k] - half[k] - MARGIN for k in range(0, 3)), tuple(c[k] + half[k] + MARGIN for k in range(0, 3))))
+    return boxes, fat
+
+def run():
+    cpus = multiprocessing.cpu_count()
+    print("{} CPUs. Narrowphase time per frame (best of 3)".format(cpus))
+    workers = WORKERS if shared_memory is not None else ()
+    if not workers:
+        print("  (multiprocessing.shared_memory is not available: in-process only)")
+
+    backends = [ backend.PYTHON ] + ([ backend.NUMPY ] if backend.numpy is not None else [])
+    for n in BOX_COUNTS:
+        boxes, fat = makeWorld(n)
+        for name in backends:
+            backend.setBackend(name)
+            batch = AABBBatch().pack(boxes)
+            candidates = aabbOverlapPairs(AABBBatch().pack(fat))
+            if not batch.isNumpy:
+                candidates = [ (int(i), int(j)) for i, j in candidates ]
+
+            print("  {} boxes, {} candidates, {} backend:".format(n, len(candidates), name))
+            reference = None
+            base = None
+            for w in (0,) + workers:
+                with ParallelNarrowphase(workers=w) as narrowphase:
+                    hits = narrowphase.collidePairs(batch, candidates)   # (Also starts the pool)
+                    t = min(timeit.repeat(lambda: narrowphase.collidePairs(batch, candidates), number=1, repeat=3))
+                if reference is None:
+                    reference = hits
+                    base = t
+                elif len(hits) != len(reference) or any(tuple(a) != tuple(b) for a, b in zip(hits, reference)):
+                    raise Exception("bench_parallel: {} workers gave different pairs".format(w))
+                label = "in-process" if w == 0 else "{} worker{}".format(w, "s" if w > 1 else "")
+                note = "  (more workers than CPUs)" if w > cpus else ""
+                print("    {:<12} {:>9.2f} ms  {:>5.2f}x  ({} hits){}".format(label, t * 1000.0, base / t, len(hits), note))
+    backend.setBackend(backend.PYTHON)
+
+if __name__ == "__main__":
+    run()
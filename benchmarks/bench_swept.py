@@ -0,0 +1,119 @@
+#############################################################################
+# Copyright 2016 Mass KonFuzion
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#############################################################################
+
+""" Benchmark: catching fast projectiles that hit thin walls, with swept AABBs vs. substepping
+
+    Run from the directory that contains pymkfgame:
+        python -m pymkfgame.benchmarks.bench_swept
+
+    Each frame, every projectile moves several times the thickness of a wall. Substepping splits the frame into
+    equal steps and runs a static overlap test (aabbOverlapPairs) after each one; it only catches every hit once the
+    steps are shorter than a wall plus a projectile. The swept test (sweptBounds, aabbOverlapPairs, sweepAABBPairs)
+    runs once per frame. "hits" counts the projectiles that hit at least one wall during the frame
+"""
+
+from __future__ import print_function
+
+import random
+import timeit
+from array import array
+
+from pymkfgame.collision.aabb_batch import AABBBatch, aabbOverlapPairs
+from pymkfgame.collision.swept import NO_HIT, sweptBounds, sweepAABBPairs
+from pymkfgame.mkfmath import backend
+from pymkfgame.mkfmath import vector_batch
+from pymkfgame.mkfmath.vector import Vector
+
+NUM_PROJECTILES = 1000
+NUM_WALLS = 200
+PROJECTILE_SIZE = 0.1
+WALL_THICKNESS = 0.05
+SPEED = 30.0            # Units per second
+DT = 0.05               # 20 frames per second, so projectiles move 1.5 units per frame
+SUBSTEPS = (1, 4, 10)
+
+class _Box(object):
+    def __init__(self, minPt, maxPt):
+        self._minPt = minPt
+        self._maxPt = maxPt
+
+def makeScene():
+    random.seed(0)
+    walls = []
+    for i in range(0, NUM_WALLS):
+        # Thin walls, perpendicular to a random axis
+        axis = random.randint(0, 2)
+        c = [ random.uniform(0.0, 20.0) for k in range(0, 3) ]
+        half = [ 1.0, 1.0, 1.0 ]
+        half[axis] = WALL_THICKNESS * 0.5
+        walls.append(_Box(tuple(c[k] - half[k] for k in range(0, 3)), tuple(c[k] + half[k] for k in range(0, 3))))
+
+    projectiles = []
+    displacements = []
+    for i in range(0, NUM_PROJECTILES):
+        c = [ random.uniform(0.0, 20.0) for k in range(0, 3) ]
+        projectiles.append(_Box(tuple(c), tuple(v + PROJECTILE_SIZE for v in c)))
+        d = [ random.gauss(0.0, 1.0) for k in range(0, 3) ]
+        k = SPEED * DT / sum(v * v for v in d) ** 0.5
+        displacements.append(Vector(d[0] * k, d[1] * k, d[2] * k, 0.0))
+    return walls, projectiles, displacements
+
+def substepped(walls, projectiles, displacements, steps):
+    ''' Return the set of projectiles that overlap a wall after any of the substeps '''
+    movers = AABBBatch().pack(projectiles)
+    step = vector_batch.VectorBatch.fromVectors([ Vector(d[0] / steps, d[1] / steps, d[2] / steps, 0.0) for d in displacements ])
+    hits = set()
+    for s in range(0, steps):
+        # Move every projectile by one step (the box corners move by the step displacement)
+        if movers.isNumpy:
+            movers.data[:, 0:3] += step.data[:, 0:3]
+            movers.data[:, 3:6] += step.data[:, 0:3]
+        else:
+            for axis in range(0, 3):
+                d = step.data[axis::4]
+                movers.data[axis::6] = array('d', map(float.__add__, movers.data[axis::6], d))
+                movers.data[axis + 3::6] = array('d', map(float.__add__, movers.data[axis + 3::6], d))
+        hits.update(int(i) for i, j in aabbOverlapPairs(movers, walls))
+    return hits
+
+def swept(walls, projectiles, displacements):
+    ''' Return the set of projectiles that hit a wall during the frame '''
+    movers = AABBBatch().pack(projectiles)
+    disp = vector_batch.VectorBatch.fromVectors(displacements)
+    pairs = aabbOverlapPairs(sweptBounds(movers, disp), walls)
+    times, normals = sweepAABBPairs(movers, disp, walls, pairs)
+    return set(int(pairs[p][0]) for p in range(0, len(pairs)) if times[p] != NO_HIT)
+
+def run():
+    walls, projectiles, displacements = makeScene()
+    backends = [ backend.PYTHON ] + ([ backend.NUMPY ] if backend.numpy is not None else [])
+
+    print("{} projectiles moving {} units per frame, {} walls {} units thick".format(NUM_PROJECTILES, SPEED * DT, NUM_WALLS, WALL_THICKNESS))
+    for name in backends:
+        backend.setBackend(name)
+        wallBatch = AABBBatch().pack(walls)
+        print("  {} backend:".format(name))
+        for steps in SUBSTEPS:
+            t = min(timeit.repeat(lambda: substepped(wallBatch, projectiles, displacements, steps), number=1, repeat=3))
+            hits = substepped(wallBatch, projectiles, displacements, steps)
+            print("    {:>2} substeps: {:>9.2f} ms per frame, {:>4} hits".format(steps, t * 1000.0, len(hits)))
+        t = min(timeit.repeat(lambda: swept(wallBatch, projectiles, displacements), number=1, repeat=3))
+        hits = swept(wallBatch, projectiles, displacements)
+        print("    swept:       {:>9.2f} ms per frame, {:>4} hits".format(t * 1000.0, len(hits)))
+    backend.setBackend(backend.PYTHON)
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,106 @@
+#############################################################################
+# Copyright 2016 Mass KonFuzion
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#############################################################################
+
+""" Benchmark: accuracy and throughput of TrigTable settings vs. math.sin/math.cos
+
+    Run from the directory that contains pymkfgame:
+        python -m pymkfgame.benchmarks.bench_trig_table
+"""
+
+from __future__ import print_function
+
+import math
+import random
+import timeit
+from array import array
+
+from pymkfgame.mkfmath import trig_table
+from pymkfgame.mkfmath import matrix
+from pymkfgame.mkfmath.trig_table import TrigTable
+
+NUM_ANGLES = 20000
+SETTINGS = [ (1, True), (4, True), (16, True), (16, False), (64, False) ]   # (steps_per_degree, interpolate)
+
+def maxError(table, angles):
+    err = 0.0
+    for th in angles:
+        s, c = table.sinCosRad(th)
+        err = max(err, abs(s - math.sin(th)), abs(c - math.cos(th)))
+    return err
+
+def best(func):
+    return min(timeit.repeat(func, number=1, repeat=5))
+
+def run():
+    random.seed(0)
+    angles = array('d', [ random.uniform(-4.0 * math.pi, 4.0 * math.pi) for _ in range(0, NUM_ANGLES) ])
+
+    def mathSinCos():
+        sin = math.sin
+        cos = math.cos
+        for th in angles:
+            sin(th)
+            cos(th)
+
+    tMath = best(mathSinCos)
+    print("{} angles (sin + cos each); times are best of 5".format(NUM_ANGLES))
+    print("  {:<24} {:>12} {:>12} {:>14}".format("setting", "max error", "scalar ms", "batch ms"))
+    print("  {:<24} {:>12} {:>12.3f} {:>14}".format("math.sin/math.cos", "0", tMath * 1000.0, "-"))
+
+    for stepsPerDegree, interpolate in SETTINGS:
+        table = TrigTable(stepsPerDegree, interpolate)
+
+        def scalar():
+            sinCos = table.sinCosRad
+            for th in angles:
+                sinCos(th)
+
+        outSin = array('d', [0.0]) * NUM_ANGLES
+        outCos = array('d', [0.0]) * NUM_ANGLES
+        def batch():
+            table.sinCosBatch(angles, outSin, outCos)
+
+        name = "1/{} deg, {}".format(stepsPerDegree, "lerp" if interpolate else "nearest")
+        tBatch = best(batch) * 1000.0
+        batchStr = "{:.3f}".format(tBatch)
+
+        if trig_table.numpy is not None:
+            npAngles = trig_table.numpy.array(angles)
+            tNumpy = best(lambda: table.sinCosBatch(npAngles)) * 1000.0
+            batchStr += " ({:.3f} np)".format(tNumpy)
+
+        print("  {:<24} {:>12.2e} {:>12.3f} {:>14}".format(name, maxError(table, angles), best(scalar) * 1000.0, batchStr))
+
+    if trig_table.numpy is not None:
+        npAngles = trig_table.numpy.array(angles)
+        tNumpy = best(lambda: (trig_table.numpy.sin(npAngles), trig_table.numpy.cos(npAngles))) * 1000.0
+        print("  {:<24} {:>12} {:>12} {:>14.3f}".format("numpy.sin/numpy.cos", "0", "-", tNumpy))
+
+    print("")
+    print("Matrix.matRotY, {} calls:".format(NUM_ANGLES))
+    out = matrix.Matrix()
+    def rotations():
+        matRotY = matrix.Matrix.matRotY
+        for th in angles:
+            matRotY(th, out=out)
+
+    print("  math.sin/math.cos:  {:.3f} ms".format(best(rotations) * 1000.0))
+    matrix.setTrigTable(TrigTable(16, False))
+    print("  TrigTable(16, nearest): {:.3f} ms".format(best(rotations) * 1000.0))
+    matrix.setTrigTable(None)
+
+if __name__ == "__main__":
+    run()
@@ -14,12 +14,51 @@
 # limitations under the License.
 #############################################################################
 
-import sys
 import pygame
+from array import array
+from operator import itemgetter
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 from pymkfgame.gameobj.gameobj import GameObj
-from pymkfgame.collision.common import CollisionGeomType
-from pymkfgame.mkfmath import vector
+from pymkfgame.collision.common import CollisionGeomType, walkHierarchy, transformBounds, pointColumns
+from pymkfgame.collision.frustum import CullResult
+from pymkfgame.collision import narrowphase
+from pymkfgame.collision.debug_draw import BOX_COLOR, _boxEdgePath
 from pymkfgame.mkfmath import matrix
+from pymkfgame.mkfmath import vector_batch
+
+_EMPTY_BOUNDS = ((float('inf'), float('inf'), float('inf')), (float('-inf'), float('-inf'), float('-inf')))
+
+def _pointsBounds(points):
+    ''' Return the ((xmin, ymin, zmin), (xmax, ymax, zmax)) bounds of points, or _EMPTY_BOUNDS if there are none
+
+        points can be anything common.pointColumns accepts. The min/max run over whole columns at a time (in C),
+        instead of one point at a time; VectorBatches and numpy arrays skip the conversion to lists
+    '''
+    if len(points) == 0:
+        return _EMPTY_BOUNDS
+    if isinstance(points, vector_batch.VectorBatch):
+        return vector_batch.vbBounds(points)
+    if numpy is not None and isinstance(points, numpy.ndarray):
+        mn = points[:, :3].min(axis=0)
+        mx = points[:, :3].max(axis=0)
+        return (float(mn[0]), float(mn[1]), float(mn[2])), (float(mx[0]), float(mx[1]), float(mx[2]))
+
+    xs, ys, zs = pointColumns(points)
+    return (min(xs), min(ys), min(zs)), (max(xs), max(ys), max(zs))
+
+def _unionBounds(bounds):
+    ''' Return the bounds that enclose every (minPt, maxPt) in the list bounds '''
+    if len(bounds) == 1:
+        return bounds[0]
+    mins = [ b[0] for b in bounds ]
+    maxs = [ b[1] for b in bounds ]
+    return ( (min(map(itemgetter(0), mins)), min(map(itemgetter(1), mins)), min(map(itemgetter(2), mins)))
+           , (max(map(itemgetter(0), maxs)), max(map(itemgetter(1), maxs)), max(map(itemgetter(2), maxs))) )
 
 class AABB(GameObj):    # TODO decide.. should collision geometry derive from GameObj?
     def __init__(self):
@@ -27,49 +66,83 @@ class AABB(GameObj):    # TODO decide.. should collision geometry derive from Ga
 
         self._minPt = (0.0, 0.0, 0.0)    # TODO should we put a Point3D class into the pymkfgame engine?
         self._maxPt = (0.0, 0.0, 0.0)
+        self._boundsCache = None    # See updateBounds
         self._type = CollisionGeomType.aabb # The idea is to give the collision geom an identifier that lets the game decide how to handle collisions involving geoms of this type
 
     def __str__(self):
         return "minPt:{} maxPt:{} type:{}".format(self._minPt, self._maxPt, self._type)
 
     def computeBounds(self, model):
-        ''' Compute the AABB bounding the model object
+        ''' Compute the AABB bounding the model object (i.e., the _xpoints of the model and all its children)
+
+            This rescans every point, every call. For models that change rarely (or only move), use updateBounds
         '''
         # TODO rename this function to update? Hmm, no probably not.. But maybe make an update() function that simply calls computeBounds? (the reason is: we want update to follow the update(self, dt_s) paradigm of the engine. Or, we could give the aabb a reference to the model it's tracking, and then this can be update(self, dt_s), without having to make any other calls.
         # TODO add the Wireframe class to the engine
-        # TODO revisit this function. It's probably ripe for optimization
-        obj_refs = [ model ]   # Start by adding a reference to the input model
-
-        xmin = sys.maxint
-        ymin = sys.maxint
-        zmin = sys.maxint
+        bounds = [ _pointsBounds(obj_ref._xpoints) for obj_ref in walkHierarchy(model) ]
+        self._minPt, self._maxPt = _unionBounds(bounds)
 
-        xmax = -sys.maxint + 1
-        ymax = -sys.maxint + 1
-        zmax = -sys.maxint + 1
+    def updateBounds(self, model, matWorld=None, points_attr='_xpoints'):
+        ''' Incremental version of computeBounds
 
-        for obj_ref in obj_refs:    # Note, the refs list can grow while being iterated. As long as we hit the stop condition, the loop will iterate over the whole list, and properly
-            if obj_ref.children:
-                for child_name, child_ref in obj_ref.children.iteritems():  # NOTE: we don't NEED the child_name; it's useful for debugging
-                    #print "Adding {}:{}".format(child_name, child_ref)
-                    obj_refs.append(child_ref)
+            The bounds of the points of the model, and of each of its children, are cached (by object), and so is
+            the bounds of the whole hierarchy. Only objects marked with invalidateBounds() are rescanned; if none
+            were, the points aren't touched at all.
 
-            for point in obj_ref._xpoints:  # _xpoints is a list of Point3D objects. TODO add Point3D class to engine
-                xmin = min(xmin, point.x)
-                ymin = min(ymin, point.y)
-                zmin = min(zmin, point.z)
+            points_attr names the attribute that holds each object's points (objects with .x, .y, .z, a VectorBatch,
+            or an N x 3 (or N x 4) numpy array).
 
-                xmax = max(xmax, point.x)
-                ymax = max(ymax, point.y)
-                zmax = max(zmax, point.z)
-
-        self._minPt = (xmin, ymin, zmin)
-        self._maxPt = (xmax, ymax, zmax)
-        #print "Min: ({}, {}, {}), Max: ({}, {}, {})".format(self._minPt[0], self._minPt[1], self._minPt[2], self._maxPt[0], self._maxPt[1], self._maxPt[2])
+            If matWorld (an affine Matrix) is given, the cached bounds are taken to be local (model space), and the
+            AABB is their bounds after transforming by matWorld (see collision.common.transformBounds). So, for a
+            model that moves, but whose shape doesn't change, pass the name of the attribute that holds the
+            untransformed points, and the model's world matrix: the points are only scanned once, and each update
+            costs one bounds transform
+        '''
+        cache = self._boundsCache
+        if cache is None or cache.get('model') is not model or cache.get('pointsAttr') != points_attr:
+            cache = self._boundsCache = { 'model': model, 'pointsAttr': points_attr, 'objects': {}, 'bounds': None }
+
+        if cache['bounds'] is None:
+            # Rebuild the per-object table from the current hierarchy, so children that were removed get dropped.
+            # Entries hold the object itself, so an id can't be reused by a new object while it's in the table
+            oldObjects = cache['objects']
+            objects = cache['objects'] = {}
+            bounds = []
+            for obj_ref in walkHierarchy(model):
+                entry = oldObjects.get(id(obj_ref))
+                if entry is None or entry[0] is not obj_ref:
+                    entry = (obj_ref, _pointsBounds(getattr(obj_ref, points_attr)))
+                objects[id(obj_ref)] = entry
+                bounds.append(entry[1])
+            cache['bounds'] = _unionBounds(bounds)
+
+        minPt, maxPt = cache['bounds']
+        if matWorld is not None and minPt[0] <= maxPt[0]:   # (Leave empty bounds as they are)
+            minPt, maxPt = transformBounds(minPt, maxPt, matWorld)
+        self._minPt = minPt
+        self._maxPt = maxPt
+
+    def invalidateBounds(self, obj=None):
+        ''' Mark cached bounds (see updateBounds) as out of date
+
+            Call this when the points of obj (the model, or one of its children) change, or when the model's
+            children change (pass the parent). With no argument, all cached bounds are discarded
+        '''
+        if self._boundsCache is None:
+            return
+        if obj is None:
+            self._boundsCache = None
+            return
+        self._boundsCache['objects'].pop(id(obj), None)
+        self._boundsCache['bounds'] = None
 
     def isColliding(self, other):
-        ''' Test for collision with the another AABB, aptly named, "other"
+        ''' Test for collision with the another AABB, aptly named, "other" (other geometry types, e.g. BoundingSphere,
+            go through the narrowphase dispatch table)
         '''
+        if other._type != CollisionGeomType.aabb:
+            return narrowphase.isColliding(self, other)
+
         # Note: This code is optimized for readability, not performance
         if self._maxPt[0] < other._minPt[0] or self._minPt[0] > other._maxPt[0]:
             return False
@@ -85,11 +158,17 @@ class AABB(GameObj):    # TODO decide.. should collision geometry derive from Ga
     # NOTE: CollisionAABB doesn't have an update() method because 'updates' will be handled by the objects that own the AABB
 
 
-    def draw(self, surface, matView=matrix.Matrix.matIdent(), matViewport=matrix.Matrix.matIdent()):
+    def draw(self, surface, matView=matrix.Matrix.matIdent(), matViewport=matrix.Matrix.matIdent(), frustum=None, color=BOX_COLOR):
         ''' Draw the AABB
 
             Note: Here we draw a line wireframe. We're not concerned with vertex order or hidden surface or any of that crap.
+
+            If a Frustum is given, a box that is entirely outside of it is skipped, without transforming anything. To draw
+            many boxes per frame, collect them in a DebugDraw (debug_draw module) instead
         '''
+        if frustum is not None and frustum.classifyAABB(self) == CullResult.outside:
+            return
+
         # We need:
         # Points
         # 0 = (xmin, ymin, zmin)
@@ -115,49 +194,25 @@ class AABB(GameObj):    # TODO decide.. should collision geometry derive from Ga
         # 3 - 7
 
 
-        pt0 = vector.Vector( self._minPt[0], self._minPt[1], self._minPt[2], 1.0 )
-        pt1 = vector.Vector( self._maxPt[0], self._minPt[1], self._minPt[2], 1.0 )
-        pt2 = vector.Vector( self._maxPt[0], self._maxPt[1], self._minPt[2], 1.0 )
-        pt3 = vector.Vector( self._minPt[0], self._maxPt[1], self._minPt[2], 1.0 )
-
-        pt4 = vector.Vector( self._minPt[0], self._minPt[1], self._maxPt[2], 1.0 )
-        pt5 = vector.Vector( self._maxPt[0], self._minPt[1], self._maxPt[2], 1.0 )
-        pt6 = vector.Vector( self._maxPt[0], self._maxPt[1], self._maxPt[2], 1.0 )
-        pt7 = vector.Vector( self._minPt[0], self._maxPt[1], self._maxPt[2], 1.0 )
-
-        tpt0 = matrix.mMultvec(matView, pt0)    # the tpt0 means "transformed pt0"
-        tpt1 = matrix.mMultvec(matView, pt1)
-        tpt2 = matrix.mMultvec(matView, pt2)
-        tpt3 = matrix.mMultvec(matView, pt3)
-        tpt4 = matrix.mMultvec(matView, pt4)
-        tpt5 = matrix.mMultvec(matView, pt5)
-        tpt6 = matrix.mMultvec(matView, pt6)
-        tpt7 = matrix.mMultvec(matView, pt7)
-
-        vptpt0 = matrix.mMultvec(matViewport, tpt0)    # the vptpt0 means "viewport transformed pt0" (btw, all of this rendering code is terrible and should be taken out back and shot)
-        vptpt1 = matrix.mMultvec(matViewport, tpt1)
-        vptpt2 = matrix.mMultvec(matViewport, tpt2)
-        vptpt3 = matrix.mMultvec(matViewport, tpt3)
-        vptpt4 = matrix.mMultvec(matViewport, tpt4)
-        vptpt5 = matrix.mMultvec(matViewport, tpt5)
-        vptpt6 = matrix.mMultvec(matViewport, tpt6)
-        vptpt7 = matrix.mMultvec(matViewport, tpt7)
-
-
-
-        color = (0, 192, 0) # TODO eventually un-hardcode the debug draw color
-        pygame.draw.line( surface, color, (vptpt0[0], vptpt0[1]), (vptpt1[0], vptpt1[1]) )  # TODO - project 3D to 2D
-        pygame.draw.line( surface, color, (vptpt1[0], vptpt1[1]), (vptpt2[0], vptpt2[1]) )
-        pygame.draw.line( surface, color, (vptpt2[0], vptpt2[1]), (vptpt3[0], vptpt3[1]) )
-        pygame.draw.line( surface, color, (vptpt3[0], vptpt3[1]), (vptpt0[0], vptpt0[1]) )
-
-        pygame.draw.line( surface, color, (vptpt4[0], vptpt4[1]), (vptpt5[0], vptpt5[1]) )
-        pygame.draw.line( surface, color, (vptpt5[0], vptpt5[1]), (vptpt6[0], vptpt6[1]) )
-        pygame.draw.line( surface, color, (vptpt6[0], vptpt6[1]), (vptpt7[0], vptpt7[1]) )
-        pygame.draw.line( surface, color, (vptpt7[0], vptpt7[1]), (vptpt4[0], vptpt4[1]) )
-
-        pygame.draw.line( surface, color, (vptpt0[0], vptpt0[1]), (vptpt4[0], vptpt4[1]) )
-        pygame.draw.line( surface, color, (vptpt1[0], vptpt1[1]), (vptpt5[0], vptpt5[1]) )
-        pygame.draw.line( surface, color, (vptpt2[0], vptpt2[1]), (vptpt6[0], vptpt6[1]) )
-        pygame.draw.line( surface, color, (vptpt3[0], vptpt3[1]), (vptpt7[0], vptpt7[1]) )
+        xmin, ymin, zmin = self._minPt
+        xmax, ymax, zmax = self._maxPt
+
+        corners = vector_batch.VectorBatch(8, False)   # (Flat storage: the unpacking below depends on it)
+        corners.data[:] = array('d', [ xmin, ymin, zmin, 1.0
+                                     , xmax, ymin, zmin, 1.0
+                                     , xmax, ymax, zmin, 1.0
+                                     , xmin, ymax, zmin, 1.0
+                                     , xmin, ymin, zmax, 1.0
+                                     , xmax, ymin, zmax, 1.0
+                                     , xmax, ymax, zmax, 1.0
+                                     , xmin, ymax, zmax, 1.0 ])
+
+        # Transform all 8 corners by the view and then the viewport matrix, in one pass, in-place
+        matrix.mMultvecBatch(matView, corners, out=corners, matPost=matViewport)
+        d = corners.data
+
+        vptpts = list(zip(d[0::4], d[1::4]))   # The viewport-transformed points, (x, y)
+
+        # One polyline along all 12 edges, instead of 12 separate lines
+        pygame.draw.lines(surface, color, False, _boxEdgePath(vptpts))
 
@@ -0,0 +1,259 @@
+#############################################################################
+# Copyright 2016 Mass KonFuzion
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#############################################################################
+
+"""
+Batched AABBs (packed min/max corners), and a many-vs-many overlap kernel
+
+An AABBBatch stores N boxes as one N x 6 block of doubles (xmin, ymin, zmin, xmax, ymax, zmax per box): a flat
+array('d'), or an N x 6 numpy array, following the math backend, just like VectorBatch. pack() fills it from a list
+of AABB objects, reusing the same storage from frame to frame.
+
+aabbOverlapPairs finds every overlapping pair between two batches (or within one batch), by the same rule as
+AABB.isColliding (touching counts), in one call:
+
+* NumPy batches: the same sort-and-sweep, vectorized: blocks of boxes are tested against all the boxes they can
+  overlap in x, with broadcast comparisons
+* array('d') batches: a plain Python sort-and-sweep along x, so only boxes that overlap in x are ever compared
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right
+from operator import attrgetter, itemgetter
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from pymkfgame.mkfmath import backend
+
+_getMinPt = attrgetter('_minPt')
+_getMaxPt = attrgetter('_maxPt')
+
+BLOCK_ROWS = 128            # NumPy path: rows of a tested per set of broadcast comparisons
+CHUNK_ELEMENTS = 1 << 20    # NumPy path: max size of each temporary (rows x columns) comparison matrix
+
+class AABBBatch(object):
+    def __init__(self, n=0, use_numpy=None):
+        """ Initialize a batch of n empty (all-zero) boxes
+
+            If use_numpy is True, the batch is stored in an N x 6 numpy array (NumPy must be installed); if False,
+            in an array('d'). If None, the selected math backend decides
+        """
+        if use_numpy is None:
+            use_numpy = backend.useNumpy()
+        if use_numpy and numpy is None:
+            raise Exception("AABBBatch: NumPy storage was requested, but NumPy is not installed")
+
+        self.isNumpy = bool(use_numpy)
+        self.n = 0
+        if self.isNumpy:
+            self._buffer = numpy.zeros((int(n), 6))    # The allocated rows; self.data is a view of the first n
+        else:
+            self.data = array('d')
+        self._resize(int(n))
+
+    def _resize(self, n):
+        """ Make the batch hold n boxes, keeping the allocated storage whenever possible """
+        if self.isNumpy:
+            if len(self._buffer) < n:
+                self._buffer = numpy.zeros((max(n, 2 * len(self._buffer)), 6))
+            self.data = self._buffer[:n]
+        else:
+            size = 6 * n
+            if len(self.data) > size:
+                del self.data[size:]
+            elif len(self.data) < size:
+                self.data.extend(array('d', [0.0]) * (size - len(self.data)))
+        self.n = n
+
+    def __len__(self):
+        return self.n
+
+    def __str__(self):
+        return "AABBBatch(n={}, numpy={})".format(self.n, self.isNumpy)
+
+    def pack(self, boxes):
+        """ Copy the bounds of every box in the list boxes (AABBs, or anything with _minPt and _maxPt) into the batch
+
+            Box i goes into row i. The storage is reused (it only grows when there are more boxes than ever before),
+            so packing every frame doesn't reallocate
+        """
+        self._resize(len(boxes))
+        if self.n == 0:
+            return self
+
+        mins = list(map(_getMinPt, boxes))
+        maxs = list(map(_getMaxPt, boxes))
+
+        if self.isNumpy:
+            self.data[:, 0:3] = mins
+            self.data[:, 3:6] = maxs
+        else:
+            d = self.data
+            for c in range(0, 3):
+                d[c::6] = array('d', map(itemgetter(c), mins))
+                d[c + 3::6] = array('d', map(itemgetter(c), maxs))
+        return self
+
+    def setBox(self, i, minPt, maxPt):
+        """ Set the bounds of box i """
+        if self.isNumpy:
+            self.data[i] = (minPt[0], minPt[1], minPt[2], maxPt[0], maxPt[1], maxPt[2])
+        else:
+            base = 6 * i
+            self.data[base:base + 6] = array('d', (minPt[0], minPt[1], minPt[2], maxPt[0], maxPt[1], maxPt[2]))
+
+    def getBox(self, i):
+        """ Return the bounds of box i, as (minPt, maxPt) tuples """
+        if self.isNumpy:
+            r = [ float(c) for c in self.data[i] ]
+        else:
+            r = self.data[6 * i:6 * i + 6]
+        return (r[0], r[1], r[2]), (r[3], r[4], r[5])
+
+    @staticmethod
+    def fromCorners(c0, c1):
+        """ Return a new AABBBatch where box i spans corners c0[i] and c1[i] (two VectorBatches, with the same size
+            and storage; the corners can be in any order)
+        """
+        batch = AABBBatch(c0.n, c0.isNumpy)
+        if batch.isNumpy:
+            numpy.minimum(c0.data[:, :3], c1.data[:, :3], out=batch.data[:, 0:3])
+            numpy.maximum(c0.data[:, :3], c1.data[:, :3], out=batch.data[:, 3:6])
+        else:
+            d = batch.data
+            for c in range(0, 3):
+                a = c0.data[c::4]
+                b = c1.data[c::4]
+                d[c::6] = array('d', map(min, a, b))
+                d[c + 3::6] = array('d', map(max, a, b))
+        return batch
+
+## ======================
+
+def aabbOverlapPairs(a, b=None):
+    """ Return the index pairs (i, j) of every box a[i] that overlaps box b[j]
+
+        a and b must have the same storage. If b is None, a is tested against itself, and each overlapping pair is
+        returned once, with i < j.
+
+        The result is a K x 2 numpy int array for NumPy batches (pairs in row-major order), or a list of (i, j)
+        tuples for array('d') batches (pairs in no particular order)
+    """
+    if a.isNumpy:
+        return _overlapPairsNumpy(a, b)
+    return _overlapPairsSweep(a, b)
+
+def _overlapPairsNumpy(a, b):
+    """ Sort-and-sweep along x, vectorized: with both sets sorted by xmin, the boxes that can overlap a block of
+        consecutive (sorted) rows of a form one contiguous range of (sorted) b, found with searchsorted. Each block
+        of rows is tested against its range in one set of broadcast comparisons
+    """
+    selfTest = b is None
+    empty = numpy.zeros((0, 2), dtype=numpy.intp)
+    if a.n == 0 or (not selfTest and b.n == 0):
+        return empty
+
+    orderA = numpy.argsort(a.data[:, 0], kind='mergesort')
+    A = a.data[orderA]
+    if selfTest:
+        orderB = orderA
+        B = A
+    else:
+        orderB = numpy.argsort(b.data[:, 0], kind='mergesort')
+        B = b.data[orderB]
+    bx0, by0, bz0, bx1, by1, bz1 = [ B[:, c] for c in range(0, 6) ]
+
+    # A box in b overlaps a block of rows in x only if its xmin is <= the largest xmax in the block, and its xmax
+    # is >= the smallest xmin in the block (so its xmin is >= that, minus the widest box in b)
+    ax1Max = numpy.maximum.accumulate(A[:, 3])
+    maxWidthB = float((bx1 - bx0).max())
+    rowsPerBlock = max(1, min(BLOCK_ROWS, CHUNK_ELEMENTS // len(B)))
+
+    results = []
+    for r0 in range(0, a.n, rowsPerBlock):
+        r1 = min(r0 + rowsPerBlock, a.n)
+        c1 = int(numpy.searchsorted(bx0, ax1Max[r1 - 1], side='right'))
+        if selfTest:
+            c0 = r0 + 1     # Only pairs (row, column) with column > row, so each pair is found once
+        else:
+            c0 = int(numpy.searchsorted(bx0, A[r0, 0] - maxWidthB, side='left'))
+        if c0 >= c1:
+            continue
+
+        rows = A[r0:r1]
+        mask = ( (rows[:, 0:1] <= bx1[numpy.newaxis, c0:c1]) & (rows[:, 3:4] >= bx0[numpy.newaxis, c0:c1])
+               & (rows[:, 1:2] <= by1[numpy.newaxis, c0:c1]) & (rows[:, 4:5] >= by0[numpy.newaxis, c0:c1])
+               & (rows[:, 2:3] <= bz1[numpy.newaxis, c0:c1]) & (rows[:, 5:6] >= bz0[numpy.newaxis, c0:c1]) )
+        if selfTest:
+            mask &= numpy.arange(c0, c1)[numpy.newaxis, :] > numpy.arange(r0, r1)[:, numpy.newaxis]
+
+        i, j = numpy.nonzero(mask)
+        if len(i):
+            results.append(numpy.column_stack((orderA[i + r0], orderB[j + c0])))
+
+    if not results:
+        return empty
+    pairs = numpy.concatenate(results)
+    if selfTest:
+        pairs.sort(axis=1)      # Sorted positions -> original indexes, with i < j
+    return pairs
+
+def _sortedRows(batch):
+    """ Return (order, rows, xmins): the box indexes sorted by xmin, the boxes (6-tuples) in that order, and their
+        xmins
+    """
+    d = batch.data
+    order = sorted(range(0, batch.n), key=d[0::6].__getitem__)
+    rows = [ tuple(d[6 * i:6 * i + 6]) for i in order ]
+    return order, rows, [ r[0] for r in rows ]
+
+def _overlapPairsSweep(a, b):
+    """ Sort-and-sweep along x. With the boxes sorted by xmin, the boxes whose xmin falls within a box's x range are
+        one contiguous run (found with bisect); only those are tested in y and z
+    """
+    pairs = []
+    orderA, rowsA, xsA = _sortedRows(a)
+
+    if b is None:
+        for p in range(0, a.n):
+            r = rowsA[p]
+            i = orderA[p]
+            y0, z0, x1, y1, z1 = r[1], r[2], r[3], r[4], r[5]
+            for q in range(p + 1, bisect_right(xsA, x1, p + 1)):
+                s = rowsA[q]
+                if s[1] <= y1 and s[4] >= y0 and s[2] <= z1 and s[5] >= z0:
+                    j = orderA[q]
+                    pairs.append((i, j) if i < j else (j, i))
+        return pairs
+
+    # Two sets: a box from each overlaps in x iff the xmin of one is within the x range of the other. Find the pairs
+    # where b's xmin is in [a's xmin, a's xmax], then the ones where a's xmin is in (b's xmin, b's xmax]
+    orderB, rowsB, xsB = _sortedRows(b)
+    for rows, order, xs, otherRows, otherOrder, otherXs, fromA in ( (rowsA, orderA, xsA, rowsB, orderB, xsB, True)
+                                                                 , (rowsB, orderB, xsB, rowsA, orderA, xsA, False) ):
+        find = bisect_left if fromA else bisect_right
+        for p in range(0, len(rows)):
+            r = rows[p]
+            i = order[p]
+            y0, z0, x1, y1, z1 = r[1], r[2], r[3], r[4], r[5]
+            for q in range(find(otherXs, r[0]), bisect_right(otherXs, x1)):
+                s = otherRows[q]
+                if s[1] <= y1 and s[4] >= y0 and s[2] <= z1 and s[5] >= z0:
+                    j = otherOrder[q]
+                    pairs.append((i, j) if fromA else (j, i))
+    return pairs
@@ -0,0 +1,469 @@
+#############################################################################
+# Copyright 2016 Mass KonFuzion
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#############################################################################
+
+"""
+Dynamic AABB tree (a bounding volume hierarchy)
+
+Every box is a leaf of a binary tree; every internal node bounds its two children. Queries (region, overlap, ray)
+skip whole subtrees whose bounds they miss, so they cost O(log n) for a balanced tree, instead of O(n).
+
+Leaves store "fat" bounds: the box's bounds, enlarged by a margin on every side. As long as a box stays inside its
+fat bounds, moving it costs nothing; only when it leaves them is it removed and re-inserted. That makes the tree good
+for mixed static/dynamic worlds: static boxes never touch the tree again, and small movements rarely do.
+
+New leaves are placed next to the sibling that grows the tree's total surface area the least (the surface area
+heuristic), and the tree is kept balanced with AVL-style rotations, so the height stays O(log n) no matter what
+order the boxes are inserted in.
+
+The nodes live in parallel lists, indexed by node number; the handle of a box is the number of its leaf node.
+"""
+
+from pymkfgame.collision.dist_and_xsect import _raySlab
+
+_NULL = -1
+
+def _union(a, b):
+    return [ a[0] if a[0] < b[0] else b[0], a[1] if a[1] < b[1] else b[1], a[2] if a[2] < b[2] else b[2]
+           , a[3] if a[3] > b[3] else b[3], a[4] if a[4] > b[4] else b[4], a[5] if a[5] > b[5] else b[5] ]
+
+def _area(b):
+    """ Return the surface area of bounds b (x0, y0, z0, x1, y1, z1) """
+    dx = b[3] - b[0]
+    dy = b[4] - b[1]
+    dz = b[5] - b[2]
+    return 2.0 * (dx * dy + dy * dz + dz * dx)
+
+class AABBTree(object):
+    def __init__(self, margin=0.1):
+        """ Initialize an empty tree. margin is the distance that fat bounds extend past each box, on every side """
+        self.margin = float(margin)
+        self._root = _NULL
+
+        self._bounds = []       # node -> [x0, y0, z0, x1, y1, z1]. Fat bounds for leaves
+        self._parent = []
+        self._child1 = []       # _NULL for leaves
+        self._child2 = []
+        self._height = []       # 0 for leaves; -1 for free nodes
+        self._boxes = []        # node -> box, for leaves (None otherwise)
+        self._freeNodes = []
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def getHeight(self):
+        """ Return the height of the tree (0 for a tree with 1 box, or none) """
+        return 0 if self._root == _NULL else self._height[self._root]
+
+    def getBox(self, h):
+        """ Return the box with handle h """
+        return self._boxes[h]
+
+    def getFatBounds(self, h):
+        """ Return the fat bounds of the box with handle h, as [x0, y0, z0, x1, y1, z1] (read-only) """
+        return self._bounds[h]
+
+    ## ----------------------------------------------------------------------
+    ## Node management
+
+    def _allocateNode(self):
+        if self._freeNodes:
+            node = self._freeNodes.pop()
+            self._parent[node] = _NULL
+            self._child1[node] = _NULL
+            self._child2[node] = _NULL
+            self._height[node] = 0
+            return node
+
+        self._bounds.append(None)
+        self._parent.append(_NULL)
+        self._child1.append(_NULL)
+        self._child2.append(_NULL)
+        self._height.append(0)
+        self._boxes.append(None)
+        return len(self._parent) - 1
+
+    def _freeNode(self, node):
+        self._bounds[node] = None
+        self._boxes[node] = None
+        self._height[node] = -1
+        self._freeNodes.append(node)
+
+    def _fatBounds(self, box):
+        m = self.margin
+        mn = box._minPt
+        mx = box._maxPt
+        return [ mn[0] - m, mn[1] - m, mn[2] - m, mx[0] + m, mx[1] + m, mx[2] + m ]
+
+    def _refit(self, node):
+        """ Recompute the height and bounds of internal node from its children """
+        c1 = self._child1[node]
+        c2 = self._child2[node]
+        h1 = self._height[c1]
+        h2 = self._height[c2]
+        self._height[node] = 1 + (h1 if h1 > h2 else h2)
+        self._bounds[node] = _union(self._bounds[c1], self._bounds[c2])
+
+    def _replaceChild(self, parent, oldChild, newChild):
+        if parent == _NULL:
+            self._root = newChild
+        elif self._child1[parent] == oldChild:
+            self._child1[parent] = newChild
+        else:
+            self._child2[parent] = newChild
+
+    def _insertLeaf(self, leaf):
+        if self._root == _NULL:
+            self._root = leaf
+            self._parent[leaf] = _NULL
+            return
+
+        bounds = self._bounds
+        child1 = self._child1
+        child2 = self._child2
+        leafBounds = bounds[leaf]
+
+        # Find the best sibling: walk down, choosing the child that increases the total surface area the least
+        index = self._root
+        while child1[index] != _NULL:
+            area = _area(bounds[index])
+            combinedArea = _area(_union(bounds[index], leafBounds))
+
+            cost = 2.0 * combinedArea                       # Cost of making a new parent for this node and the leaf
+            inheritanceCost = 2.0 * (combinedArea - area)   # Cost of pushing the leaf further down the tree
+
+            costs = []
+            for child in (child1[index], child2[index]):
+                childCost = _area(_union(leafBounds, bounds[child])) + inheritanceCost
+                if child1[child] != _NULL:
+                    childCost -= _area(bounds[child])
+                costs.append(childCost)
+
+            if cost < costs[0] and cost < costs[1]:
+                break
+            index = child1[index] if costs[0] < costs[1] else child2[index]
+
+        # Make a new parent for the sibling and the leaf
+        sibling = index
+        oldParent = self._parent[sibling]
+        newParent = self._allocateNode()
+        self._parent[newParent] = oldParent
+        bounds[newParent] = _union(leafBounds, bounds[sibling])
+        self._height[newParent] = self._height[sibling] + 1
+
+        self._replaceChild(oldParent, sibling, newParent)
+        child1[newParent] = sibling
+        child2[newParent] = leaf
+        self._parent[sibling] = newParent
+        self._parent[leaf] = newParent
+
+        self._rebalanceFrom(self._parent[leaf])
+
+    def _removeLeaf(self, leaf):
+        if leaf == self._root:
+            self._root = _NULL
+            return
+
+        parent = self._parent[leaf]
+        grandParent = self._parent[parent]
+        sibling = self._child2[parent] if self._child1[parent] == leaf else self._child1[parent]
+
+        # Replace the parent with the sibling
+        self._replaceChild(grandParent, parent, sibling)
+        self._parent[sibling] = grandParent
+        self._freeNode(parent)
+
+        self._rebalanceFrom(grandParent)
+
+    def _rebalanceFrom(self, index):
+        """ Walk from node index up to the root, rebalancing and refitting each node """
+        while index != _NULL:
+            index = self._balance(index)
+            self._refit(index)
+            index = self._parent[index]
+
+    def _balance(self, iA):
+        """ If node iA is unbalanced (its children's heights differ by more than 1), rotate the taller child up
+
+            Returns the node that is now at iA's old place in the tree
+        """
+        child1 = self._child1
+        child2 = self._child2
+        parent = self._parent
+        height = self._height
+        bounds = self._bounds
+
+        if child1[iA] == _NULL or height[iA] < 2:
+            return iA
+
+        iB = child1[iA]
+        iC = child2[iA]
+        balance = height[iC] - height[iB]
+
+        if balance > 1:
+            # Rotate C up. C's taller child stays with C; the shorter one moves to A
+            iF = child1[iC]
+            iG = child2[iC]
+
+            child1[iC] = iA
+            parent[iC] = parent[iA]
+            parent[iA] = iC
+            self._replaceChild(parent[iC], iA, iC)
+
+            if height[iF] > height[iG]:
+                child2[iC] = iF
+                child2[iA] = iG
+                parent[iG] = iA
+            else:
+                child2[iC] = iG
+                child2[iA] = iF
+                parent[iF] = iA
+            self._refit(iA)
+            self._refit(iC)
+            return iC
+
+        if balance < -1:
+            # Rotate B up
+            iD = child1[iB]
+            iE = child2[iB]
+
+            child1[iB] = iA
+            parent[iB] = parent[iA]
+            parent[iA] = iB
+            self._replaceChild(parent[iB], iA, iB)
+
+            if height[iD] > height[iE]:
+                child2[iB] = iD
+                child1[iA] = iE
+                parent[iE] = iA
+            else:
+                child2[iB] = iE
+                child1[iA] = iD
+                parent[iD] = iA
+            self._refit(iA)
+            self._refit(iB)
+            return iB
+
+        return iA
+
+    ## ----------------------------------------------------------------------
+    ## Public interface
+
+    def insert(self, box):
+        """ Add box (an AABB, or anything with _minPt and _maxPt) to the tree. Return its integer handle """
+        leaf = self._allocateNode()
+        self._bounds[leaf] = self._fatBounds(box)
+        self._boxes[leaf] = box
+        self._insertLeaf(leaf)
+        self._count += 1
+        return leaf
+
+    def remove(self, h):
+        """ Remove the box with handle h from the tree """
+        if self._boxes[h] is None:
+            raise Exception("AABBTree.remove: handle {} is not in use".format(h))
+        self._removeLeaf(h)
+        self._freeNode(h)
+        self._count -= 1
+
+    def update(self, h):
+        """ Update the tree after the box with handle h has moved
+
+            If the box is still inside its fat bounds, nothing changes. Otherwise, it is re-inserted with new fat
+            bounds. Returns True if it was re-inserted
+        """
+        box = self._boxes[h]
+        fat = self._bounds[h]
+        mn = box._minPt
+        mx = box._maxPt
+        if fat[0] <= mn[0] and fat[1] <= mn[1] and fat[2] <= mn[2] and mx[0] <= fat[3] and mx[1] <= fat[4] and mx[2] <= fat[5]:
+            return False
+
+        self._removeLeaf(h)
+        self._bounds[h] = self._fatBounds(box)
+        self._insertLeaf(h)
+        return True
+
+    def queryRegion(self, minPt, maxPt, out=None):
+        """ Return a list of the handles of all boxes that overlap the region minPt - maxPt
+
+            Boxes overlap by the same rule as AABB.isColliding (touching counts). If out is given (a list), it is
+            cleared, and the handles are written into it
+        """
+        if out is None:
+            out = []
+        else:
+            del out[:]
+        if self._root == _NULL:
+            return out
+
+        x0, y0, z0 = minPt[0], minPt[1], minPt[2]
+        x1, y1, z1 = maxPt[0], maxPt[1], maxPt[2]
+        bounds = self._bounds
+        child1 = self._child1
+        child2 = self._child2
+        boxes = self._boxes
+
+        stack = [ self._root ]
+        while stack:
+            node = stack.pop()
+            b = bounds[node]
+            if b[3] < x0 or b[0] > x1 or b[4] < y0 or b[1] > y1 or b[5] < z0 or b[2] > z1:
+                continue
+
+            if child1[node] == _NULL:
+                # Fat bounds overlap; check the box itself
+                mn = boxes[node]._minPt
+                mx = boxes[node]._maxPt
+                if not (mx[0] < x0 or mn[0] > x1 or mx[1] < y0 or mn[1] > y1 or mx[2] < z0 or mn[2] > z1):
+                    out.append(node)
+            else:
+                stack.append(child1[node])
+                stack.append(child2[node])
+        return out
+
+    def queryOverlaps(self, h, out=None):
+        """ Return a list of the handles of all other boxes that overlap the box with handle h (see queryRegion) """
+        box = self._boxes[h]
+        out = self.queryRegion(box._minPt, box._maxPt, out)
+        out.remove(h)
+        return out
+
+    def computePairs(self, out=None):
+        """ Return a list of (handleA, handleB) pairs (handleA < handleB) of boxes that overlap
+
+            If out is given (a list), it is cleared, and the pairs are written into it
+        """
+        if out is None:
+            out = []
+        else:
+            del out[:]
+        if self._root == _NULL:
+            return out
+
+        bounds = self._bounds
+        child1 = self._child1
+        child2 = self._child2
+        height = self._height
+        boxes = self._boxes
+
+        # Any two leaves meet at exactly one internal node (their lowest common ancestor), one under each child.
+        # So, test the two subtrees of every internal node against each other, descending only where the node
+        # bounds overlap
+        stack = []
+        nodes = [ self._root ]
+        while nodes:
+            node = nodes.pop()
+            if child1[node] != _NULL:
+                stack.append((child1[node], child2[node]))
+                nodes.append(child1[node])
+                nodes.append(child2[node])
+
+        while stack:
+            a, b = stack.pop()
+            ba = bounds[a]
+            bb = bounds[b]
+            if ba[3] < bb[0] or ba[0] > bb[3] or ba[4] < bb[1] or ba[1] > bb[4] or ba[5] < bb[2] or ba[2] > bb[5]:
+                continue
+
+            aIsLeaf = child1[a] == _NULL
+            bIsLeaf = child1[b] == _NULL
+            if aIsLeaf and bIsLeaf:
+                amin = boxes[a]._minPt
+                amax = boxes[a]._maxPt
+                bmin = boxes[b]._minPt
+                bmax = boxes[b]._maxPt
+                if not (amax[0] < bmin[0] or amin[0] > bmax[0] or amax[1] < bmin[1] or amin[1] > bmax[1] or amax[2] < bmin[2] or amin[2] > bmax[2]):
+                    out.append((a, b) if a < b else (b, a))
+            elif bIsLeaf or (not aIsLeaf and height[a] >= height[b]):
+                stack.append((child1[a], b))
+                stack.append((child2[a], b))
+            else:
+                stack.append((a, child1[b]))
+                stack.append((a, child2[b]))
+        return out
+
+    def rayCast(self, origin, direction, max_t=float('inf')):
+        """ Return (t, handle) for the first box hit by the ray origin + t*direction (0 <= t <= max_t), or None
+
+            E.g., for mouse picking, cast a ray from the camera; for line of sight between points p and q, cast from
+            p with direction q - p and max_t = 1.0 (anything hit is in the way). A ray that starts inside a box hits
+            it at t = 0.0
+        """
+        if self._root == _NULL:
+            return None
+
+        bounds = self._bounds
+        child1 = self._child1
+        child2 = self._child2
+        boxes = self._boxes
+        best = None
+        bestT = max_t
+
+        stack = [ self._root ]
+        while stack:
+            node = stack.pop()
+            if _raySlab(origin, direction, bounds[node], bestT) is None:
+                continue
+
+            if child1[node] == _NULL:
+                box = boxes[node]
+                t = _raySlab(origin, direction, box._minPt + box._maxPt, bestT)
+                if t is not None and (best is None or t < bestT):
+                    best = node
+                    bestT = t
+            else:
+                stack.append(child1[node])
+                stack.append(child2[node])
+
+        if best is None:
+            return None
+        return (bestT, best)
+
+    def rayCastAll(self, origin, direction, max_t=float('inf'), out=None):
+        """ Return a list of (t, handle) for every box hit by the ray (see rayCast), sorted by t
+
+            If out is given (a list), it is cleared, and the hits are written into it
+        """
+        if out is None:
+            out = []
+        else:
+            del out[:]
+        if self._root == _NULL:
+            return out
+
+        bounds = self._bounds
+        child1 = self._child1
+        child2 = self._child2
+        boxes = self._boxes
+
+        stack = [ self._root ]
+        while stack:
+            node = stack.pop()
+            if _raySlab(origin, direction, bounds[node], max_t) is None:
+                continue
+
+            if child1[node] == _NULL:
+                box = boxes[node]
+                t = _raySlab(origin, direction, box._minPt + box._maxPt, max_t)
+                if t is not None:
+                    out.append((t, node))
+            else:
+                stack.append(child1[node])
+                stack.append(child2[node])
+
+        out.sort()
+        return out
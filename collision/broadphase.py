@@ -0,0 +1,227 @@
+#############################################################################
+# Copyright 2016 Mass KonFuzion
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#############################################################################
+
+"""
+Broadphase collision detection: find the pairs of AABBs that overlap, without testing every box against every other
+
+SpatialHashGrid divides space into uniform cubic cells, and indexes each box by the cells it covers. Only boxes
+that share a cell are ever tested against each other. The grid is unbounded (cells are stored in a dict, so empty
+cells cost nothing).
+
+Pick the cell size to be about the size of a typical box: much smaller, and each box covers many cells; much bigger,
+and many unrelated boxes share each cell.
+"""
+
+from math import floor
+
+class SpatialHashGrid(object):
+    def __init__(self, cell_size=1.0):
+        self.cellSize = float(cell_size)
+        self._invCellSize = 1.0 / self.cellSize
+
+        self._cells = {}            # (ix, iy, iz) -> list of the handles of boxes that cover that cell
+        self._boxes = []            # handle -> box (None for free handles)
+        self._ranges = []           # handle -> (ix0, iy0, iz0, ix1, iy1, iz1), the range of cells the box covers
+        self._freeHandles = []
+        self._count = 0
+
+        # Stats from the most recent computePairs() call
+        self.stats = { 'objects': 0
+                     , 'cells': 0               # Number of occupied cells
+                     , 'maxCellOccupancy': 0    # Most boxes in any one cell
+                     , 'avgCellOccupancy': 0.0  # Mean number of boxes per occupied cell
+                     , 'candidatePairs': 0      # Number of box-vs-box tests done
+                     , 'pairs': 0               # Number of overlapping pairs found
+                     }
+
+    def __len__(self):
+        return self._count
+
+    def _cellRange(self, box):
+        inv = self._invCellSize
+        mn = box._minPt
+        mx = box._maxPt
+        return ( int(floor(mn[0] * inv)), int(floor(mn[1] * inv)), int(floor(mn[2] * inv))
+               , int(floor(mx[0] * inv)), int(floor(mx[1] * inv)), int(floor(mx[2] * inv)) )
+
+    def _addToCells(self, h, rng):
+        cells = self._cells
+        for ix in range(rng[0], rng[3] + 1):
+            for iy in range(rng[1], rng[4] + 1):
+                for iz in range(rng[2], rng[5] + 1):
+                    key = (ix, iy, iz)
+                    cell = cells.get(key)
+                    if cell is None:
+                        cells[key] = [h]
+                    else:
+                        cell.append(h)
+
+    def _removeFromCells(self, h, rng):
+        cells = self._cells
+        for ix in range(rng[0], rng[3] + 1):
+            for iy in range(rng[1], rng[4] + 1):
+                for iz in range(rng[2], rng[5] + 1):
+                    key = (ix, iy, iz)
+                    cell = cells[key]
+                    cell.remove(h)
+                    if not cell:
+                        del cells[key]
+
+    def insert(self, box):
+        """ Add box (an AABB, or anything with _minPt and _maxPt) to the grid. Return its integer handle
+
+            Handles of removed boxes are reused
+        """
+        rng = self._cellRange(box)
+        if self._freeHandles:
+            h = self._freeHandles.pop()
+            self._boxes[h] = box
+            self._ranges[h] = rng
+        else:
+            h = len(self._boxes)
+            self._boxes.append(box)
+            self._ranges.append(rng)
+
+        self._addToCells(h, rng)
+        self._count += 1
+        return h
+
+    def update(self, h):
+        """ Re-index the box with handle h, after its bounds have changed
+
+            Returns True if the box moved into a different set of cells. Small moves within the same cells cost
+            only the cell range computation
+        """
+        rng = self._cellRange(self._boxes[h])
+        oldRng = self._ranges[h]
+        if rng == oldRng:
+            return False
+
+        self._removeFromCells(h, oldRng)
+        self._addToCells(h, rng)
+        self._ranges[h] = rng
+        return True
+
+    def updateAll(self):
+        """ Re-index every box in the grid (see update) """
+        for h in range(0, len(self._boxes)):
+            if self._boxes[h] is not None:
+                self.update(h)
+
+    def remove(self, h):
+        """ Remove the box with handle h from the grid """
+        if self._boxes[h] is None:
+            raise Exception("SpatialHashGrid.remove: handle {} is not in use".format(h))
+
+        self._removeFromCells(h, self._ranges[h])
+        self._boxes[h] = None
+        self._ranges[h] = None
+        self._freeHandles.append(h)
+        self._count -= 1
+
+    def getBox(self, h):
+        """ Return the box with handle h """
+        return self._boxes[h]
+
+    def query(self, minPt, maxPt, out=None):
+        """ Return a list of the handles of all boxes that overlap the region minPt - maxPt
+
+            If out is given (a list), it is cleared, and the handles are written into it
+        """
+        if out is None:
+            out = []
+        else:
+            del out[:]
+
+        inv = self._invCellSize
+        cells = self._cells
+        boxes = self._boxes
+        seen = set()
+
+        for ix in range(int(floor(minPt[0] * inv)), int(floor(maxPt[0] * inv)) + 1):
+            for iy in range(int(floor(minPt[1] * inv)), int(floor(maxPt[1] * inv)) + 1):
+                for iz in range(int(floor(minPt[2] * inv)), int(floor(maxPt[2] * inv)) + 1):
+                    cell = cells.get((ix, iy, iz))
+                    if cell is None:
+                        continue
+                    for h in cell:
+                        if h in seen:
+                            continue
+                        seen.add(h)
+                        mn = boxes[h]._minPt
+                        mx = boxes[h]._maxPt
+                        if mx[0] < minPt[0] or mn[0] > maxPt[0] or mx[1] < minPt[1] or mn[1] > maxPt[1] or mx[2] < minPt[2] or mn[2] > maxPt[2]:
+                            continue
+                        out.append(h)
+        return out
+
+    def computePairs(self, out=None):
+        """ Return a list of (handleA, handleB) pairs (handleA < handleB) of boxes that overlap
+
+            Boxes overlap by the same rule as AABB.isColliding (touching counts). Each pair is reported once. If out
+            is given (a list), it is cleared, and the pairs are written into it. Also updates self.stats
+        """
+        if out is None:
+            out = []
+        else:
+            del out[:]
+
+        boxes = self._boxes
+        ranges = self._ranges
+        candidates = 0
+        maxOccupancy = 0
+        entries = 0
+
+        for key, cell in self._cells.items():
+            k = len(cell)
+            entries += k
+            if k > maxOccupancy:
+                maxOccupancy = k
+            if k < 2:
+                continue
+
+            candidates += k * (k - 1) // 2
+            cx, cy, cz = key
+            for i in range(0, k - 1):
+                a = cell[i]
+                ra = ranges[a]
+                amin = boxes[a]._minPt
+                amax = boxes[a]._maxPt
+
+                for j in range(i + 1, k):
+                    b = cell[j]
+                    bmin = boxes[b]._minPt
+                    bmax = boxes[b]._maxPt
+                    if amax[0] < bmin[0] or amin[0] > bmax[0] or amax[1] < bmin[1] or amin[1] > bmax[1] or amax[2] < bmin[2] or amin[2] > bmax[2]:
+                        continue
+
+                    # Two boxes can share several cells, so only report them from the first one (lowest ix, iy, iz)
+                    # that they share, i.e. the cell at the max of their starting cells
+                    rb = ranges[b]
+                    if (ra[0] if ra[0] > rb[0] else rb[0]) != cx or (ra[1] if ra[1] > rb[1] else rb[1]) != cy or (ra[2] if ra[2] > rb[2] else rb[2]) != cz:
+                        continue
+
+                    out.append((a, b) if a < b else (b, a))
+
+        numCells = len(self._cells)
+        stats = self.stats
+        stats['objects'] = self._count
+        stats['cells'] = numCells
+        stats['maxCellOccupancy'] = maxOccupancy
+        stats['avgCellOccupancy'] = float(entries) / numCells if numCells else 0.0
+        stats['candidatePairs'] = candidates
+        stats['pairs'] = len(out)
+        return out
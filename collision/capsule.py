@@ -0,0 +1,85 @@
+#############################################################################
+# Copyright 2016 Mass KonFuzion
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#############################################################################
+
+import math
+
+from pymkfgame.gameobj.gameobj import GameObj
+from pymkfgame.collision.common import CollisionGeomType, hierarchyPointColumns
+from pymkfgame.collision import narrowphase
+
+class Capsule(GameObj):
+    ''' A capsule: every point within _radius of the segment _p0 - _p1 (a cylinder with hemispherical caps)
+
+        Capsules fit long, thin objects (characters, limbs, projectiles) much more tightly than spheres, and they are
+        cheaper to test against each other than boxes that can rotate
+    '''
+    def __init__(self, p0=(0.0, 0.0, 0.0), p1=(0.0, 0.0, 0.0), radius=0.0):
+        super(Capsule, self).__init__()
+
+        self._p0 = (float(p0[0]), float(p0[1]), float(p0[2]))
+        self._p1 = (float(p1[0]), float(p1[1]), float(p1[2]))
+        self._radius = float(radius)
+        self._type = CollisionGeomType.capsule
+
+    def __str__(self):
+        return "p0:{} p1:{} radius:{} type:{}".format(self._p0, self._p1, self._radius, self._type)
+
+    def computeBounds(self, model, points_attr='_xpoints'):
+        ''' Compute a capsule bounding the model object (i.e., the points of the model and all its children; see
+            AABB.computeBounds)
+
+            The capsule's segment runs through the center of the model's AABB, along its longest side. The radius is
+            the farthest any point is from that line, and the segment is made just long enough that the end caps
+            enclose every point. A model with no points gets a zero-size capsule at the origin
+        '''
+        xs, ys, zs = hierarchyPointColumns(model, points_attr)
+        if not xs:
+            self._p0 = self._p1 = (0.0, 0.0, 0.0)
+            self._radius = 0.0
+            return
+
+        cols = (xs, ys, zs)
+        mins = [ min(c) for c in cols ]
+        maxs = [ max(c) for c in cols ]
+        center = [ 0.5 * (mins[k] + maxs[k]) for k in range(0, 3) ]
+        extents = [ maxs[k] - mins[k] for k in range(0, 3) ]
+        axis = extents.index(max(extents))
+        u = (axis + 1) % 3
+        w = (axis + 2) % 3
+
+        # Squared distance of every point from the axis line, and its offset along the axis from the center
+        cu = center[u]
+        cw = center[w]
+        ca = center[axis]
+        distSq = [ (pu - cu) ** 2 + (pw - cw) ** 2 for pu, pw in zip(cols[u], cols[w]) ]
+        radiusSq = max(distSq)
+
+        # A point at offset a along the axis is inside a cap of a segment with half-length h if
+        # (|a| - h)^2 + distSq <= radiusSq, so h must be at least |a| - sqrt(radiusSq - distSq)
+        halfLength = max([ abs(pa - ca) - math.sqrt(max(radiusSq - dSq, 0.0)) for pa, dSq in zip(cols[axis], distSq) ])
+        halfLength = max(halfLength, 0.0)
+
+        p0 = list(center)
+        p1 = list(center)
+        p0[axis] -= halfLength
+        p1[axis] += halfLength
+        self._p0 = tuple(p0)
+        self._p1 = tuple(p1)
+        self._radius = math.sqrt(radiusSq)
+
+    def isColliding(self, other):
+        ''' Test for collision with another collision geometry (of any type that the narrowphase module knows) '''
+        return narrowphase.isColliding(self, other)
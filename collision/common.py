@@ -14,6 +14,106 @@
 # limitations under the License.
 #############################################################################
 
+from operator import attrgetter
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from pymkfgame.mkfmath import vector_batch
+
 class CollisionGeomType:
     aabb = 0
-    # TODO add more types? Or otherwise, get rid of this crap? I'm not sure if we'll need it
+    sphere = 1
+    capsule = 2
+    # The narrowphase module dispatches pairwise tests on these values (see narrowphase.isColliding)
+
+def packPairKey(a, b):
+    ''' Pack a pair of handles (non-negative ints, less than 2**32) into a single int, smaller handle first
+
+        The key is the same for (a, b) and (b, a), so it can be used to store unordered pairs in sets and dicts
+    '''
+    if a > b:
+        return (b << 32) | a
+    return (a << 32) | b
+
+def unpackPairKey(key):
+    ''' Return the (smaller, larger) pair of handles packed into key by packPairKey '''
+    return key >> 32, key & 0xFFFFFFFF
+
+_getX = attrgetter('x')
+_getY = attrgetter('y')
+_getZ = attrgetter('z')
+
+def pointColumns(points):
+    ''' Return the x, y and z coordinates of points, as three lists
+
+        points can be a list of objects with .x, .y, .z (e.g. Point3D), a VectorBatch, or an N x 3 (or N x 4) numpy
+        array
+    '''
+    if isinstance(points, vector_batch.VectorBatch):
+        if points.isNumpy:
+            points = points.data
+        else:
+            data = points.data.tolist()
+            return data[0::4], data[1::4], data[2::4]
+    if numpy is not None and isinstance(points, numpy.ndarray):
+        return points[:, 0].tolist(), points[:, 1].tolist(), points[:, 2].tolist()
+    return list(map(_getX, points)), list(map(_getY, points)), list(map(_getZ, points))
+
+def hierarchyPointColumns(model, points_attr='_xpoints'):
+    ''' Return the x, y and z coordinates of the points of model and all of its descendants (see pointColumns) '''
+    xs = []
+    ys = []
+    zs = []
+    for obj_ref in walkHierarchy(model):
+        x, y, z = pointColumns(getattr(obj_ref, points_attr))
+        xs.extend(x)
+        ys.extend(y)
+        zs.extend(z)
+    return xs, ys, zs
+
+def walkHierarchy(obj, out=None):
+    ''' Return a list of obj and all of its descendants (obj.children is a dict of name -> child object)
+
+        If out is given (a list), it is cleared, and the objects are written into it
+    '''
+    if out is None:
+        out = []
+    else:
+        del out[:]
+
+    out.append(obj)
+    for node in out:    # Note, the list grows while being iterated; the loop visits every object that gets appended
+        if node.children:
+            out.extend(node.children.values())
+    return out
+
+def transformBounds(minPt, maxPt, m):
+    ''' Return the (minPt, maxPt) bounds of the box minPt - maxPt, after transforming it by the affine Matrix m
+
+        This uses Arvo's method: each component of the new bounds is the translation plus, for every matrix
+        coefficient in that row, the smaller (or larger) of coefficient * min and coefficient * max. That is exact for
+        the box's 8 corners, at the cost of 18 multiplies, instead of transforming the 8 corners (and with no
+        perspective divide; m must be affine)
+    '''
+    v = m.v
+    newMin = [ v[12], v[13], v[14] ]
+    newMax = [ v[12], v[13], v[14] ]
+
+    for col in range(0, 3):
+        lo = minPt[col]
+        hi = maxPt[col]
+        for row in range(0, 3):
+            coeff = v[col * 4 + row]
+            a = coeff * lo
+            b = coeff * hi
+            if a < b:
+                newMin[row] += a
+                newMax[row] += b
+            else:
+                newMin[row] += b
+                newMax[row] += a
+
+    return (newMin[0], newMin[1], newMin[2]), (newMax[0], newMax[1], newMax[2])
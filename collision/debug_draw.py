@@ -0,0 +1,237 @@
+#############################################################################
+# Copyright 2016 Mass KonFuzion
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#############################################################################
+
+"""
+Batched debug drawing of collision geometry
+
+A DebugDraw collects the boxes, planes, rays and line segments to show for one frame, and draws them all in one go:
+every point is transformed in a single mMultvecBatch pass (view, then viewport matrix), and each shape is drawn
+with as few pygame calls as possible. A box is one pygame.draw.lines call along BOX_EDGE_PATH (which covers all 12
+edges), instead of 12 pygame.draw.line calls.
+
+Typical use, once per frame:
+    debugDraw.addAABBs(boxes, frustum=frustum)
+    debugDraw.addRay(origin, direction, 10.0)
+    debugDraw.draw(surface, matView, matViewport)   # Also clears the collected shapes
+
+Set enabled to False to turn it off; the add* methods then return right away.
+"""
+
+import math
+from array import array
+from operator import itemgetter
+
+import pygame
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from pymkfgame.collision.frustum import CullResult
+from pymkfgame.mkfmath import backend
+from pymkfgame.mkfmath import matrix
+from pymkfgame.mkfmath import vector_batch
+
+# Box corners are numbered as in AABB.draw (0..3 go around the zmin face, and 4..7 around the zmax face, in the same
+# order). BOX_EDGE_PATH is one polyline that covers all 12 edges of the box. Every corner of a box joins 3 edges, so
+# no path can cover them all without going back over 3 of them (5-1, 6-2 and 7-3, here)
+BOX_EDGE_PATH = (0, 1, 2, 3, 0, 4, 5, 1, 5, 6, 2, 6, 7, 3, 7, 4)
+_boxEdgePath = itemgetter(*BOX_EDGE_PATH)
+
+BOX_COLOR = (0, 192, 0)
+PLANE_COLOR = (0, 128, 192)
+RAY_COLOR = (192, 192, 0)
+LINE_COLOR = (192, 192, 192)
+
+def _isAffine(m):
+    """ Return True if the bottom row of Matrix m is 0, 0, 0, 1 (so it never changes w) """
+    v = m.v
+    return v[3] == 0.0 and v[7] == 0.0 and v[11] == 0.0 and v[15] == 1.0
+
+class DebugDraw(object):
+    def __init__(self, plane_size=1.0):
+        self.enabled = True
+        self.planeSize = float(plane_size)     # Side length of the square drawn for each plane
+
+        self._points = []       # x, y, z, w of every collected point, flattened
+        self._count = 0         # Number of collected points
+
+        # color -> list of the indexes of the first point of each shape (8 corners per box; 4 corners, then the 2
+        # ends of the normal, per plane; 2 ends per line segment)
+        self._boxes = {}
+        self._planes = {}
+        self._lines = {}
+
+    def clear(self):
+        """ Remove all the collected shapes """
+        del self._points[:]
+        self._count = 0
+        self._boxes.clear()
+        self._planes.clear()
+        self._lines.clear()
+
+    def _addShape(self, shapes, color, coords):
+        """ Collect one shape of the given color, made of the points in the flat list coords (x, y, z, w each) """
+        base = self._count
+        self._points.extend(coords)
+        self._count += len(coords) // 4
+
+        indexes = shapes.get(color)
+        if indexes is None:
+            shapes[color] = [base]
+        else:
+            indexes.append(base)
+
+    def addBox(self, minPt, maxPt, color=BOX_COLOR):
+        """ Collect the box with corners minPt and maxPt """
+        if not self.enabled:
+            return
+        xmin, ymin, zmin = minPt[0], minPt[1], minPt[2]
+        xmax, ymax, zmax = maxPt[0], maxPt[1], maxPt[2]
+        self._addShape(self._boxes, color, [ xmin, ymin, zmin, 1.0
+                                           , xmax, ymin, zmin, 1.0
+                                           , xmax, ymax, zmin, 1.0
+                                           , xmin, ymax, zmin, 1.0
+                                           , xmin, ymin, zmax, 1.0
+                                           , xmax, ymin, zmax, 1.0
+                                           , xmax, ymax, zmax, 1.0
+                                           , xmin, ymax, zmax, 1.0 ])
+
+    def addAABB(self, box, color=BOX_COLOR, frustum=None):
+        """ Collect an AABB (or anything with _minPt and _maxPt)
+
+            If a Frustum is given, a box that is entirely outside of it is skipped
+        """
+        if not self.enabled:
+            return
+        if frustum is not None and frustum.classifyAABB(box) == CullResult.outside:
+            return
+        self.addBox(box._minPt, box._maxPt, color)
+
+    def addAABBs(self, boxes, color=BOX_COLOR, frustum=None):
+        """ Collect every AABB in the list boxes. If a Frustum is given, the boxes are culled in one classifyAABBs
+            call, and the ones entirely outside of it are skipped
+        """
+        if not self.enabled:
+            return
+        if frustum is None:
+            for box in boxes:
+                self.addBox(box._minPt, box._maxPt, color)
+            return
+
+        results = frustum.classifyAABBs(boxes)
+        outside = CullResult.outside
+        for i in range(0, len(boxes)):
+            if results[i] != outside:
+                self.addBox(boxes[i]._minPt, boxes[i]._maxPt, color)
+
+    def addPlane(self, plane, color=PLANE_COLOR, size=None):
+        """ Collect a Plane: drawn as a square (of side size, or self.planeSize), centered on the plane's point, with a
+            line from the center along the normal (half as long as the side)
+        """
+        if not self.enabled:
+            return
+        if size is None:
+            size = self.planeSize
+        px, py, pz = plane.p[0], plane.p[1], plane.p[2]
+        nx, ny, nz = plane.n[0], plane.n[1], plane.n[2]
+
+        # Two unit vectors in the plane: u is perpendicular to n and to the axis that n is least aligned with
+        if abs(nx) <= abs(ny) and abs(nx) <= abs(nz):
+            ux, uy, uz = 0.0, -nz, ny      # n x (1, 0, 0)
+        elif abs(ny) <= abs(nz):
+            ux, uy, uz = nz, 0.0, -nx      # n x (0, 1, 0)
+        else:
+            ux, uy, uz = -ny, nx, 0.0      # n x (0, 0, 1)
+        k = 0.5 * size / math.sqrt(ux * ux + uy * uy + uz * uz)
+        ux, uy, uz = ux * k, uy * k, uz * k
+        nLen = math.sqrt(nx * nx + ny * ny + nz * nz)
+        vx, vy, vz = (ny * uz - nz * uy) / nLen, (nz * ux - nx * uz) / nLen, (nx * uy - ny * ux) / nLen
+        k = 0.5 * size / nLen
+
+        self._addShape(self._planes, color, [ px - ux - vx, py - uy - vy, pz - uz - vz, 1.0
+                                            , px + ux - vx, py + uy - vy, pz + uz - vz, 1.0
+                                            , px + ux + vx, py + uy + vy, pz + uz + vz, 1.0
+                                            , px - ux + vx, py - uy + vy, pz - uz + vz, 1.0
+                                            , px, py, pz, 1.0
+                                            , px + nx * k, py + ny * k, pz + nz * k, 1.0 ])
+
+    def addLine(self, p0, p1, color=LINE_COLOR):
+        """ Collect the line segment from point p0 to point p1 """
+        if not self.enabled:
+            return
+        self._addShape(self._lines, color, [ p0[0], p0[1], p0[2], 1.0, p1[0], p1[1], p1[2], 1.0 ])
+
+    def addRay(self, origin, direction, length=1.0, color=RAY_COLOR):
+        """ Collect a ray: drawn as the segment from origin to origin + direction * length """
+        if not self.enabled:
+            return
+        self._addShape(self._lines, color, [ origin[0], origin[1], origin[2], 1.0
+                                           , origin[0] + direction[0] * length, origin[1] + direction[1] * length, origin[2] + direction[2] * length, 1.0 ])
+
+    def _transformPoints(self, matView, matViewport):
+        """ Transform all the collected points, in one pass. Return the list of their screen positions, (x, y) """
+        if backend.useNumpy():
+            batch = vector_batch.VectorBatch(0, True)
+            batch.data = numpy.array(self._points, dtype=float).reshape(self._count, 4)
+            batch.n = self._count
+            matrix.mMultvecBatch(matView, batch, out=batch, matPost=matViewport)
+            return batch.data[:, 0:2].tolist()
+
+        pts = self._points
+        if _isAffine(matView) and _isAffine(matViewport):
+            # No perspective divide needed, so both matrices fold into one, and only x and y have to be computed
+            m0, m1, m2, m3, m4, m5, m6, m7, m8, m9, m10, m11, m12, m13, m14, m15 = matrix.mMultmat(matViewport, matView).v
+            return [ (m0*x + m4*y + m8*z + m12, m1*x + m5*y + m9*z + m13) for x, y, z in zip(pts[0::4], pts[1::4], pts[2::4]) ]
+
+        batch = vector_batch.VectorBatch(0, False)
+        batch.data = array('d', pts)
+        batch.n = self._count
+        matrix.mMultvecBatch(matView, batch, out=batch, matPost=matViewport)
+        return list(zip(batch.data[0::4], batch.data[1::4]))
+
+    def draw(self, surface, matView=matrix.Matrix.matIdent(), matViewport=matrix.Matrix.matIdent(), clear=True):
+        """ Draw all the collected shapes onto surface, then clear them (unless clear is False)
+
+            The points are transformed by matView and then matViewport, the same way that AABB.draw does. Returns
+            the number of pygame draw calls made
+        """
+        calls = 0
+        if self._count:
+            pts = self._transformPoints(matView, matViewport)
+            lines = pygame.draw.lines
+            line = pygame.draw.line
+
+            for color, bases in self._boxes.items():
+                for base in bases:
+                    lines(surface, color, False, _boxEdgePath(pts[base:base + 8]))
+                calls += len(bases)
+
+            for color, bases in self._planes.items():
+                for base in bases:
+                    lines(surface, color, True, pts[base:base + 4])
+                    line(surface, color, pts[base + 4], pts[base + 5])
+                calls += 2 * len(bases)
+
+            for color, bases in self._lines.items():
+                for base in bases:
+                    line(surface, color, pts[base], pts[base + 1])
+                calls += len(bases)
+
+        if clear:
+            self.clear()
+        return calls
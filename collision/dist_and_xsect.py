@@ -14,12 +14,135 @@
 # limitations under the License.
 #############################################################################
 
+"""
+Distance, closest point and intersection queries
+
+Single queries take Vectors (or any indexable x, y, z), Planes, and AABBs (or anything with _minPt and _maxPt).
+Intersection queries return the ray parameter t of the first hit (the hit point is origin + t * direction), or None
+for a miss.
+
+Each query also has batched forms, named with plurals, that run over packed arrays in one call:
+* many vs. one: the points or rays are VectorBatches (rays are two batches: origins and directions), e.g.
+  intersect_Rays_AABB
+* one vs. many: the boxes are an AABBBatch (see the aabb_batch module), e.g. intersect_Ray_AABBs
+
+Batched results are an array('d'), or a numpy array for NumPy batches, with one value per item. In batched
+intersection results, a miss is NO_HIT (infinity), so misses sort after every hit.
+"""
+
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 from pymkfgame.mkfmath import vector
-from pymkfgame.mkfmath import matrix
+from pymkfgame.mkfmath import vector_batch
+
+NO_HIT = float('inf')
+
+def _floats(values, isNumpy, out):
+    """ Return the computed per-item values (a list, or a numpy array), as the result of a batched query: written
+        into out, if given, or else as a new array('d') / numpy array
+    """
+    if out is None:
+        return values if isNumpy else array('d', values)
+    if isNumpy:
+        out[:] = values
+    else:
+        out[:] = array('d', values)
+    return out
+
+def _raySlab(o, d, b, tMax):
+    """ Return the ray parameter t at which the ray o + t*d enters bounds b (x0, y0, z0, x1, y1, z1), or None if it
+        misses b, or only reaches it after tMax. t is 0.0 if o is inside b
+    """
+    tMin = 0.0
+    for axis in range(0, 3):
+        if d[axis] == 0.0:
+            if o[axis] < b[axis] or o[axis] > b[axis + 3]:
+                return None
+            continue
+
+        inv = 1.0 / d[axis]
+        t1 = (b[axis] - o[axis]) * inv
+        t2 = (b[axis + 3] - o[axis]) * inv
+        if t1 > t2:
+            t1, t2 = t2, t1
+        if t1 > tMin:
+            tMin = t1
+        if t2 < tMax:
+            tMax = t2
+        if tMin > tMax:
+            return None
+    return tMin
 
-from pymkfgame.collision import plane   # TODO evaluate.. do we need this import?
+def _raySlabNumpy(o, d, bMin, bMax, tMax):
+    """ NumPy version of _raySlab. o, d, bMin and bMax are (N x 3) or (3,) arrays, broadcast against each other.
+        Returns an array of t values, with NO_HIT for misses
+    """
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        inv = 1.0 / d
+        t1 = (bMin - o) * inv
+        t2 = (bMax - o) * inv
+    tNear = numpy.minimum(t1, t2)
+    tFar = numpy.maximum(t1, t2)
 
+    # Rays parallel to a slab: they're either always within it, or never
+    parallel = (d == 0.0)
+    if parallel.any():
+        within = (o >= bMin) & (o <= bMax)
+        parallel, within = numpy.broadcast_arrays(parallel, within)
+        tNear = numpy.where(parallel, numpy.where(within, -NO_HIT, NO_HIT), tNear)
+        tFar = numpy.where(parallel, numpy.where(within, NO_HIT, -NO_HIT), tFar)
+
+    tEnter = numpy.maximum(tNear.max(axis=-1), 0.0)
+    tExit = numpy.minimum(tFar.min(axis=-1), tMax)
+    return numpy.where(tEnter <= tExit, tEnter, NO_HIT)
+
+def _slabColumns(o, d, lo, hi):
+    """ Pure-Python slab entry and exit times along one axis, for many rays and/or many boxes at once. Each of o, d
+        (ray origin and direction component), lo and hi (box min and max) is either a number or an array('d') column;
+        at least one must be a column. Returns (near, far) lists. Rays parallel to the slab get (-inf, inf) if they're
+        within it, (inf, -inf) if not
+    """
+    inf = NO_HIT
+    if isinstance(d, float):
+        # One ray: the direction is the same for every box
+        if d == 0.0:
+            inside = [ l <= o <= h for l, h in zip(lo, hi) ]
+            return [ -inf if k else inf for k in inside ], [ inf if k else -inf for k in inside ]
+        inv = 1.0 / d
+        if inv < 0.0:
+            lo, hi = hi, lo
+        return [ (l - o) * inv for l in lo ], [ (h - o) * inv for h in hi ]
+
+    # Many rays, one box
+    near = [ ((lo - a) / b if b > 0.0 else (hi - a) / b) if b != 0.0 else (-inf if lo <= a <= hi else inf) for a, b in zip(o, d) ]
+    far = [ ((hi - a) / b if b > 0.0 else (lo - a) / b) if b != 0.0 else (inf if lo <= a <= hi else -inf) for a, b in zip(o, d) ]
+    return near, far
+
+def _slabHits(slabs, tMax):
+    """ Combine the (near, far) lists of the 3 axes (see _slabColumns) into the entry t of each ray, or NO_HIT """
+    (nx, fx), (ny, fy), (nz, fz) = slabs
+    return [ (t0 if t0 > 0.0 else 0.0) if t0 <= t1 and t1 >= 0.0 and t0 <= tMax else NO_HIT
+             for t0, t1 in zip(map(max, nx, ny, nz), map(min, fx, fy, fz)) ]
+
+def _boundsOf(box):
+    return tuple(box._minPt) + tuple(box._maxPt)
+
+##############################################################################
+# Point vs. plane
 ##############################################################################
+def dist_Point_Plane(pt_q, pln):
+    ''' Return the signed distance from point pt_q to the given plane (positive on the side that the normal points to)
+
+        Note: The plane normal (pln.n) MUST be normalized
+    '''
+    n = pln.n
+    return n[0]*pt_q[0] + n[1]*pt_q[1] + n[2]*pt_q[2] - pln.d
+
 def closestPoint_Point_Plane(pt_q, pln):  # pt_q is read as "point q", a.k.a. the query point
     ''' Compute the closest point on the given plane to the given point
 
@@ -37,9 +160,316 @@ def closestPoint_Point_Plane(pt_q, pln):  # pt_q is read as "point q", a.k.a. th
     #### The closest point on the plane is the projection of pt_q onto pln, which is given by pt_q - t*pln.n
     ###return vector.vSub(pt_q, vector.vGetScaled(pln.n, t))
 
-    # Approach #2
-    #d = -(pln.n[0]*pln.p[0] + pln.n[1]*pln.p[1] + pln.n[2]*pln.p[2])
-    d = (pln.n[0]*pln.p[0] + pln.n[1]*pln.p[1] + pln.n[2]*pln.p[2])
-    t = vector.vDot(pln.n, pt_q) - d
+    # Approach #2 (d = n . P is cached on the plane)
+    t = vector.vDot(pln.n, pt_q) - pln.d
     return vector.vSub(pt_q, vector.vGetScaled(pln.n, t))
 
+def dist_Points_Plane(points, pln, out=None):
+    ''' Batched dist_Point_Plane: the signed distance from every point in the VectorBatch points to the plane '''
+    nx, ny, nz = pln.n[0], pln.n[1], pln.n[2]
+    d = pln.d
+    if points.isNumpy:
+        return _floats(numpy.dot(points.data[:, 0:3], (nx, ny, nz)) - d, True, out)
+    pd = points.data
+    return _floats([ nx*x + ny*y + nz*z - d for x, y, z in zip(pd[0::4], pd[1::4], pd[2::4]) ], False, out)
+
+def closestPoint_Points_Plane(points, pln, out=None):
+    ''' Batched closestPoint_Point_Plane: return a VectorBatch with the closest point on the plane to every point in
+        the VectorBatch points (written into out, if given; out may be points)
+    '''
+    out = vector_batch._getOut(points, out)
+    nx, ny, nz = pln.n[0], pln.n[1], pln.n[2]
+    t = dist_Points_Plane(points, pln)
+    if points.isNumpy:
+        out.data[:, 0:3] = points.data[:, 0:3] - numpy.outer(t, (nx, ny, nz))
+        out.data[:, 3] = points.data[:, 3]
+        return out
+
+    pd = points.data
+    od = out.data
+    od[0::4] = array('d', [ x - k*nx for x, k in zip(pd[0::4], t) ])
+    od[1::4] = array('d', [ y - k*ny for y, k in zip(pd[1::4], t) ])
+    od[2::4] = array('d', [ z - k*nz for z, k in zip(pd[2::4], t) ])
+    od[3::4] = pd[3::4]
+    return out
+
+##############################################################################
+# Ray vs. plane
+##############################################################################
+def intersect_Ray_Plane(origin, direction, pln, max_t=float('inf')):
+    ''' Return the ray parameter t (0 <= t <= max_t) where the ray origin + t*direction crosses the plane, or None
+
+        Rays parallel to the plane never hit it (even if they lie in it). Both sides of the plane count
+    '''
+    n = pln.n
+    denom = n[0]*direction[0] + n[1]*direction[1] + n[2]*direction[2]
+    if denom == 0.0:
+        return None
+    t = (pln.d - (n[0]*origin[0] + n[1]*origin[1] + n[2]*origin[2])) / denom
+    if t < 0.0 or t > max_t:
+        return None
+    return t
+
+def intersect_Rays_Plane(origins, directions, pln, max_t=float('inf'), out=None):
+    ''' Batched intersect_Ray_Plane, for the rays origins[i] + t*directions[i] (two VectorBatches). Misses are NO_HIT '''
+    nx, ny, nz = pln.n[0], pln.n[1], pln.n[2]
+    d = pln.d
+    if origins.isNumpy:
+        n = numpy.array((nx, ny, nz))
+        denom = numpy.dot(directions.data[:, 0:3], n)
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            t = (d - numpy.dot(origins.data[:, 0:3], n)) / denom
+        return _floats(numpy.where((denom != 0.0) & (t >= 0.0) & (t <= max_t), t, NO_HIT), True, out)
+
+    od = origins.data
+    dd = directions.data
+    denoms = [ nx*x + ny*y + nz*z for x, y, z in zip(dd[0::4], dd[1::4], dd[2::4]) ]
+    values = []
+    for x, y, z, denom in zip(od[0::4], od[1::4], od[2::4], denoms):
+        if denom == 0.0:
+            values.append(NO_HIT)
+            continue
+        t = (d - (nx*x + ny*y + nz*z)) / denom
+        values.append(t if 0.0 <= t <= max_t else NO_HIT)
+    return _floats(values, False, out)
+
+##############################################################################
+# Ray and segment vs. AABB
+##############################################################################
+def intersect_Ray_AABB(origin, direction, box, max_t=float('inf')):
+    ''' Return the ray parameter t (0 <= t <= max_t) where the ray origin + t*direction enters the box, or None
+
+        Uses the slab method. A ray that starts inside the box hits it at t = 0.0
+    '''
+    return _raySlab(origin, direction, _boundsOf(box), max_t)
+
+def intersect_Segment_AABB(p0, p1, box):
+    ''' Return the parameter t (0 <= t <= 1) where the segment p0 - p1 enters the box (the point is p0 + t*(p1 - p0)),
+        or None if it doesn't touch the box
+    '''
+    return _raySlab(p0, (p1[0] - p0[0], p1[1] - p0[1], p1[2] - p0[2]), _boundsOf(box), 1.0)
+
+def intersect_Rays_AABB(origins, directions, box, max_t=float('inf'), out=None):
+    ''' Batched intersect_Ray_AABB: many rays (two VectorBatches) vs. one box. Misses are NO_HIT '''
+    if origins.isNumpy:
+        t = _raySlabNumpy(origins.data[:, 0:3], directions.data[:, 0:3], numpy.array(box._minPt[0:3]), numpy.array(box._maxPt[0:3]), max_t)
+        return _floats(t, True, out)
+
+    mn = box._minPt
+    mx = box._maxPt
+    od = origins.data
+    dd = directions.data
+    slabs = [ _slabColumns(od[axis::4], dd[axis::4], float(mn[axis]), float(mx[axis])) for axis in range(0, 3) ]
+    return _floats(_slabHits(slabs, max_t), False, out)
+
+def intersect_Segments_AABB(p0s, p1s, box, out=None):
+    ''' Batched intersect_Segment_AABB: many segments p0s[i] - p1s[i] (two VectorBatches) vs. one box. Misses are
+        NO_HIT
+    '''
+    return intersect_Rays_AABB(p0s, vector_batch.vbSub(p1s, p0s), box, 1.0, out)
+
+def intersect_Ray_AABBs(origin, direction, boxes, max_t=float('inf'), out=None):
+    ''' Batched intersect_Ray_AABB: one ray vs. many boxes (an AABBBatch). Misses are NO_HIT '''
+    if boxes.isNumpy:
+        t = _raySlabNumpy(numpy.array(origin[0:3]), numpy.array(direction[0:3]), boxes.data[:, 0:3], boxes.data[:, 3:6], max_t)
+        return _floats(t, True, out)
+
+    b = boxes.data
+    slabs = [ _slabColumns(float(origin[axis]), float(direction[axis]), b[axis::6], b[axis + 3::6]) for axis in range(0, 3) ]
+    return _floats(_slabHits(slabs, max_t), False, out)
+
+def intersect_Segment_AABBs(p0, p1, boxes, out=None):
+    ''' Batched intersect_Segment_AABB: one segment p0 - p1 vs. many boxes (an AABBBatch). Misses are NO_HIT '''
+    return intersect_Ray_AABBs(p0, (p1[0] - p0[0], p1[1] - p0[1], p1[2] - p0[2]), boxes, 1.0, out)
+
+##############################################################################
+# Point vs. AABB
+##############################################################################
+def distSq_Point_AABB(pt_q, box):
+    ''' Return the squared distance from point pt_q to the box (0.0 if the point is inside) '''
+    mn = box._minPt
+    mx = box._maxPt
+    distSq = 0.0
+    for axis in range(0, 3):
+        v = pt_q[axis]
+        if v < mn[axis]:
+            distSq += (mn[axis] - v) ** 2
+        elif v > mx[axis]:
+            distSq += (v - mx[axis]) ** 2
+    return distSq
+
+def dist_Point_AABB(pt_q, box):
+    ''' Return the distance from point pt_q to the box (0.0 if the point is inside) '''
+    return distSq_Point_AABB(pt_q, box) ** 0.5
+
+def closestPoint_Point_AABB(pt_q, box, out=None):
+    ''' Return the point in (or on) the box closest to pt_q (pt_q itself, if it's inside), as a Vector point
+        (written into out, if given)
+    '''
+    if out is None:
+        out = vector.Vector()
+    mn = box._minPt
+    mx = box._maxPt
+    for axis in range(0, 3):
+        v = pt_q[axis]
+        out.v[axis] = float(mn[axis] if v < mn[axis] else (mx[axis] if v > mx[axis] else v))
+    out.v[3] = 1.0
+    return out
+
+def distSq_Points_AABB(points, box, out=None):
+    ''' Batched distSq_Point_AABB: the squared distance from every point in the VectorBatch points to one box '''
+    mn = box._minPt
+    mx = box._maxPt
+    if points.isNumpy:
+        p = points.data[:, 0:3]
+        excess = numpy.maximum(numpy.maximum(numpy.array(mn[0:3]) - p, p - numpy.array(mx[0:3])), 0.0)
+        return _floats((excess * excess).sum(axis=1), True, out)
+
+    pd = points.data
+    total = [0.0] * points.n
+    for axis in range(0, 3):
+        lo = mn[axis]
+        hi = mx[axis]
+        total = [ s + ((lo - v) ** 2 if v < lo else ((v - hi) ** 2 if v > hi else 0.0)) for s, v in zip(total, pd[axis::4]) ]
+    return _floats(total, False, out)
+
+def closestPoint_Points_AABB(points, box, out=None):
+    ''' Batched closestPoint_Point_AABB: return a VectorBatch with the closest point in the box to every point in the
+        VectorBatch points (written into out, if given; out may be points)
+    '''
+    out = vector_batch._getOut(points, out)
+    mn = box._minPt
+    mx = box._maxPt
+    if points.isNumpy:
+        numpy.clip(points.data[:, 0:3], mn[0:3], mx[0:3], out=out.data[:, 0:3])
+        out.data[:, 3] = 1.0
+        return out
+
+    pd = points.data
+    od = out.data
+    for axis in range(0, 3):
+        lo = float(mn[axis])
+        hi = float(mx[axis])
+        od[axis::4] = array('d', [ lo if v < lo else (hi if v > hi else v) for v in pd[axis::4] ])
+    od[3::4] = array('d', [1.0]) * points.n
+    return out
+
+def distSq_Point_AABBs(pt_q, boxes, out=None):
+    ''' Batched distSq_Point_AABB: the squared distance from one point to every box in an AABBBatch '''
+    if boxes.isNumpy:
+        p = numpy.array(pt_q[0:3])
+        excess = numpy.maximum(numpy.maximum(boxes.data[:, 0:3] - p, p - boxes.data[:, 3:6]), 0.0)
+        return _floats((excess * excess).sum(axis=1), True, out)
+
+    b = boxes.data
+    total = [0.0] * boxes.n
+    for axis in range(0, 3):
+        v = pt_q[axis]
+        total = [ s + ((lo - v) ** 2 if v < lo else ((v - hi) ** 2 if v > hi else 0.0)) for s, lo, hi in zip(total, b[axis::6], b[axis + 3::6]) ]
+    return _floats(total, False, out)
+
+##############################################################################
+# Point and segment vs. segment, segment vs. AABB
+##############################################################################
+def distSq_Point_Segment(pt_q, p0, p1):
+    ''' Return the squared distance from point pt_q to the segment p0 - p1 '''
+    dx, dy, dz = p1[0] - p0[0], p1[1] - p0[1], p1[2] - p0[2]
+    qx, qy, qz = pt_q[0] - p0[0], pt_q[1] - p0[1], pt_q[2] - p0[2]
+    lenSq = dx*dx + dy*dy + dz*dz
+    t = (qx*dx + qy*dy + qz*dz) / lenSq if lenSq > 0.0 else 0.0
+    if t < 0.0:
+        t = 0.0
+    elif t > 1.0:
+        t = 1.0
+    qx -= t * dx
+    qy -= t * dy
+    qz -= t * dz
+    return qx*qx + qy*qy + qz*qz
+
+def distSq_Segment_Segment(p0, p1, q0, q1):
+    ''' Return the squared distance between the closest points of segments p0 - p1 and q0 - q1
+
+        (Closest points of two segments, as in Ericson, Real-Time Collision Detection, 5.1.9)
+    '''
+    d1 = (p1[0] - p0[0], p1[1] - p0[1], p1[2] - p0[2])
+    d2 = (q1[0] - q0[0], q1[1] - q0[1], q1[2] - q0[2])
+    r = (p0[0] - q0[0], p0[1] - q0[1], p0[2] - q0[2])
+    a = d1[0]*d1[0] + d1[1]*d1[1] + d1[2]*d1[2]
+    e = d2[0]*d2[0] + d2[1]*d2[1] + d2[2]*d2[2]
+    f = d2[0]*r[0] + d2[1]*r[1] + d2[2]*r[2]
+
+    if a == 0.0 and e == 0.0:
+        s = t = 0.0                     # Both segments are points
+    elif a == 0.0:
+        s = 0.0                         # The first segment is a point
+        t = min(max(f / e, 0.0), 1.0)
+    else:
+        c = d1[0]*r[0] + d1[1]*r[1] + d1[2]*r[2]
+        if e == 0.0:
+            t = 0.0                     # The second segment is a point
+            s = min(max(-c / a, 0.0), 1.0)
+        else:
+            b = d1[0]*d2[0] + d1[1]*d2[1] + d1[2]*d2[2]
+            denom = a*e - b*b
+            s = min(max((b*f - c*e) / denom, 0.0), 1.0) if denom != 0.0 else 0.0   # (Parallel: pick any s)
+            t = (b*s + f) / e
+            if t < 0.0:
+                t = 0.0
+                s = min(max(-c / a, 0.0), 1.0)
+            elif t > 1.0:
+                t = 1.0
+                s = min(max((b - c) / a, 0.0), 1.0)
+
+    x = r[0] + d1[0]*s - d2[0]*t
+    y = r[1] + d1[1]*s - d2[1]*t
+    z = r[2] + d1[2]*s - d2[2]*t
+    return x*x + y*y + z*z
+
+def distSq_Segment_AABB(p0, p1, box):
+    ''' Return the squared distance from the segment p0 - p1 to the box (0.0 if they touch)
+
+        Along the segment, the squared distance to the box is a piecewise quadratic function of t, whose pieces
+        change where the segment crosses the box's slab planes. The minimum of each piece is found exactly
+    '''
+    mn = box._minPt
+    mx = box._maxPt
+    o = (p0[0], p0[1], p0[2])
+    d = (p1[0] - p0[0], p1[1] - p0[1], p1[2] - p0[2])
+
+    ts = [ 0.0, 1.0 ]
+    for axis in range(0, 3):
+        if d[axis] != 0.0:
+            for bound in (mn[axis], mx[axis]):
+                t = (bound - o[axis]) / d[axis]
+                if 0.0 < t < 1.0:
+                    ts.append(t)
+    ts.sort()
+
+    best = float('inf')
+    for k in range(0, len(ts) - 1):
+        t0 = ts[k]
+        t1 = ts[k + 1]
+        if t1 <= t0:
+            continue    # (Two slab planes crossed at the same t)
+
+        # On this piece, each axis is either below the box, above it, or within its slab, throughout
+        tm = 0.5 * (t0 + t1)
+        A = B = C = 0.0
+        for axis in range(0, 3):
+            v = o[axis] + d[axis] * tm
+            if v < mn[axis]:
+                g = o[axis] - mn[axis]
+            elif v > mx[axis]:
+                g = o[axis] - mx[axis]
+            else:
+                continue
+            A += d[axis] * d[axis]
+            B += 2.0 * d[axis] * g
+            C += g * g
+
+        t = -B / (2.0 * A) if A > 0.0 else t0
+        t = t0 if t < t0 else (t1 if t > t1 else t)
+        distSq = (A * t + B) * t + C
+        if distSq < best:
+            best = distSq
+    return best if best > 0.0 else 0.0
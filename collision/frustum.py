@@ -0,0 +1,202 @@
+#############################################################################
+# Copyright 2016 Mass KonFuzion
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#############################################################################
+
+"""
+View frustum extraction and frustum culling
+
+A Frustum holds the 6 clipping planes of a view-projection matrix (e.g. ReferenceFrame.getViewProjectionMatrix()),
+extracted with the Gribb/Hartmann method, as Plane objects whose normals point into the frustum. The planes are in
+the space the matrix maps FROM (i.e., world space, for a view-projection matrix), so boxes are tested as-is, without
+transforming them.
+
+classifyAABB/classifyAABBs classify boxes as CullResult.outside (fully outside one plane; can be skipped),
+CullResult.inside (fully inside all planes) or CullResult.intersect (anything else). Like most frustum culling, the
+test is conservative: a box near a corner of the frustum may be reported as intersect, even if it is not visible.
+"""
+
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from pymkfgame.mkfmath import backend
+from pymkfgame.collision import plane
+
+class CullResult:
+    outside = 0
+    intersect = 1
+    inside = 2
+
+class FrustumPlane:
+    left = 0
+    right = 1
+    bottom = 2
+    top = 3
+    near = 4
+    far = 5
+
+# For each starting plane, the order to test all 6 planes in (starting with that plane)
+_planeOrders = [ tuple(range(s, 6)) + tuple(range(0, s)) for s in range(0, 6) ]
+
+class Frustum(object):
+    def __init__(self, m=None):
+        """ Initialize the frustum, from the view-projection Matrix m, if given """
+        self.planes = [ plane.Plane() for i in range(0, 6) ]   # Indexed by FrustumPlane values
+
+        # Packed copy of the planes, for the culling loops: (nx, ny, nz, d, |nx|, |ny|, |nz|) per plane. A point x
+        # is inside a plane if n . x + d >= 0
+        self._coeffs = [ (0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0) ] * 6
+        self._lastMatrix = None
+
+        # Plane coherency: for each box (keyed by id()), the plane that last rejected it. Objects that were outside
+        # last frame are usually outside the same plane this frame, so that plane is tested first
+        self._hints = {}
+
+        if m is not None:
+            self.update(m)
+
+    def update(self, m):
+        """ Extract the planes from the view-projection Matrix m
+
+            Returns False (and does nothing) if m is the same as the matrix from the previous call, True otherwise
+        """
+        if m.v == self._lastMatrix:
+            return False
+        self._lastMatrix = list(m.v)
+
+        v = m.v
+        # Row r of the (column-major) matrix is v[r], v[4+r], v[8+r], v[12+r]
+        r0 = (v[0], v[4], v[8],  v[12])
+        r1 = (v[1], v[5], v[9],  v[13])
+        r2 = (v[2], v[6], v[10], v[14])
+        r3 = (v[3], v[7], v[11], v[15])
+
+        # A clip-space point is inside the frustum if -w <= x, y, z <= w. E.g., x >= -w  <=>  (row3 + row0) . p >= 0
+        self._setPlane(FrustumPlane.left,   r3[0] + r0[0], r3[1] + r0[1], r3[2] + r0[2], r3[3] + r0[3])
+        self._setPlane(FrustumPlane.right,  r3[0] - r0[0], r3[1] - r0[1], r3[2] - r0[2], r3[3] - r0[3])
+        self._setPlane(FrustumPlane.bottom, r3[0] + r1[0], r3[1] + r1[1], r3[2] + r1[2], r3[3] + r1[3])
+        self._setPlane(FrustumPlane.top,    r3[0] - r1[0], r3[1] - r1[1], r3[2] - r1[2], r3[3] - r1[3])
+        self._setPlane(FrustumPlane.near,   r3[0] + r2[0], r3[1] + r2[1], r3[2] + r2[2], r3[3] + r2[3])
+        self._setPlane(FrustumPlane.far,    r3[0] - r2[0], r3[1] - r2[1], r3[2] - r2[2], r3[3] - r2[3])
+        return True
+
+    def updateFromReferenceFrame(self, refFrame):
+        """ Extract the planes from refFrame.getViewProjectionMatrix() (see update), in world space, for the
+            camera wherever it is and however it is turned
+        """
+        return self.update(refFrame.getViewProjectionMatrix())
+
+    def _setPlane(self, k, a, b, c, d):
+        """ Store the plane a*x + b*y + c*z + d = 0 (normalized) as plane k """
+        length = (a*a + b*b + c*c) ** 0.5
+        if length != 0.0:
+            a /= length
+            b /= length
+            c /= length
+            d /= length
+
+        self._coeffs[k] = (a, b, c, d, abs(a), abs(b), abs(c))
+
+        # The Plane is stored in point-normal format; the point closest to the origin is -d * n
+        pln = self.planes[k]
+        pln.n.v[:] = (a, b, c, 0.0)
+        pln.p.v[:] = (-d * a, -d * b, -d * c, 1.0)
+        pln.updateD()
+
+    def clearHints(self):
+        """ Forget the plane coherency hints (e.g. when changing levels, so the cache doesn't grow forever) """
+        self._hints.clear()
+
+    def classifyPoint(self, p):
+        """ Return CullResult.inside if point p is inside (or on) the frustum; CullResult.outside otherwise """
+        x = p[0]
+        y = p[1]
+        z = p[2]
+        for nx, ny, nz, d, ax, ay, az in self._coeffs:
+            if nx*x + ny*y + nz*z + d < 0.0:
+                return CullResult.outside
+        return CullResult.inside
+
+    def classifyAABB(self, box):
+        """ Classify one AABB against the frustum. Returns a CullResult value """
+        return self._classifyMinMax(box._minPt, box._maxPt, id(box))
+
+    def _classifyMinMax(self, mn, mx, key):
+        coeffs = self._coeffs
+        hints = self._hints
+
+        # Test the box's center against each plane, with the box's "radius" along the plane normal
+        cx = (mn[0] + mx[0]) * 0.5
+        cy = (mn[1] + mx[1]) * 0.5
+        cz = (mn[2] + mx[2]) * 0.5
+        ex = (mx[0] - mn[0]) * 0.5
+        ey = (mx[1] - mn[1]) * 0.5
+        ez = (mx[2] - mn[2]) * 0.5
+
+        result = CullResult.inside
+        for k in _planeOrders[hints.get(key, 0)]:
+            nx, ny, nz, d, ax, ay, az = coeffs[k]
+            dist = nx*cx + ny*cy + nz*cz + d
+            r = ax*ex + ay*ey + az*ez
+            if dist < -r:
+                hints[key] = k
+                return CullResult.outside
+            if dist < r:
+                result = CullResult.intersect
+        return result
+
+    def classifyAABBs(self, boxes, out=None):
+        """ Classify every AABB in the list boxes against the frustum, in one call
+
+            The result holds one CullResult value per box. It is an array('b'), or, with the numpy math backend, a
+            numpy int8 array. If out is given, it must be a buffer of the matching type and length; the results are
+            written into it.
+
+            The pure-Python path uses plane coherency (see _hints); the NumPy path tests all 6 planes for all boxes
+            at once, so it doesn't need it
+        """
+        n = len(boxes)
+
+        if backend.useNumpy():
+            if out is None:
+                out = numpy.empty(n, dtype=numpy.int8)
+            if n == 0:
+                return out
+
+            mins = numpy.array([ b._minPt for b in boxes ], dtype=float)
+            maxs = numpy.array([ b._maxPt for b in boxes ], dtype=float)
+            centers = (mins + maxs) * 0.5
+            extents = (maxs - mins) * 0.5
+
+            coeffs = numpy.array(self._coeffs)
+            dist = numpy.dot(centers, coeffs[:, 0:3].T) + coeffs[:, 3]  # n x 6
+            r = numpy.dot(extents, coeffs[:, 4:7].T)
+
+            out[:] = CullResult.intersect
+            out[(dist >= r).all(axis=1)] = CullResult.inside
+            out[(dist < -r).any(axis=1)] = CullResult.outside
+            return out
+
+        if out is None:
+            out = array('b', [0]) * n
+
+        classify = self._classifyMinMax
+        for i in range(0, n):
+            box = boxes[i]
+            out[i] = classify(box._minPt, box._maxPt, id(box))
+        return out
@@ -0,0 +1,120 @@
+#############################################################################
+# Copyright 2016 Mass KonFuzion
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#############################################################################
+
+"""
+Narrowphase collision tests, dispatched on the geometry types of the pair
+
+Every collision geometry has a _type (a CollisionGeomType value). isColliding(a, b) looks up the test for the pair
+(a._type, b._type) in a table, instead of checking classes with isinstance chains. The built-in tests cover every
+pair of AABB, BoundingSphere and Capsule; registerTest adds (or replaces) tests, e.g. for new geometry types.
+
+All tests count touching as colliding, like AABB.isColliding. Geometries only need the attributes the tests read:
+_minPt/_maxPt (AABB), _center/_radius (sphere), _p0/_p1/_radius (capsule).
+
+collidePairs runs the tests over a broadphase pair list, optionally with a cheaper first tier (e.g. bounding
+spheres), so the full tests only run for pairs that pass it.
+"""
+
+from pymkfgame.collision.common import CollisionGeomType
+from pymkfgame.collision.dist_and_xsect import distSq_Point_AABB, distSq_Point_Segment, distSq_Segment_Segment, distSq_Segment_AABB
+
+_tests = {}     # (typeA, typeB) -> test(a, b)
+
+def registerTest(typeA, typeB, test):
+    ''' Register test(a, b) (returns True if a, of type typeA, collides with b, of type typeB) for the pair of types
+
+        The test is also registered for (typeB, typeA), with its arguments swapped
+    '''
+    _tests[(typeA, typeB)] = test
+    if typeA != typeB:
+        _tests[(typeB, typeA)] = lambda b, a: test(a, b)
+
+def isColliding(a, b):
+    ''' Return True if collision geometries a and b collide '''
+    test = _tests.get((a._type, b._type))
+    if test is None:
+        raise Exception("narrowphase.isColliding: no test registered for geometry types {} and {}".format(a._type, b._type))
+    return test(a, b)
+
+def collidePairs(geoms, pairs, prefilter=None, out=None):
+    ''' Return a list of the (i, j) pairs from pairs (e.g. from a broadphase) for which geoms[i] and geoms[j] collide
+
+        If prefilter is given, it is a list of cheaper bounding geometries (e.g. BoundingSpheres), with the same
+        indexes as geoms. Each pair is tested on those first, and only tested on geoms if they collide. If out is
+        given (a list), it is cleared, and the pairs are written into it
+    '''
+    if out is None:
+        out = []
+    else:
+        del out[:]
+
+    tests = _tests
+    if prefilter is None:
+        for pair in pairs:
+            a = geoms[pair[0]]
+            b = geoms[pair[1]]
+            if tests[(a._type, b._type)](a, b):
+                out.append(pair)
+        return out
+
+    for pair in pairs:
+        a = prefilter[pair[0]]
+        b = prefilter[pair[1]]
+        if tests[(a._type, b._type)](a, b):
+            a = geoms[pair[0]]
+            b = geoms[pair[1]]
+            if tests[(a._type, b._type)](a, b):
+                out.append(pair)
+    return out
+
+## ======================
+
+def aabbVsAABB(a, b):
+    amin = a._minPt
+    amax = a._maxPt
+    bmin = b._minPt
+    bmax = b._maxPt
+    return not (amax[0] < bmin[0] or amin[0] > bmax[0] or amax[1] < bmin[1] or amin[1] > bmax[1] or amax[2] < bmin[2] or amin[2] > bmax[2])
+
+def sphereVsSphere(a, b):
+    ca = a._center
+    cb = b._center
+    dx = ca[0] - cb[0]
+    dy = ca[1] - cb[1]
+    dz = ca[2] - cb[2]
+    r = a._radius + b._radius
+    return dx*dx + dy*dy + dz*dz <= r*r
+
+def sphereVsAABB(a, b):
+    return distSq_Point_AABB(a._center, b) <= a._radius * a._radius
+
+def capsuleVsSphere(a, b):
+    r = a._radius + b._radius
+    return distSq_Point_Segment(b._center, a._p0, a._p1) <= r*r
+
+def capsuleVsCapsule(a, b):
+    r = a._radius + b._radius
+    return distSq_Segment_Segment(a._p0, a._p1, b._p0, b._p1) <= r*r
+
+def capsuleVsAABB(a, b):
+    return distSq_Segment_AABB(a._p0, a._p1, b) <= a._radius * a._radius
+
+registerTest(CollisionGeomType.aabb, CollisionGeomType.aabb, aabbVsAABB)
+registerTest(CollisionGeomType.sphere, CollisionGeomType.sphere, sphereVsSphere)
+registerTest(CollisionGeomType.sphere, CollisionGeomType.aabb, sphereVsAABB)
+registerTest(CollisionGeomType.capsule, CollisionGeomType.sphere, capsuleVsSphere)
+registerTest(CollisionGeomType.capsule, CollisionGeomType.capsule, capsuleVsCapsule)
+registerTest(CollisionGeomType.capsule, CollisionGeomType.aabb, capsuleVsAABB)
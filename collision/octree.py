@@ -0,0 +1,446 @@
+#############################################################################
+# Copyright 2016 Mass KonFuzion
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#############################################################################
+
+"""
+Loose octree, for static geometry (e.g. level walls and floors)
+
+The tree is built once, from a list of boxes, and never changes; queries (box, sphere, ray, frustum) return indexes
+into that list. In a loose octree, each cell's bounds are enlarged by the looseness factor, so a box only has to fit
+by its size, not by its position: it is stored in the deepest cell, containing its center, that it fits in loosely.
+Unlike a plain octree, no box is ever stuck at the root just because it straddles a cell boundary near the middle
+of the level. After the build, each node's bounds are shrunk to the boxes actually under it, so queries skip as
+much empty space as possible.
+
+The nodes are laid out depth-first, and so are the boxes (each node's own boxes, then its children's), so the boxes
+under any node are one contiguous range. Queries that contain a whole node (e.g. a frustum that a room is entirely
+inside) take that range as-is, without testing the boxes in it.
+
+The build can be done offline: save() writes the built tree to a JSON file, and LooseOctree.load() reads it back,
+without building. The boxes themselves aren't saved (only their bounds); pass the same list to load() to get them
+back with getBox().
+
+Queries that are repeated within a frame (e.g. every AI agent in a room asking for the boxes in that room) can be
+answered from a small per-frame cache of query results (see enableCache).
+"""
+
+import json
+
+from pymkfgame.collision.dist_and_xsect import _raySlab
+from pymkfgame.collision.frustum import CullResult
+
+FILE_VERSION = 1
+
+class LooseOctree(object):
+    def __init__(self, boxes=None, looseness=2.0, leaf_size=8, max_depth=10):
+        """ Build the tree from the list boxes (AABBs, or anything with _minPt and _maxPt), if given
+
+            looseness (> 1.0) is how much larger than its cell each node's loose bounds are. A node is only split
+            when it holds more than leaf_size boxes, and never below max_depth
+        """
+        if looseness <= 1.0:
+            raise Exception("LooseOctree.__init__: looseness must be greater than 1.0")
+        self.looseness = float(looseness)
+        self.leafSize = leaf_size
+        self.maxDepth = max_depth
+
+        self._boxes = []
+        self._nodeBounds = []   # node -> (x0, y0, z0, x1, y1, z1), shrunk to the boxes under the node
+        self._children = []     # node -> list of child nodes
+        self._itemStart = []    # node -> first slot of the node's own boxes
+        self._itemEnd = []      # node -> end of the node's own boxes (and first slot of its first child's)
+        self._subtreeEnd = []   # node -> end of the boxes under the node (its own, and all its descendants')
+        self._itemIndex = []    # slot -> index of the box (in the list the tree was built from)
+        self._itemBounds = []   # slot -> (x0, y0, z0, x1, y1, z1) of the box
+
+        self._cacheSize = 0     # Max number of cached query results; 0 when the cache is off
+        self._cache = {}        # Query (kind, args...) -> result
+        self.cacheHits = 0
+        self.cacheMisses = 0
+
+        if boxes is not None:
+            self.build(boxes)
+
+    def __len__(self):
+        return len(self._itemIndex)
+
+    def getBox(self, i):
+        """ Return box i (None if the tree was loaded without the boxes) """
+        return self._boxes[i] if self._boxes else None
+
+    def getNodeCount(self):
+        return len(self._children)
+
+    ## ----------------------------------------------------------------------
+    ## Build
+
+    def build(self, boxes):
+        """ (Re)build the tree from the list boxes """
+        self._boxes = list(boxes)
+        del self._nodeBounds[:]
+        del self._children[:]
+        del self._itemStart[:]
+        del self._itemEnd[:]
+        del self._subtreeEnd[:]
+        del self._itemIndex[:]
+        del self._itemBounds[:]
+        self._cache.clear()
+        if not self._boxes:
+            return
+
+        bounds = [ (b._minPt[0], b._minPt[1], b._minPt[2], b._maxPt[0], b._maxPt[1], b._maxPt[2]) for b in self._boxes ]
+
+        # The root cell is the cube around all the boxes
+        lo = [ min([ b[axis] for b in bounds ]) for axis in range(0, 3) ]
+        hi = [ max([ b[axis + 3] for b in bounds ]) for axis in range(0, 3) ]
+        center = [ 0.5 * (lo[axis] + hi[axis]) for axis in range(0, 3) ]
+        half = 0.5 * max([ hi[axis] - lo[axis] for axis in range(0, 3) ])
+
+        self._buildNode(bounds, list(range(0, len(bounds))), center, half, 0)
+
+    def _buildNode(self, bounds, items, center, half, depth):
+        """ Add a node for the cell center +/- half, holding items (indexes into bounds), and its descendants.
+            Returns the node number
+        """
+        node = len(self._children)
+        self._nodeBounds.append(None)
+        self._children.append([])
+        self._itemStart.append(len(self._itemIndex))
+        self._itemEnd.append(None)
+        self._subtreeEnd.append(None)
+
+        octants = None
+        if len(items) > self.leafSize and depth < self.maxDepth:
+            # A box moves down into the child cell that holds its center, if it fits in the child's loose bounds
+            # wherever its center is in the cell
+            childHalf = 0.5 * half
+            fit = 2.0 * (self.looseness - 1.0) * childHalf     # Largest box size that fits in a child
+            octants = [ [] for k in range(0, 8) ]
+            stay = []
+            for i in items:
+                b = bounds[i]
+                if b[3] - b[0] > fit or b[4] - b[1] > fit or b[5] - b[2] > fit:
+                    stay.append(i)
+                    continue
+                k = 0
+                if b[0] + b[3] > 2.0 * center[0]:
+                    k |= 1
+                if b[1] + b[4] > 2.0 * center[1]:
+                    k |= 2
+                if b[2] + b[5] > 2.0 * center[2]:
+                    k |= 4
+                octants[k].append(i)
+            items = stay
+
+        self._itemIndex.extend(items)
+        self._itemBounds.extend([ bounds[i] for i in items ])
+        self._itemEnd[node] = len(self._itemIndex)
+
+        if octants is not None:
+            for k in range(0, 8):
+                if octants[k]:
+                    childCenter = [ center[axis] + (childHalf if k & (1 << axis) else -childHalf) for axis in range(0, 3) ]
+                    self._children[node].append(self._buildNode(bounds, octants[k], childCenter, childHalf, depth + 1))
+
+        self._subtreeEnd[node] = len(self._itemIndex)
+
+        # Shrink the node's bounds to the boxes under it
+        under = self._itemBounds[self._itemStart[node]:self._subtreeEnd[node]]
+        self._nodeBounds[node] = tuple([ min([ b[axis] for b in under ]) for axis in range(0, 3) ] + [ max([ b[axis] for b in under ]) for axis in range(3, 6) ])
+        return node
+
+    ## ----------------------------------------------------------------------
+    ## Serialization
+
+    def toDict(self):
+        """ Return the built tree as a dict of lists (e.g. to store with json) """
+        return { 'version': FILE_VERSION
+               , 'looseness': self.looseness
+               , 'leafSize': self.leafSize
+               , 'maxDepth': self.maxDepth
+               , 'nodeBounds': self._nodeBounds
+               , 'children': self._children
+               , 'itemStart': self._itemStart
+               , 'itemEnd': self._itemEnd
+               , 'subtreeEnd': self._subtreeEnd
+               , 'itemIndex': self._itemIndex
+               , 'itemBounds': self._itemBounds
+               }
+
+    @staticmethod
+    def fromDict(d, boxes=None):
+        """ Return a LooseOctree made from a dict returned by toDict, without building it. boxes (optional) is the
+            list the tree was built from; it's only needed for getBox
+        """
+        if d.get('version') != FILE_VERSION:
+            raise Exception("LooseOctree.fromDict: unsupported version {}".format(d.get('version')))
+        tree = LooseOctree(None, d['looseness'], d['leafSize'], d['maxDepth'])
+        tree._boxes = list(boxes) if boxes is not None else []
+        tree._nodeBounds = [ tuple(b) for b in d['nodeBounds'] ]
+        tree._children = [ list(c) for c in d['children'] ]
+        tree._itemStart = list(d['itemStart'])
+        tree._itemEnd = list(d['itemEnd'])
+        tree._subtreeEnd = list(d['subtreeEnd'])
+        tree._itemIndex = list(d['itemIndex'])
+        tree._itemBounds = [ tuple(b) for b in d['itemBounds'] ]
+        return tree
+
+    def save(self, filename):
+        """ Write the built tree to a JSON file """
+        with open(filename, 'w') as fd:
+            json.dump(self.toDict(), fd)
+
+    @staticmethod
+    def load(filename, boxes=None):
+        """ Read a tree written by save (see fromDict) """
+        with open(filename, 'r') as fd:
+            return LooseOctree.fromDict(json.load(fd), boxes)
+
+    ## ----------------------------------------------------------------------
+    ## Query result cache
+
+    def enableCache(self, max_entries=256):
+        """ Cache the results of queryBox, querySphere and rayCast, so a query that is repeated exactly (e.g. AI
+            agents that share a room, each asking for the boxes in it) skips the search. At most max_entries
+            results are kept; call newFrame once per frame to start over
+        """
+        self._cacheSize = max_entries
+        self._cache.clear()
+
+    def disableCache(self):
+        self._cacheSize = 0
+        self._cache.clear()
+
+    def newFrame(self):
+        """ Start a new frame: forget the cached query results """
+        self._cache.clear()
+
+    def _cacheStore(self, key, result):
+        if len(self._cache) < self._cacheSize:
+            self._cache[key] = result
+
+    ## ----------------------------------------------------------------------
+    ## Queries
+
+    def _queryBoxSlots(self, minPt, maxPt, out):
+        """ Append to out the slots of all the boxes that overlap the region minPt - maxPt, and return it """
+        if not self._children:
+            return out
+
+        x0, y0, z0 = minPt[0], minPt[1], minPt[2]
+        x1, y1, z1 = maxPt[0], maxPt[1], maxPt[2]
+        nodeBounds = self._nodeBounds
+        children = self._children
+        itemBounds = self._itemBounds
+
+        stack = [ 0 ]
+        while stack:
+            node = stack.pop()
+            b = nodeBounds[node]
+            if b[3] < x0 or b[0] > x1 or b[4] < y0 or b[1] > y1 or b[5] < z0 or b[2] > z1:
+                continue
+
+            if x0 <= b[0] and y0 <= b[1] and z0 <= b[2] and b[3] <= x1 and b[4] <= y1 and b[5] <= z1:
+                # The whole node is inside the region
+                out.extend(range(self._itemStart[node], self._subtreeEnd[node]))
+                continue
+
+            for s in range(self._itemStart[node], self._itemEnd[node]):
+                b = itemBounds[s]
+                if not (b[3] < x0 or b[0] > x1 or b[4] < y0 or b[1] > y1 or b[5] < z0 or b[2] > z1):
+                    out.append(s)
+            stack.extend(children[node])
+        return out
+
+    def queryBox(self, minPt, maxPt, out=None):
+        """ Return a list of the indexes of all boxes that overlap the region minPt - maxPt
+
+            Boxes overlap by the same rule as AABB.isColliding (touching counts). If out is given (a list), it is
+            cleared, and the indexes are written into it
+        """
+        if out is None:
+            out = []
+        else:
+            del out[:]
+
+        if self._cacheSize:
+            key = ('box', minPt[0], minPt[1], minPt[2], maxPt[0], maxPt[1], maxPt[2])
+            found = self._cache.get(key)
+            if found is not None:
+                self.cacheHits += 1
+                out.extend(found)
+                return out
+            self.cacheMisses += 1
+
+        itemIndex = self._itemIndex
+        out.extend([ itemIndex[s] for s in self._queryBoxSlots(minPt, maxPt, []) ])
+        if self._cacheSize:
+            self._cacheStore(key, tuple(out))
+        return out
+
+    def querySphere(self, center, radius, out=None):
+        """ Return a list of the indexes of all boxes that overlap the sphere (touching counts). If out is given (a
+            list), it is cleared, and the indexes are written into it
+        """
+        if out is None:
+            out = []
+        else:
+            del out[:]
+
+        cx, cy, cz = center[0], center[1], center[2]
+        if self._cacheSize:
+            key = ('sphere', cx, cy, cz, radius)
+            found = self._cache.get(key)
+            if found is not None:
+                self.cacheHits += 1
+                out.extend(found)
+                return out
+            self.cacheMisses += 1
+
+        # The boxes that overlap the sphere's bounding box, then the exact test
+        rSq = radius * radius
+        itemBounds = self._itemBounds
+        itemIndex = self._itemIndex
+        for s in self._queryBoxSlots((cx - radius, cy - radius, cz - radius), (cx + radius, cy + radius, cz + radius), []):
+            b = itemBounds[s]
+            distSq = 0.0
+            if cx < b[0]:
+                distSq += (b[0] - cx) ** 2
+            elif cx > b[3]:
+                distSq += (cx - b[3]) ** 2
+            if cy < b[1]:
+                distSq += (b[1] - cy) ** 2
+            elif cy > b[4]:
+                distSq += (cy - b[4]) ** 2
+            if cz < b[2]:
+                distSq += (b[2] - cz) ** 2
+            elif cz > b[5]:
+                distSq += (cz - b[5]) ** 2
+            if distSq <= rSq:
+                out.append(itemIndex[s])
+
+        if self._cacheSize:
+            self._cacheStore(key, tuple(out))
+        return out
+
+    def queryFrustum(self, frustum, out=None):
+        """ Return a list of the indexes of all boxes that are not entirely outside the Frustum (see
+            Frustum.classifyAABB). If out is given (a list), it is cleared, and the indexes are written into it
+
+            Nodes and boxes keep plane coherency hints in the frustum, like boxes classified with classifyAABB
+        """
+        if out is None:
+            out = []
+        else:
+            del out[:]
+        if not self._children:
+            return out
+
+        nodeBounds = self._nodeBounds
+        children = self._children
+        itemBounds = self._itemBounds
+        itemIndex = self._itemIndex
+        classify = frustum._classifyMinMax
+        outside = CullResult.outside
+        inside = CullResult.inside
+        hintKey = id(self)
+
+        stack = [ 0 ]
+        while stack:
+            node = stack.pop()
+            b = nodeBounds[node]
+            result = classify(b[0:3], b[3:6], (hintKey, node))
+            if result == outside:
+                continue
+            if result == inside:
+                out.extend(itemIndex[self._itemStart[node]:self._subtreeEnd[node]])
+                continue
+
+            for s in range(self._itemStart[node], self._itemEnd[node]):
+                b = itemBounds[s]
+                if classify(b[0:3], b[3:6], (hintKey, -1 - s)) != outside:
+                    out.append(itemIndex[s])
+            stack.extend(children[node])
+        return out
+
+    def rayCast(self, origin, direction, max_t=float('inf')):
+        """ Return (t, index) for the first box hit by the ray origin + t*direction (0 <= t <= max_t), or None
+
+            (See AABBTree.rayCast)
+        """
+        if not self._children:
+            return None
+
+        if self._cacheSize:
+            key = ('ray', origin[0], origin[1], origin[2], direction[0], direction[1], direction[2], max_t)
+            found = self._cache.get(key, self._cache)
+            if found is not self._cache:
+                self.cacheHits += 1
+                return found
+            self.cacheMisses += 1
+
+        nodeBounds = self._nodeBounds
+        children = self._children
+        itemBounds = self._itemBounds
+        best = None
+        bestT = max_t
+
+        stack = [ 0 ]
+        while stack:
+            node = stack.pop()
+            if _raySlab(origin, direction, nodeBounds[node], bestT) is None:
+                continue
+            for s in range(self._itemStart[node], self._itemEnd[node]):
+                t = _raySlab(origin, direction, itemBounds[s], bestT)
+                if t is not None and (best is None or t < bestT):
+                    best = s
+                    bestT = t
+            stack.extend(children[node])
+
+        result = None if best is None else (bestT, self._itemIndex[best])
+        if self._cacheSize:
+            self._cacheStore(key, result)
+        return result
+
+    def rayCastAll(self, origin, direction, max_t=float('inf'), out=None):
+        """ Return a list of (t, index) for every box hit by the ray (see rayCast), sorted by t
+
+            If out is given (a list), it is cleared, and the hits are written into it
+        """
+        if out is None:
+            out = []
+        else:
+            del out[:]
+        if not self._children:
+            return out
+
+        nodeBounds = self._nodeBounds
+        children = self._children
+        itemBounds = self._itemBounds
+        itemIndex = self._itemIndex
+
+        stack = [ 0 ]
+        while stack:
+            node = stack.pop()
+            if _raySlab(origin, direction, nodeBounds[node], max_t) is None:
+                continue
+            for s in range(self._itemStart[node], self._itemEnd[node]):
+                t = _raySlab(origin, direction, itemBounds[s], max_t)
+                if t is not None:
+                    out.append((t, itemIndex[s]))
+            stack.extend(children[node])
+
+        out.sort()
+        return out
@@ -0,0 +1,166 @@
+#############################################################################
+# Copyright 2016 Mass KonFuzion
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#############################################################################
+
+"""
+Persistent pair cache, with begin/stay/end collision events
+
+A PairCache remembers which pairs of objects collided in the previous frame. Each frame, give it the pairs that
+collide now (update), or just the pairs that started and stopped colliding (applyChanges, e.g. with the output of
+SweepAndPrune.update); it works out the transitions:
+    begin: the pair collides now, but didn't in the previous frame
+    stay:  the pair collided in both frames (only reported if report_stay is True)
+    end:   the pair collided in the previous frame, but doesn't now
+
+publish() posts the transitions onto a MessageQueue, as messages like
+    { 'topic': 'collision', 'payload': { 'event': ContactEvent.begin, 'pair': (a, b), 'frames': 0 } }
+where 'frames' is the number of frames the pair has been colliding for, before this one. Handlers then run once
+when a contact starts and once when it ends, instead of every frame for as long as it lasts.
+
+Objects are identified by handles: non-negative ints, less than 2**32 (e.g. broadphase handles, or indexes into a
+list of objects). Pairs are stored by their packed key (see common.packPairKey), and are always reported with the
+smaller handle first. Data can be kept with a pair for as long as it collides (setData/getData), e.g. the contact
+normal from the frame it began.
+"""
+
+from pymkfgame.collision.common import packPairKey, unpackPairKey
+
+class ContactEvent:
+    begin = 0
+    stay = 1
+    end = 2
+
+class PairCache(object):
+    def __init__(self, topic='collision', report_stay=False):
+        self.topic = topic
+        self.reportStay = report_stay
+
+        self._frame = 0
+        self._pairs = {}        # Packed key -> frame number in which the pair began colliding
+        self._data = {}         # Packed key -> user data, for colliding pairs that have any
+        self._began = []        # Packed keys of the pairs that began colliding in the last update
+        self._ended = []        # (packed key, frame number it began in) of the pairs that stopped
+
+    def __len__(self):
+        return len(self._pairs)
+
+    def __contains__(self, pair):
+        a, b = pair
+        return packPairKey(a, b) in self._pairs
+
+    def clear(self):
+        """ Forget all pairs (without reporting them as ended) """
+        self._pairs.clear()
+        self._data.clear()
+        del self._began[:]
+        del self._ended[:]
+
+    def getPairs(self, out=None):
+        """ Return a list of the (handleA, handleB) pairs (handleA < handleB) that collide. If out is given (a list),
+            it is cleared, and the pairs are written into it
+        """
+        if out is None:
+            out = []
+        else:
+            del out[:]
+        out.extend([ unpackPairKey(key) for key in self._pairs ])
+        return out
+
+    def getData(self, a, b, default=None):
+        """ Return the data kept with the pair (a, b), or default """
+        return self._data.get(packPairKey(a, b), default)
+
+    def setData(self, a, b, value):
+        """ Keep value with the pair (a, b), until the pair stops colliding. The pair must be colliding """
+        key = packPairKey(a, b)
+        if key not in self._pairs:
+            raise Exception("PairCache.setData: pair ({}, {}) is not colliding".format(a, b))
+        self._data[key] = value
+
+    def update(self, pairs):
+        """ Start a new frame, in which pairs (an iterable of (handleA, handleB), in either order; duplicates are
+            fine) collide
+
+            Returns (began, ended): the lists of pairs that started and stopped colliding
+        """
+        current = set([ packPairKey(a, b) for a, b in pairs ])
+        previous = self._pairs
+        self._frame += 1
+
+        began = [ key for key in current if key not in previous ]
+        ended = [ (key, previous[key]) for key in previous if key not in current ]
+        return self._apply(began, ended)
+
+    def applyChanges(self, added, removed):
+        """ Start a new frame, given only the pairs that started (added) and stopped (removed) colliding, e.g. the
+            output of SweepAndPrune.update. Pairs in added that already collide, pairs in removed that don't, and
+            repeats, are ignored
+
+            Returns (began, ended), as update does
+        """
+        previous = self._pairs
+        self._frame += 1
+
+        began = set()
+        for a, b in added:
+            key = packPairKey(a, b)
+            if key not in previous:
+                began.add(key)
+        ended = {}
+        for a, b in removed:
+            key = packPairKey(a, b)
+            if key in previous:
+                ended[key] = previous[key]
+        return self._apply(list(began), list(ended.items()))
+
+    def _apply(self, began, ended):
+        pairs = self._pairs
+        data = self._data
+        frame = self._frame
+        for key, start in ended:
+            del pairs[key]
+            if key in data:
+                del data[key]
+        for key in began:
+            pairs[key] = frame
+        self._began = began
+        self._ended = ended
+        return [ unpackPairKey(key) for key in began ], [ unpackPairKey(key) for key, start in ended ]
+
+    def publish(self, message_queue):
+        """ Enqueue one message per transition from the last update onto message_queue (a MessageQueue; see the
+            module docstring for the format). Stay messages are only posted if reportStay is True.
+
+            Returns the number of messages. The queue must have room for them all (see MessageQueue.Initialize)
+        """
+        topic = self.topic
+        frame = self._frame
+        enqueue = message_queue.Enqueue
+        count = 0
+
+        for key, start in self._ended:
+            enqueue({ 'topic': topic, 'payload': { 'event': ContactEvent.end, 'pair': unpackPairKey(key), 'frames': frame - start } })
+        count += len(self._ended)
+
+        if self.reportStay:
+            for key, start in self._pairs.items():
+                if start != frame:
+                    enqueue({ 'topic': topic, 'payload': { 'event': ContactEvent.stay, 'pair': unpackPairKey(key), 'frames': frame - start } })
+                    count += 1
+
+        for key in self._began:
+            enqueue({ 'topic': topic, 'payload': { 'event': ContactEvent.begin, 'pair': unpackPairKey(key), 'frames': 0 } })
+        count += len(self._began)
+        return count
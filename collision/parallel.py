@@ -0,0 +1,239 @@
+#############################################################################
+# Copyright 2016 Mass KonFuzion
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#############################################################################
+
+"""
+Multi-process narrowphase, for big headless simulations
+
+A ParallelNarrowphase tests a broadphase candidate set (e.g. the pairs from fat bounds, or from a coarse grid) with
+the exact box test, spread over a multiprocessing pool:
+* The boxes (AABBBatch data, 6 doubles per box) and the candidate pairs (2 ints each) are copied into
+  multiprocessing.shared_memory blocks, which the workers map; no AABB objects, and no pair lists, are pickled
+* The candidates are split into contiguous chunks, one task each; a task only sends a range, and returns the
+  positions (in the candidate list) of the pairs that collide
+* The results are merged in chunk order, so the output is the colliding pairs in candidate order: the same list,
+  in the same order, for any number of workers (including 0)
+
+Workers use NumPy for their chunks if the batch is a numpy batch, and plain Python loops otherwise.
+
+NOTE: the speedup from more workers is unmeasured. So far this has only been benchmarked on a single-CPU machine,
+where the pool can only add overhead (see benchmarks/bench_parallel.py; run it on multi-core hardware before relying
+on a worker count). The results are the same for any number of workers, so workers=0 is always a safe choice.
+
+multiprocessing.shared_memory needs Python 3.8 or newer. Without it (or with workers=0), everything runs in this
+process, with the same kernels, and the same results.
+
+Use it as a context manager, or call close(), to stop the pool and free the shared memory:
+    with ParallelNarrowphase(workers=4) as narrowphase:
+        for frame in ...:
+            hits = narrowphase.collidePairs(boxes, candidates)
+"""
+
+import multiprocessing
+from array import array
+from itertools import chain
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    shared_memory = None
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    array('q')
+    _INDEX_CODE = 'q'
+except ValueError:
+    _INDEX_CODE = 'l'       # (Python 2 has no 'q')
+
+MIN_CHUNK_PAIRS = 4096      # Smallest chunk of candidates sent to a worker
+CHUNKS_PER_WORKER = 4       # Chunks per worker (more chunks balance the load better, but cost more messages)
+
+def _overlapsPure(a, b, p, start, end):
+    """ Return an array of the positions k (start <= k < end) of the candidates that overlap
+
+        a and b are flat sequences of box bounds (6 doubles per box), p is a flat sequence of candidate pairs (2
+        ints per pair: a box of a, then a box of b)
+    """
+    hits = array(_INDEX_CODE)
+    for k in range(start, end):
+        i = 6 * p[2 * k]
+        j = 6 * p[2 * k + 1]
+        if not (a[i + 3] < b[j] or a[i] > b[j + 3] or a[i + 4] < b[j + 1] or a[i + 1] > b[j + 4] or a[i + 5] < b[j + 2] or a[i + 2] > b[j + 5]):
+            hits.append(k)
+    return hits
+
+def _overlapsNumpy(a, b, p, start, end):
+    """ NumPy version of _overlapsPure. a and b are N x 6 arrays, p is a K x 2 array. Returns an int64 array """
+    chunk = p[start:end]
+    boxA = a[chunk[:, 0]]
+    boxB = b[chunk[:, 1]]
+    hit = boxA[:, 0] <= boxB[:, 3]      # (One column at a time is about twice as fast as .all(axis=1) on K x 3)
+    hit &= boxB[:, 0] <= boxA[:, 3]
+    for axis in (1, 2):
+        hit &= boxA[:, axis] <= boxB[:, axis + 3]
+        hit &= boxB[:, axis] <= boxA[:, axis + 3]
+    return numpy.flatnonzero(hit).astype(numpy.int64, copy=False) + start
+
+## ======================
+## Worker side
+
+_attached = {}      # Worker process: block role -> (name, SharedMemory), for the blocks it has mapped
+
+def _attach(role, name):
+    """ Return the SharedMemory block called name, mapping it (and unmapping the last block of this role) if needed """
+    found = _attached.get(role)
+    if found is not None:
+        if found[0] == name:
+            return found[1]
+        found[1].close()
+    try:
+        shm = shared_memory.SharedMemory(name=name, track=False)   # (Python 3.13+: the parent owns the block)
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name)
+    _attached[role] = (name, shm)
+    return shm
+
+def _runChunk(task):
+    """ Pool task: test candidates start..end. Returns the positions of the hits, as bytes """
+    boxesName, numBoxes, otherName, numOther, pairsName, numPairs, start, end, useNumpy = task
+    a = _attach('boxes', boxesName).buf
+    b = _attach('other', otherName).buf if otherName is not None else a
+    p = _attach('pairs', pairsName).buf
+    if useNumpy:
+        a = numpy.frombuffer(a, dtype=numpy.float64, count=6 * numBoxes).reshape(numBoxes, 6)
+        b = numpy.frombuffer(b, dtype=numpy.float64, count=6 * numOther).reshape(numOther, 6)
+        p = numpy.frombuffer(p, dtype=numpy.int64, count=2 * numPairs).reshape(numPairs, 2)
+        return _overlapsNumpy(a, b, p, start, end).tobytes()
+
+    hits = _overlapsPure(a.cast('d'), b.cast('d'), p.cast('q'), start, end)
+    return hits.tobytes()
+
+## ======================
+## Parent side
+
+class ParallelNarrowphase(object):
+    def __init__(self, workers=None, chunk_pairs=None):
+        """ Initialize the pipeline, with a pool of worker processes (default: one per CPU)
+
+            workers=0 runs everything in this process (as does a Python without multiprocessing.shared_memory).
+            chunk_pairs sets the number of candidates per task; by default, the candidates are split into
+            CHUNKS_PER_WORKER chunks per worker (at least MIN_CHUNK_PAIRS candidates each)
+        """
+        if workers is None:
+            workers = multiprocessing.cpu_count()
+        if shared_memory is None:
+            workers = 0
+        self.workers = workers
+        self.chunkPairs = chunk_pairs
+
+        self._pool = None
+        self._blocks = {}   # Block role -> SharedMemory
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """ Stop the worker pool, and free the shared memory """
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+        for shm in self._blocks.values():
+            shm.close()
+            shm.unlink()
+        self._blocks.clear()
+
+    def _block(self, role, nbytes):
+        """ Return the shared memory block for role, with room for at least nbytes (grown by doubling) """
+        shm = self._blocks.get(role)
+        if shm is not None and shm.size >= nbytes:
+            return shm
+        size = max(nbytes, 4096)
+        if shm is not None:
+            size = max(size, 2 * shm.size)
+            shm.close()
+            shm.unlink()
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        self._blocks[role] = shm
+        return shm
+
+    def _share(self, role, data):
+        """ Copy data (a C-contiguous buffer: array, or numpy array) into the block for role. Returns its name """
+        src = memoryview(data).cast('B')
+        shm = self._block(role, len(src))
+        shm.buf[0:len(src)] = src
+        return shm.name
+
+    def _chunks(self, k):
+        """ Return the (start, end) ranges to split k candidates into """
+        size = self.chunkPairs
+        if size is None:
+            size = max(MIN_CHUNK_PAIRS, -(-k // (CHUNKS_PER_WORKER * max(self.workers, 1))))
+        return [ (s, min(s + size, k)) for s in range(0, k, size) ]
+
+    def collidePairs(self, boxes, pairs, other=None):
+        """ Return the candidate pairs whose boxes overlap (touching counts, as with AABB.isColliding)
+
+            boxes (and other, if given) are AABBBatches with the same storage. pairs holds (i, j) candidate pairs:
+            boxes[i] vs. other[j] (or boxes[j], without other), as a list of tuples or a K x 2 numpy int array.
+            Returns the colliding pairs, in candidate order, in the same form
+        """
+        useNumpy = boxes.isNumpy
+        if other is None:
+            other = boxes
+        k = len(pairs)
+
+        if useNumpy:
+            pairs = numpy.ascontiguousarray(numpy.asarray(pairs, dtype=numpy.int64).reshape(k, 2))
+            boxData = numpy.ascontiguousarray(boxes.data, dtype=numpy.float64)
+            otherData = boxData if other is boxes else numpy.ascontiguousarray(other.data, dtype=numpy.float64)
+            flatPairs = pairs
+        else:
+            boxData = boxes.data
+            otherData = other.data
+            flatPairs = array(_INDEX_CODE, chain.from_iterable(pairs))
+
+        if k == 0:
+            return pairs[0:0] if useNumpy else []
+
+        if self.workers <= 0:
+            if useNumpy:
+                return pairs[_overlapsNumpy(boxData, otherData, pairs, 0, k)]
+            return [ pairs[h] for h in _overlapsPure(boxData, otherData, flatPairs, 0, k) ]
+
+        # Share the boxes and the candidates, and hand out the chunks
+        boxesName = self._share('boxes', boxData)
+        otherName = self._share('other', otherData) if other is not boxes else None
+        pairsName = self._share('pairs', flatPairs)
+        tasks = [ (boxesName, boxes.n, otherName, other.n, pairsName, k, s, e, useNumpy) for s, e in self._chunks(k) ]
+
+        if self._pool is None:
+            self._pool = multiprocessing.Pool(self.workers)
+        results = self._pool.map(_runChunk, tasks, chunksize=1)   # (In task order, whichever worker ran them)
+
+        # Merge: the hit positions come back in candidate order
+        if useNumpy:
+            return pairs[numpy.concatenate([ numpy.frombuffer(r, dtype=numpy.int64) for r in results ])]
+        hits = array(_INDEX_CODE)
+        for r in results:
+            hits.frombytes(r)
+        return [ pairs[h] for h in hits ]
@@ -18,16 +18,43 @@ from pymkfgame.mkfmath import vector
 
 class Plane(object):
     ''' A plane class in point-normal format
+
+        The plane constant d = n . p (so a point q is on the plane when n . q == d) is cached, and recomputed whenever
+        p or n is assigned. If you change the components of p or n in place (e.g. pln.n.v[:] = ...), call updateD()
     '''
     def __init__(self, p=None, n=None):
         if p is None:
-            self.p = vector.Vector()
+            self._p = vector.Vector()
         else:
-            self.p = vector.Vector(p[0], p[1], p[2], p[3])  # Note that because p is a point, p[3] could be non-zero
+            self._p = vector.Vector(p[0], p[1], p[2], p[3])  # Note that because p is a point, p[3] could be non-zero
 
         if n is None:
-            self.n = vector.Vector()  # surface normal vector. Should always be unit length (i.e., normalized.. a normalized normal. Punny)
+            self._n = vector.Vector()  # surface normal vector. Should always be unit length (i.e., normalized.. a normalized normal. Punny)
         else:
-            self.n = vector.Vector(n[0], n[1], n[2], n[3])  # Note that for a true vector, n[3] should be 0
+            self._n = vector.Vector(n[0], n[1], n[2], n[3])  # Note that for a true vector, n[3] should be 0
+
+        self.updateD()
+
+    def updateD(self):
+        ''' Recompute the cached plane constant d, from p and n '''
+        n = self._n.v
+        p = self._p.v
+        self.d = n[0]*p[0] + n[1]*p[1] + n[2]*p[2]
+
+    @property
+    def p(self):
+        return self._p
+
+    @p.setter
+    def p(self, value):
+        self._p = value
+        self.updateD()
 
+    @property
+    def n(self):
+        return self._n
 
+    @n.setter
+    def n(self, value):
+        self._n = value
+        self.updateD()
@@ -0,0 +1,59 @@
+#############################################################################
+# Copyright 2016 Mass KonFuzion
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#############################################################################
+
+import math
+
+from pymkfgame.gameobj.gameobj import GameObj
+from pymkfgame.collision.common import CollisionGeomType, hierarchyPointColumns
+from pymkfgame.collision import narrowphase
+
+class BoundingSphere(GameObj):
+    ''' A bounding sphere: the cheapest collision test there is (one squared distance compare), so it makes a good
+        first tier for a layered narrowphase (see narrowphase.collidePairs)
+    '''
+    def __init__(self, center=(0.0, 0.0, 0.0), radius=0.0):
+        super(BoundingSphere, self).__init__()
+
+        self._center = (float(center[0]), float(center[1]), float(center[2]))
+        self._radius = float(radius)
+        self._type = CollisionGeomType.sphere
+
+    def __str__(self):
+        return "center:{} radius:{} type:{}".format(self._center, self._radius, self._type)
+
+    def computeBounds(self, model, points_attr='_xpoints'):
+        ''' Compute a sphere bounding the model object (i.e., the points of the model and all its children; see
+            AABB.computeBounds)
+
+            The center is the center of the model's AABB, and the radius reaches the farthest point. That's not the
+            smallest possible sphere, but it's never more than ~1.7x bigger, and it takes two passes over the points.
+            A model with no points gets a zero-radius sphere at the origin
+        '''
+        xs, ys, zs = hierarchyPointColumns(model, points_attr)
+        if not xs:
+            self._center = (0.0, 0.0, 0.0)
+            self._radius = 0.0
+            return
+
+        cx = 0.5 * (min(xs) + max(xs))
+        cy = 0.5 * (min(ys) + max(ys))
+        cz = 0.5 * (min(zs) + max(zs))
+        self._center = (cx, cy, cz)
+        self._radius = math.sqrt(max([ (x - cx) ** 2 + (y - cy) ** 2 + (z - cz) ** 2 for x, y, z in zip(xs, ys, zs) ]))
+
+    def isColliding(self, other):
+        ''' Test for collision with another collision geometry (of any type that the narrowphase module knows) '''
+        return narrowphase.isColliding(self, other)
@@ -0,0 +1,275 @@
+#############################################################################
+# Copyright 2016 Mass KonFuzion
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#############################################################################
+
+"""
+Incremental sweep-and-prune (sort-and-sweep) broadphase
+
+The min and max endpoints of every box are kept in a sorted list per axis, from one frame to the next. When boxes
+move a little, the lists are only slightly out of order, so re-sorting them with insertion sort costs close to
+O(n). Every time two endpoints of different boxes swap places, the two boxes have either started or stopped
+overlapping on that axis, and that is all the information needed to keep the set of overlapping pairs up to date.
+
+So, instead of a full list of pairs every frame, update() reports only the changes: the pairs that started
+overlapping, and the pairs that stopped overlapping. Use getPairs() for the full list.
+
+With axes=3 (the default), all 3 axes are sorted, and the swaps alone maintain the pair set. With axes=1, only the
+x axis is sorted (a third of the sorting work), the swaps maintain the set of pairs that overlap in x, and all of
+those pairs are checked in y and z every frame. That only pays off when few boxes overlap in x, e.g. in a level
+that is long in x, and flat in y and z.
+
+Sorting is cheap when boxes move a short distance relative to the spacing of their endpoints. In crowded scenes
+with fast-moving boxes, SpatialHashGrid (in the broadphase module) does better.
+"""
+
+from pymkfgame.collision.common import packPairKey, unpackPairKey
+
+class SweepAndPrune(object):
+    def __init__(self, axes=3):
+        if axes not in (1, 3):
+            raise Exception("SweepAndPrune: axes must be 1 or 3")
+        self.numAxes = axes
+
+        self._boxes = []                # handle -> box (None for free handles)
+        self._freeHandles = []
+        self._count = 0
+        self._pending = set()           # Handles of boxes inserted since the last update()
+
+        # Per axis: the endpoint list, sorted by value. Each endpoint is identified by handle * 2 (min endpoint) or
+        # handle * 2 + 1 (max endpoint), and _values holds the matching coordinate values
+        self._keys = [ [] for a in range(0, axes) ]
+        self._values = [ [] for a in range(0, axes) ]
+
+        self._axisPairs = set()         # axes=1 only: packed keys of the pairs that overlap in x
+        self._pairs = set()             # Packed keys of the pairs that overlap
+
+        # Changes to self._pairs since the last update(), as dicts of packed key -> (a, b)
+        self._added = {}
+        self._removed = {}
+
+    def __len__(self):
+        return self._count
+
+    def getBox(self, h):
+        """ Return the box with handle h """
+        return self._boxes[h]
+
+    def getPairs(self, out=None):
+        """ Return a list of (handleA, handleB) pairs (handleA < handleB) of boxes that currently overlap
+
+            This is the state as of the last update(). If out is given (a list), it is cleared, and the pairs are
+            written into it
+        """
+        if out is None:
+            out = []
+        else:
+            del out[:]
+        for key in self._pairs:
+            out.append(unpackPairKey(key))
+        return out
+
+    def _overlaps(self, a, b):
+        """ Return True if boxes a and b (handles) overlap on all axes, by the same rule as AABB.isColliding """
+        amin = self._boxes[a]._minPt
+        amax = self._boxes[a]._maxPt
+        bmin = self._boxes[b]._minPt
+        bmax = self._boxes[b]._maxPt
+        return not (amax[0] < bmin[0] or amin[0] > bmax[0] or amax[1] < bmin[1] or amin[1] > bmax[1] or amax[2] < bmin[2] or amin[2] > bmax[2])
+
+    def _addPair(self, key):
+        if key in self._pairs:
+            return
+        self._pairs.add(key)
+        if key in self._removed:
+            del self._removed[key]  # It stopped and started overlapping again, within one update
+        else:
+            self._added[key] = unpackPairKey(key)
+
+    def _removePair(self, key):
+        if key not in self._pairs:
+            return
+        self._pairs.discard(key)
+        if key in self._added:
+            del self._added[key]
+        else:
+            self._removed[key] = unpackPairKey(key)
+
+    def _insertionSort(self, axis):
+        """ Insertion-sort the endpoints of one axis, handling every swap between endpoints of two different boxes
+
+            When a min endpoint moves left past another box's max endpoint, the boxes may have started overlapping
+            (their final bounds are checked); when a max endpoint moves left past another box's min endpoint, they
+            have stopped overlapping on this axis. Endpoints with equal values are ordered min before max, so boxes
+            that touch count as overlapping. (The swap handling is inlined, since it runs for every swap)
+        """
+        keys = self._keys[axis]
+        values = self._values[axis]
+        boxes = self._boxes
+        allAxes = (self.numAxes == 3)
+        pairs = self._pairs if allAxes else self._axisPairs
+
+        for i in range(1, len(keys)):
+            k = keys[i]
+            v = values[i]
+            isMax = k & 1
+            h = k >> 1
+            j = i - 1
+            while j >= 0 and (values[j] > v or (values[j] == v and (keys[j] & 1) and not isMax)):
+                other = keys[j]
+                o = other >> 1
+                if (other & 1) != isMax and o != h:
+                    key = (h << 32) | o if h < o else (o << 32) | h     # packPairKey(h, o)
+                    if isMax:
+                        if key in pairs:
+                            if allAxes:
+                                self._removePair(key)
+                            else:
+                                pairs.discard(key)
+                    elif key not in pairs:
+                        amin = boxes[h]._minPt
+                        amax = boxes[h]._maxPt
+                        bmin = boxes[o]._minPt
+                        bmax = boxes[o]._maxPt
+                        if allAxes:
+                            if not (amax[0] < bmin[0] or amin[0] > bmax[0] or amax[1] < bmin[1] or amin[1] > bmax[1] or amax[2] < bmin[2] or amin[2] > bmax[2]):
+                                self._addPair(key)
+                        elif not (amax[0] < bmin[0] or amin[0] > bmax[0]):
+                            pairs.add(key)
+                keys[j + 1] = other
+                values[j + 1] = values[j]
+                j -= 1
+            keys[j + 1] = k
+            values[j + 1] = v
+
+    def insert(self, box):
+        """ Add box (an AABB, or anything with _minPt and _maxPt) to the broadphase. Return its integer handle
+
+            The box's endpoints are sorted in at the next update() (all the boxes inserted since the last update are
+            sorted in one go), and its pairs are reported as added then
+        """
+        if self._freeHandles:
+            h = self._freeHandles.pop()
+            self._boxes[h] = box
+        else:
+            h = len(self._boxes)
+            self._boxes.append(box)
+        self._count += 1
+        self._pending.add(h)
+        return h
+
+    def remove(self, h):
+        """ Remove the box with handle h. Its pairs are reported as removed, by the next update() """
+        if self._boxes[h] is None:
+            raise Exception("SweepAndPrune.remove: handle {} is not in use".format(h))
+
+        if h in self._pending:
+            self._pending.discard(h)
+        else:
+            for axis in range(0, self.numAxes):
+                keys = self._keys[axis]
+                values = self._values[axis]
+                for endpoint in (2 * h, 2 * h + 1):
+                    i = keys.index(endpoint)
+                    del keys[i]
+                    del values[i]
+
+            for key in [ key for key in self._axisPairs if h in unpackPairKey(key) ]:
+                self._axisPairs.discard(key)
+            for key in [ key for key in self._pairs if h in unpackPairKey(key) ]:
+                self._removePair(key)
+
+        self._boxes[h] = None
+        self._freeHandles.append(h)
+        self._count -= 1
+
+    def _rebuild(self):
+        """ Sort all endpoints from scratch, and find all pairs with one sweep along x
+
+            Used when boxes have been inserted. Insertion sort is only fast when the lists are nearly sorted; new
+            boxes can land anywhere, so it's cheaper to start over
+        """
+        boxes = self._boxes
+        live = [ h for h in range(0, len(boxes)) if boxes[h] is not None ]
+
+        for axis in range(0, self.numAxes):
+            endpoints = [ (boxes[h]._minPt[axis], 0, 2 * h) for h in live ]
+            endpoints.extend([ (boxes[h]._maxPt[axis], 1, 2 * h + 1) for h in live ])
+            endpoints.sort()    # Ties sort min (0) before max (1), as in _insertionSort
+            self._keys[axis] = [ e[2] for e in endpoints ]
+            self._values[axis] = [ e[0] for e in endpoints ]
+
+        # Sweep along x, keeping the set of boxes whose x extent contains the current endpoint. With axes=3, only
+        # the pairs that also overlap in y and z are kept
+        allAxes = (self.numAxes == 3)
+        found = set()
+        active = set()
+        for k in self._keys[0]:
+            h = k >> 1
+            if k & 1:
+                active.discard(h)
+                continue
+
+            amin = boxes[h]._minPt
+            amax = boxes[h]._maxPt
+            for o in active:
+                if allAxes:
+                    bmin = boxes[o]._minPt
+                    bmax = boxes[o]._maxPt
+                    if amax[1] < bmin[1] or amin[1] > bmax[1] or amax[2] < bmin[2] or amin[2] > bmax[2]:
+                        continue
+                found.add(packPairKey(h, o))
+            active.add(h)
+
+        self._pending.clear()
+        if allAxes:
+            for key in self._pairs - found:
+                self._removePair(key)
+            for key in found - self._pairs:
+                self._addPair(key)
+        else:
+            self._axisPairs = found
+
+    def _syncPairs(self):
+        """ axes=1: bring self._pairs up to date with the pairs that overlap in x, by checking them in y and z """
+        overlaps = self._overlaps
+        current = set([ key for key in self._axisPairs if overlaps(key >> 32, key & 0xFFFFFFFF) ])
+        for key in self._pairs - current:
+            self._removePair(key)
+        for key in current - self._pairs:
+            self._addPair(key)
+
+    def update(self):
+        """ Re-read the bounds of every box, and update the pairs
+
+            Returns (added, removed): the lists of (handleA, handleB) pairs (handleA < handleB) that started and
+            stopped overlapping since the previous update() (including pairs from insert() and remove() calls)
+        """
+        if self._pending:
+            self._rebuild()
+        else:
+            boxes = self._boxes
+            for axis in range(0, self.numAxes):
+                keys = self._keys[axis]
+                self._values[axis] = [ (boxes[k >> 1]._maxPt if k & 1 else boxes[k >> 1]._minPt)[axis] for k in keys ]
+                self._insertionSort(axis)
+
+        if self.numAxes == 1:
+            self._syncPairs()
+
+        added = list(self._added.values())
+        removed = list(self._removed.values())
+        self._added.clear()
+        self._removed.clear()
+        return added, removed
@@ -0,0 +1,218 @@
+#############################################################################
+# Copyright 2016 Mass KonFuzion
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#############################################################################
+
+"""
+Swept-AABB continuous collision detection (time of impact)
+
+A box that moves a long way in one step can pass right through a thin box without ever overlapping it at the start
+or end of the step ("tunnelling"). Instead of substepping the whole simulation, sweep only the fast movers: find the
+fraction of the step, t (0..1), at which a moving box first touches another box, and the contact normal there.
+
+Motion is given as a displacement for the whole step (e.g. obj._velocity scaled by dt_s). For two moving boxes, the
+test uses their relative displacement, so it's the same as sweeping A against a B that stands still.
+
+The contact normal is a unit axis vector, on B's surface, pointing towards A (e.g. (0, 1, 0) when A lands on top of
+B); to stop A at the contact, move it by t * its displacement. Boxes that only touch, or slide along each other's
+faces, don't collide; boxes that already overlap at the start of the step collide at t = 0, with the normal along
+the axis of least penetration (the shortest way to push A out of B).
+
+Batched use, for many movers at once:
+    swept = sweptBounds(movers, displacements)                      # The whole volume each mover passes through
+    pairs = aabbOverlapPairs(swept, targets)                         # Broadphase (any pair list works)
+    times, normals = sweepAABBPairs(movers, displacements, targets, pairs)
+"""
+
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from pymkfgame.collision.aabb_batch import AABBBatch
+from pymkfgame.collision.dist_and_xsect import NO_HIT, _boundsOf
+from pymkfgame.mkfmath import vector_batch
+
+def _sweep(a, b, v):
+    """ Sweep bounds a (x0, y0, z0, x1, y1, z1) by displacement v against bounds b
+
+        Returns (t, axis, sign) for a hit (the normal is sign along axis), or None
+    """
+    inf = NO_HIT
+    tEnter = -inf
+    tExit = inf
+    enterAxis = 0
+    for axis in range(0, 3):
+        d = v[axis]
+        if d == 0.0:
+            if a[axis + 3] <= b[axis] or a[axis] >= b[axis + 3]:
+                return None     # Never overlapping on this axis
+            continue
+
+        if d > 0.0:
+            t0 = (b[axis] - a[axis + 3]) / d
+            t1 = (b[axis + 3] - a[axis]) / d
+        else:
+            t0 = (b[axis + 3] - a[axis]) / d
+            t1 = (b[axis] - a[axis + 3]) / d
+        if t0 > tEnter:
+            tEnter = t0
+            enterAxis = axis
+        if t1 < tExit:
+            tExit = t1
+
+    if tEnter >= tExit or tEnter > 1.0 or tExit <= 0.0:
+        return None
+
+    if tEnter >= 0.0:
+        return (tEnter, enterAxis, -1.0 if v[enterAxis] > 0.0 else 1.0)
+
+    # Already overlapping at the start of the step: push out along the axis of least penetration
+    best = inf
+    for axis in range(0, 3):
+        down = a[axis + 3] - b[axis]    # Push A towards -axis by this much
+        up = b[axis + 3] - a[axis]      # ... or towards +axis
+        if down < best:
+            best, bestAxis, bestSign = down, axis, -1.0
+        if up < best:
+            best, bestAxis, bestSign = up, axis, 1.0
+    return (0.0, bestAxis, bestSign)
+
+def sweepAABB(boxA, displacementA, boxB, displacementB=None):
+    ''' Return (t, normal) for the first contact between boxA moving by displacementA and boxB moving by displacementB
+        (None, or omitted, if B is static), or None if they don't collide during the step
+
+        t is the fraction of the step (0 <= t <= 1); normal is a (nx, ny, nz) tuple. The boxes are AABBs, or anything
+        with _minPt and _maxPt, at their positions at the start of the step
+    '''
+    if displacementB is None:
+        v = (displacementA[0], displacementA[1], displacementA[2])
+    else:
+        v = (displacementA[0] - displacementB[0], displacementA[1] - displacementB[1], displacementA[2] - displacementB[2])
+
+    hit = _sweep(_boundsOf(boxA), _boundsOf(boxB), v)
+    if hit is None:
+        return None
+    t, axis, sign = hit
+    normal = [0.0, 0.0, 0.0]
+    normal[axis] = sign
+    return (t, tuple(normal))
+
+def sweptBounds(boxes, displacements, out=None):
+    ''' Return an AABBBatch with the bounds of the volume that each box in the AABBBatch boxes sweeps through, when it
+        moves by the matching displacement (a VectorBatch with the same storage). Use it to find candidate pairs with
+        any broadphase (written into out, if given; out may be boxes)
+    '''
+    if out is None:
+        out = AABBBatch(boxes.n, boxes.isNumpy)
+    if boxes.isNumpy:
+        d = displacements.data[:, 0:3]
+        neg = numpy.minimum(d, 0.0)
+        pos = numpy.maximum(d, 0.0)
+        out.data[:, 0:3] = boxes.data[:, 0:3] + neg
+        out.data[:, 3:6] = boxes.data[:, 3:6] + pos
+        return out
+
+    b = boxes.data
+    o = out.data
+    for axis in range(0, 3):
+        d = displacements.data[axis::4]
+        o[axis::6] = array('d', [ lo + v if v < 0.0 else lo for lo, v in zip(b[axis::6], d) ])
+        o[axis + 3::6] = array('d', [ hi + v if v > 0.0 else hi for hi, v in zip(b[axis + 3::6], d) ])
+    return out
+
+def sweepAABBPairs(movers, displacements, targets, pairs, target_displacements=None):
+    ''' Batched sweepAABB, for a list of candidate pairs (e.g. from a broadphase run on sweptBounds)
+
+        movers and targets are AABBBatches, displacements (and target_displacements, if the targets move) are
+        VectorBatches, all with the same storage. pairs holds (i, j) pairs: movers[i] vs. targets[j], as a list of
+        tuples or a K x 2 numpy int array.
+
+        Returns (times, normals): one time of impact per pair (NO_HIT for pairs that don't collide), as an array('d')
+        or numpy array, and a VectorBatch with the contact normal of each pair (zero for misses)
+    '''
+    k = len(pairs)
+    normals = vector_batch.VectorBatch(k, movers.isNumpy)
+
+    if movers.isNumpy:
+        pairs = numpy.asarray(pairs, dtype=numpy.intp).reshape(k, 2)
+        if k == 0:
+            return numpy.zeros(0), normals
+        return _sweepPairsNumpy(movers, displacements, targets, target_displacements, pairs, normals), normals
+
+    times = array('d', [NO_HIT]) * k
+    a = movers.data
+    b = targets.data
+    dA = displacements.data
+    dB = target_displacements.data if target_displacements is not None else None
+    n = normals.data
+    for p in range(0, k):
+        i, j = pairs[p]
+        i = int(i)
+        j = int(j)
+        if dB is None:
+            v = dA[4 * i:4 * i + 3]
+        else:
+            v = (dA[4 * i] - dB[4 * j], dA[4 * i + 1] - dB[4 * j + 1], dA[4 * i + 2] - dB[4 * j + 2])
+        hit = _sweep(a[6 * i:6 * i + 6], b[6 * j:6 * j + 6], v)
+        if hit is not None:
+            times[p] = hit[0]
+            n[4 * p + hit[1]] = hit[2]
+    return times, normals
+
+def _sweepPairsNumpy(movers, displacements, targets, target_displacements, pairs, normals):
+    """ NumPy kernel for sweepAABBPairs. Returns the times; writes the normals """
+    i = pairs[:, 0]
+    j = pairs[:, 1]
+    aMin = movers.data[i, 0:3]
+    aMax = movers.data[i, 3:6]
+    bMin = targets.data[j, 0:3]
+    bMax = targets.data[j, 3:6]
+    v = displacements.data[i, 0:3]
+    if target_displacements is not None:
+        v = v - target_displacements.data[j, 0:3]
+
+    # Per axis: the times at which the boxes start and stop overlapping. Axes with no motion either always overlap,
+    # or never do
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        toMin = (bMin - aMax) / v
+        toMax = (bMax - aMin) / v
+    still = (v == 0.0)
+    overlapping = (aMax > bMin) & (aMin < bMax)
+    t0 = numpy.where(still, numpy.where(overlapping, -NO_HIT, NO_HIT), numpy.where(v > 0.0, toMin, toMax))
+    t1 = numpy.where(still, numpy.where(overlapping, NO_HIT, -NO_HIT), numpy.where(v > 0.0, toMax, toMin))
+
+    enterAxis = t0.argmax(axis=1)
+    rows = numpy.arange(len(pairs))
+    tEnter = t0[rows, enterAxis]
+    tExit = t1.min(axis=1)
+    hit = (tEnter < tExit) & (tEnter <= 1.0) & (tExit > 0.0)
+
+    # Normal: against the motion on the axis entered last; for pairs that start out overlapping, along the axis of
+    # least penetration
+    sign = numpy.where(v[rows, enterAxis] > 0.0, -1.0, 1.0)
+    axis = enterAxis
+    started = hit & (tEnter < 0.0)
+    if started.any():
+        depth = numpy.stack((aMax - bMin, bMax - aMin), axis=2).reshape(-1, 6)[started]    # -x, +x, -y, +y, -z, +z
+        best = depth.argmin(axis=1)
+        axis = axis.copy()
+        sign = sign.copy()
+        axis[started] = best // 2
+        sign[started] = numpy.where(best % 2 == 0, -1.0, 1.0)
+
+    normals.data[rows[hit], axis[hit]] = sign[hit]
+    return numpy.where(hit, numpy.maximum(tEnter, 0.0), NO_HIT)
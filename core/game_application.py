@@ -18,12 +18,15 @@ import pygame
 import sys
 import os
 from pymkfgame.audio import audio
+from pymkfgame.mkfmath import pool
 
 class GameApplication(object):
     ''' Application class that stores all the data and stuff
     '''
-    def __init__( self, window_size=None, bg_col=(0,0,0) ):
+    def __init__( self, window_size=None, bg_col=(0,0,0), debug_arena=False ):
         ''' Application class
+
+            debug_arena turns on use-after-reset detection in the per-frame math scratch arena (see mkfmath.pool)
         '''
         # TODO make screen size customizable. Use the dot-access config dict structure
         # TODO should the assertions enforce input of type, int?
@@ -43,6 +46,7 @@ class GameApplication(object):
         self.bg_col = (bg_col[0], bg_col[1], bg_col[2]) # No default param weirdness to worry about with a tuple, because it's immutable
         self.isRunning = True
         self._states = []   # States are managed via stack, which we will implement using a Python list
+        self.frameArena = pool.FrameArena(debug=debug_arena)   # Scratch Vectors/Matrices for the current frame. Reset at the end of postRenderScene()
 
     def cleanup(self):
         pass
@@ -116,3 +120,4 @@ class GameApplication(object):
     def postRenderScene(self):
         """Call PreRender on state at top of stack"""
         self.getState().PostRenderScene()
+        self.frameArena.reset() # postRenderScene is the last call of the frame; reclaim the frame's scratch math objects
@@ -0,0 +1,225 @@
+#############################################################################
+# Copyright 2016 Mass KonFuzion
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#############################################################################
+
+"""
+Compact affine transforms (3x4 matrices)
+
+Every transform except projection (rotate, scale, shear, translate, and any composition of them) is affine: the
+bottom row of its 4x4 matrix is always 0, 0, 0, 1. An AffineTransform stores only the top 3 rows, in the same
+column-major order as Matrix, i.e. the 12-element list is arranged like so:
+
+| 0 3 6  9 |
+| 1 4 7 10 |
+| 2 5 8 11 |
+(| 0 0 0  1 |, implied)
+
+Indexes 9, 10, 11 are the translation. Compared to the Matrix functions, the a* functions below skip all the math
+involving the implied bottom row, and never need a homogeneous divide: composing costs 36 multiplies instead of 64,
+and transforming a point costs 9 instead of 16 (plus no w checks).
+
+Like the vector and matrix functions, functions that return a new object take an optional out parameter.
+"""
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from pymkfgame.mkfmath.vector import Vector
+from pymkfgame.mkfmath.matrix import _matResult
+from pymkfgame.mkfmath.vector_batch import VectorBatch
+
+class AffineTransform(object):
+    __slots__ = ('v',)
+
+    def __init__(self, v00=1.0, v01=0.0, v02=0.0, v03=0.0, v04=1.0, v05=0.0, v06=0.0, v07=0.0, v08=1.0, v09=0.0, v10=0.0, v11=0.0):
+        """ Initialize the transform (the default is the identity)
+
+            REMEMBER!! Column-major, like Matrix
+        """
+        self.v = [ float(v00), float(v01), float(v02),
+                   float(v03), float(v04), float(v05),
+                   float(v06), float(v07), float(v08),
+                   float(v09), float(v10), float(v11) ]
+
+    def __str__(self):
+        s = """| {:06f}  {:06f}  {:06f}  {:06f} |
+| {:06f}  {:06f}  {:06f}  {:06f} |
+| {:06f}  {:06f}  {:06f}  {:06f} |"""
+        v = self.v
+        return s.format(v[0], v[3], v[6], v[9], v[1], v[4], v[7], v[10], v[2], v[5], v[8], v[11])
+
+    def __getitem__(self, item):
+        return self.v[item]
+
+    def __setitem__(self, item, value):
+        self.v[item] = float(value)
+
+## ======================
+
+def _aResult(out, v0, v1, v2, v3, v4, v5, v6, v7, v8, v9, v10, v11):
+    if out is None:
+        return AffineTransform(v0, v1, v2, v3, v4, v5, v6, v7, v8, v9, v10, v11)
+
+    out.v[:] = (v0, v1, v2, v3, v4, v5, v6, v7, v8, v9, v10, v11)
+    return out
+
+def aFromMatrix(m, out=None):
+    """ Return the AffineTransform for Matrix m (written into out, if given)
+
+        m must be affine (bottom row 0, 0, 0, 1); the bottom row is not checked, just dropped
+    """
+    v = m.v
+    return _aResult(out, v[0], v[1], v[2], v[4], v[5], v[6], v[8], v[9], v[10], v[12], v[13], v[14])
+
+def aToMatrix(a, out=None):
+    """ Return the 4x4 Matrix for AffineTransform a (written into out, if given) """
+    v = a.v
+    return _matResult(out, v[0], v[1], v[2],  0.0,
+                           v[3], v[4], v[5],  0.0,
+                           v[6], v[7], v[8],  0.0,
+                           v[9], v[10], v[11], 1.0)
+
+def aCompose(a, b, out=None):
+    """ Return the composition a * b, i.e. transform b followed by transform a, just like mMultmat(a, b)
+
+        Written into out, if given (out may be a or b)
+    """
+    a0, a1, a2, a3, a4, a5, a6, a7, a8, a9, a10, a11 = a.v
+    b0, b1, b2, b3, b4, b5, b6, b7, b8, b9, b10, b11 = b.v
+
+    return _aResult(out, a0*b0 + a3*b1 + a6*b2,
+                         a1*b0 + a4*b1 + a7*b2,
+                         a2*b0 + a5*b1 + a8*b2,
+
+                         a0*b3 + a3*b4 + a6*b5,
+                         a1*b3 + a4*b4 + a7*b5,
+                         a2*b3 + a5*b4 + a8*b5,
+
+                         a0*b6 + a3*b7 + a6*b8,
+                         a1*b6 + a4*b7 + a7*b8,
+                         a2*b6 + a5*b7 + a8*b8,
+
+                         a0*b9 + a3*b10 + a6*b11 + a9,
+                         a1*b9 + a4*b10 + a7*b11 + a10,
+                         a2*b9 + a5*b10 + a8*b11 + a11)
+
+def aInverse(a, out=None):
+    """ Return the inverse of AffineTransform a (written into out, if given; out may be a)
+
+        Raises an exception if a is singular
+    """
+    a0, a1, a2, a3, a4, a5, a6, a7, a8, tx, ty, tz = a.v
+
+    co0 = a4 * a8 - a7 * a5
+    co1 = a7 * a2 - a1 * a8
+    co2 = a1 * a5 - a4 * a2
+    det = a0 * co0 + a3 * co1 + a6 * co2
+    if det == 0.0:
+        raise Exception("aInverse: transform is singular, and cannot be inverted")
+    invDet = 1.0 / det
+
+    # Inverse of the 3x3 part, by rows (rNM = row N, column M)
+    r00 = co0 * invDet
+    r01 = (a6 * a5 - a3 * a8) * invDet
+    r02 = (a3 * a7 - a6 * a4) * invDet
+    r10 = co1 * invDet
+    r11 = (a0 * a8 - a6 * a2) * invDet
+    r12 = (a6 * a1 - a0 * a7) * invDet
+    r20 = co2 * invDet
+    r21 = (a3 * a2 - a0 * a5) * invDet
+    r22 = (a0 * a4 - a3 * a1) * invDet
+
+    return _aResult(out, r00, r10, r20,
+                         r01, r11, r21,
+                         r02, r12, r22,
+                         -(r00 * tx + r01 * ty + r02 * tz), -(r10 * tx + r11 * ty + r12 * tz), -(r20 * tx + r21 * ty + r22 * tz))
+
+def aApplyPoint(a, p, out=None):
+    """ Return point p transformed by a (rotate/scale + translate). The result is a point (w = 1.0)
+
+        Written into out, if given (out may be p)
+    """
+    a0, a1, a2, a3, a4, a5, a6, a7, a8, a9, a10, a11 = a.v
+    x = p[0]
+    y = p[1]
+    z = p[2]
+
+    if out is None:
+        return Vector(a0*x + a3*y + a6*z + a9, a1*x + a4*y + a7*z + a10, a2*x + a5*y + a8*z + a11, 1.0)
+
+    out.v[0] = a0*x + a3*y + a6*z + a9
+    out.v[1] = a1*x + a4*y + a7*z + a10
+    out.v[2] = a2*x + a5*y + a8*z + a11
+    out.v[3] = 1.0
+    return out
+
+def aApplyVector(a, v, out=None):
+    """ Return vector v transformed by a (rotate/scale only; vectors don't translate). The result has w = 0.0
+
+        Written into out, if given (out may be v)
+    """
+    a0, a1, a2, a3, a4, a5, a6, a7, a8 = a.v[0:9]
+    x = v[0]
+    y = v[1]
+    z = v[2]
+
+    if out is None:
+        return Vector(a0*x + a3*y + a6*z, a1*x + a4*y + a7*z, a2*x + a5*y + a8*z)
+
+    out.v[0] = a0*x + a3*y + a6*z
+    out.v[1] = a1*x + a4*y + a7*z
+    out.v[2] = a2*x + a5*y + a8*z
+    out.v[3] = 0.0
+    return out
+
+def aApplyBatch(a, points, out=None):
+    """ Transform every point/vector in the VectorBatch points by a
+
+        Each entry is treated according to its w: the translation is scaled by w, so points (w = 1.0) are
+        translated and vectors (w = 0.0) are not; w itself passes through unchanged. This gives the same result as
+        mMultvecBatch with the equivalent Matrix, minus the bottom-row math and the perspective divide checks.
+
+        The result is written into out, if given (out may be points). Otherwise, a new VectorBatch is returned
+    """
+    if out is None:
+        out = VectorBatch(points.n, points.isNumpy)
+
+    a0, a1, a2, a3, a4, a5, a6, a7, a8, a9, a10, a11 = a.v
+
+    if points.isNumpy:
+        src = points.data
+        rot = numpy.array(((a0, a1, a2), (a3, a4, a5), (a6, a7, a8)))    # transpose of the 3x3 part, for row vectors
+        xyz = numpy.dot(src[:, :3], rot) + numpy.outer(src[:, 3], (a9, a10, a11))
+        out.data[:, :3] = xyz
+        if out is not points:
+            out.data[:, 3] = src[:, 3]
+        return out
+
+    src = points.data
+    dst = out.data
+    for i in range(0, 4 * points.n, 4):
+        x = src[i]
+        y = src[i + 1]
+        z = src[i + 2]
+        w = src[i + 3]
+
+        dst[i]     = a0*x + a3*y + a6*z + a9*w
+        dst[i + 1] = a1*x + a4*y + a7*z + a10*w
+        dst[i + 2] = a2*x + a5*y + a8*z + a11*w
+        dst[i + 3] = w
+
+    return out
@@ -0,0 +1,69 @@
+#############################################################################
+# Copyright 2016 Mass KonFuzion
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#############################################################################
+
+"""
+Math backend selection: pure Python, or NumPy
+
+The batched routines (VectorBatch and the vb* functions, mMultvecBatch, aApplyBatch, qToMatrixBatch, matTRSBatch,
+and the batched collision queries) each have two kernels with identical semantics: a pure-Python one, and a NumPy
+one. Which kernel runs is decided by the storage of the batch passed in, and the storage of a new batch is decided
+by the backend selected here:
+
+* python (the default) - array('d') storage, pure-Python kernels. No dependencies; fastest for small batches
+* numpy - NumPy array storage, NumPy kernels. Much faster for large batches (see benchmarks/bench_backend.py for
+  where the crossover is on your machine)
+
+Select the backend with the PYMKFGAME_MATH_BACKEND environment variable, or by calling setBackend(), before
+creating any batches (batches that already exist keep their storage). Passing use_numpy=True/False when creating a
+batch overrides the backend for that one batch.
+
+NOTE: single Vector/Matrix objects always use the pure-Python code. For 4- and 16-element values, the overhead of
+a NumPy call is far bigger than the arithmetic, so a NumPy Vector would only be slower.
+"""
+
+import os
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+PYTHON = 'python'
+NUMPY = 'numpy'
+BACKENDS = (PYTHON, NUMPY)
+
+ENV_VAR = 'PYMKFGAME_MATH_BACKEND'
+
+_backend = None     # Resolved on first use (from the environment), or set by setBackend()
+
+def setBackend(name):
+    """ Select the math backend (PYTHON or NUMPY) for batches created from now on """
+    global _backend
+    if name not in BACKENDS:
+        raise Exception("Unknown math backend '{}' (must be one of: {})".format(name, ", ".join(BACKENDS)))
+    if name == NUMPY and numpy is None:
+        raise Exception("The numpy math backend was selected, but NumPy is not installed")
+    _backend = name
+
+def getBackend():
+    """ Return the name of the selected math backend """
+    if _backend is None:
+        setBackend(os.environ.get(ENV_VAR, PYTHON).strip().lower())
+    return _backend
+
+def useNumpy():
+    """ Return True if new batches should use NumPy storage """
+    return getBackend() == NUMPY
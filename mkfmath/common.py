@@ -20,26 +20,31 @@ EPSILON = 1e-5
 DEGTORAD = math.pi / 180.0
 RADTODEG = 180.0 / math.pi
 
-COSS = [ math.cos(th * DEGTORAD) for th in range(0, 360) ]  # Note that Python allows negative indexes, which happen to work flawlessly here. In other languages, you'll need to correct indiexes out of range of 0..360
+COSS = [ math.cos(th * DEGTORAD) for th in range(0, 360) ]
 SINN = [ math.sin(th * DEGTORAD) for th in range(0, 360) ]
 TANN = [ math.tan(th * DEGTORAD) for th in range(0, 360) ]
+# NOTE: coss/sinn/tann take DEGREES, at 1 degree resolution. See trig_table.TrigTable for radians, finer resolution
+# and batch lookups
 
 def coss(deg):
-    int_part = int(deg)
+    int_part = int(math.floor(deg))
     dec_part = deg - int_part
+    int_part %= 360    # wrap negative and >= 360 degree angles into the table
 
     return COSS[int_part] + dec_part * (COSS[(int_part + 1) % 360] - COSS[int_part])
 
 def sinn(deg):
-    int_part = int(deg)
+    int_part = int(math.floor(deg))
     dec_part = deg - int_part
+    int_part %= 360    # wrap negative and >= 360 degree angles into the table
 
     return SINN[int_part] + dec_part * (SINN[(int_part + 1) % 360] - SINN[int_part])
 
 
 def tann(deg):
-    int_part = int(deg)
+    int_part = int(math.floor(deg))
     dec_part = deg - int_part
+    int_part %= 360    # wrap negative and >= 360 degree angles into the table
 
     return TANN[int_part] + dec_part * (TANN[(int_part + 1) % 360] - TANN[int_part])
 
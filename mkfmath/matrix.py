@@ -37,35 +37,116 @@ Also note: We're going to design our world with a left-handed coordinate system.
 # TODO: Maybe change to 4-element vectors and such.. If we ever want. Say we want to get a translation matrix from the engine, and hold onto it, to transform a bunch of points.. It's quickest to return that matrix as a 4x4
 
 To compose transformations, we want, e.g. v' = vRT (where v' is transformed vec; R = rot mat; T = trans mat)
+
+Functions that return a new Matrix or Vector (including the mat* builders) also take an optional out parameter. If
+out is given, the result is written into that object (which is also returned) instead of allocating a new one, so
+hot loops can reuse scratch objects.
 """
 
 
 import math
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 from pymkfgame.mkfmath import common
 from pymkfgame.mkfmath.vector import Vector
+from pymkfgame.mkfmath.vector_batch import VectorBatch
+
+def _mathSinCos(th):
+    return math.sin(th), math.cos(th)
+
+_sinCos = _mathSinCos  # (sin, cos) function used by the rotation matrix builders. See setTrigTable()
+_trigTable = None       # The TrigTable _sinCos samples, if any (matTRSBatch's NumPy path samples it with sinCosBatch)
+
+def setTrigTable(table=None):
+    """ Make the Matrix.matRot* builders look up sin/cos in table (a trig_table.TrigTable), instead of calling
+        math.sin/math.cos. Pass None to go back to math.sin/math.cos
+    """
+    global _sinCos, _trigTable
+    _trigTable = table
+    if table is None:
+        _sinCos = _mathSinCos
+    else:
+        _sinCos = table.sinCosRad
+
+def _matResult(out, v0, v1, v2, v3, v4, v5, v6, v7, v8, v9, v10, v11, v12, v13, v14, v15):
+    """ Return a new Matrix with the given coefficients, or, if out is given, write them into out and return it """
+    if out is None:
+        return Matrix(v0, v1, v2, v3, v4, v5, v6, v7, v8, v9, v10, v11, v12, v13, v14, v15)
+
+    out.v[:] = (v0, v1, v2, v3, v4, v5, v6, v7, v8, v9, v10, v11, v12, v13, v14, v15)
+    return out
+
+def _rotZYX(ax, ay, az):
+    """ Return the 9 coefficients (column-major 3x3) of Rz(az) * Ry(ay) * Rx(ax), i.e. rotate about x, then y, then z """
+    sx, cx = _sinCos(ax)
+    sy, cy = _sinCos(ay)
+    sz, cz = _sinCos(az)
+
+    return ( cy * cz,                 cy * sz,                 -sy,
+             sx * sy * cz - cx * sz,  sx * sy * sz + cx * cz,  sx * cy,
+             cx * sy * cz + sx * sz,  cx * sy * sz - sx * cz,  cx * cy )
+
+class RotationCache(object):
+    ''' A small cache of rotation coefficients, keyed by Euler angles quantised to multiples of step (RADIANS)
+
+        Pass one of these to Matrix.matTRS, and the sin/cos work is only done the first time each orientation is
+        seen. The lookup (quantising and hashing the angles) costs more than 3 math.sin/math.cos pairs do, so
+        this only pays off when trig is expensive (e.g. a slow interpreter or a slow sin/cos); with math.sin and
+        math.cos on CPython, matTRS is faster without it. Angles are snapped to the nearest multiple of step, so
+        only use a cache when that is acceptable.
+        When the cache holds max_entries orientations, it is cleared and starts over.
+    '''
+    def __init__(self, step=common.DEGTORAD, max_entries=4096):
+        self.step = float(step)
+        self.maxEntries = max_entries
+        self._invStep = 1.0 / self.step
+        self._rotations = {}
+
+    def get(self, ax, ay, az):
+        ''' Return the 9 coefficients of the rotation for (ax, ay, az), quantised '''
+        invStep = self._invStep
+        key = (int(round(ax * invStep)), int(round(ay * invStep)), int(round(az * invStep)))
+
+        rot = self._rotations.get(key)
+        if rot is None:
+            if len(self._rotations) >= self.maxEntries:
+                self._rotations.clear()
+            rot = _rotZYX(key[0] * self.step, key[1] * self.step, key[2] * self.step)
+            self._rotations[key] = rot
+        return rot
+
+    def clear(self):
+        self._rotations.clear()
 
 class Matrix(object):
-    # TODO maybe make a function that returns a composed XYZ rotation matrix (faster than composing the matrices by calling multiple individual rotation matrix multiplications
+    __slots__ = ('v',)  # No per-instance __dict__; a Matrix is just its coefficient list
+
+    # NOTE: see matTRS for a composed XYZ rotation (plus translate and scale), computed directly instead of via mMultmat
     @staticmethod
-    def matRotX(th=0.0):
+    def matRotX(th=0.0, out=None):
         """ Return a column-major matrix for rotation about the x axis, by th RADIANS
         
             th is short for theta.
         """
+        s, c = _sinCos(th)
+
         v0  = 1.0
         v1  = 0.0
         v2  = 0.0
         v3  = 0.0
 
         v4  = 0.0
-        v5  = math.cos(th)   # TODO possibly use a cos/sin lookup table for speed?
-        v6  = math.sin(th)
+        v5  = c
+        v6  = s
         v7  = 0.0
 
         v8  = 0.0
-        v9  = -math.sin(th)
-        v10 = math.cos(th)
+        v9  = -s
+        v10 = c
         v11 = 0.0
 
         v12 = 0.0
@@ -73,18 +154,19 @@ class Matrix(object):
         v14 = 0.0
         v15 = 1.0
 
-        return Matrix(v0, v1, v2, v3, v4, v5, v6, v7, v8, v9, v10, v11, v12, v13, v14, v15)
+        return _matResult(out, v0, v1, v2, v3, v4, v5, v6, v7, v8, v9, v10, v11, v12, v13, v14, v15)
 
     @staticmethod
-    def matRotY(th=0.0):
+    def matRotY(th=0.0, out=None):
         """ Return a column-major matrix for rotation about the x axis, by th RADIANS
         
             th is short for theta.
         """
+        s, c = _sinCos(th)
 
-        v0  = math.cos(th)
+        v0  = c
         v1  = 0.0
-        v2  = -math.sin(th)
+        v2  = -s
         v3  = 0.0
 
         v4  = 0.0
@@ -92,9 +174,9 @@ class Matrix(object):
         v6  = 0.0
         v7  = 0.0
 
-        v8  = math.sin(th)
+        v8  = s
         v9  = 0.0
-        v10 = math.cos(th)
+        v10 = c
         v11 = 0.0
 
         v12 = 0.0
@@ -102,21 +184,23 @@ class Matrix(object):
         v14 = 0.0
         v15 = 1.0
         
-        return Matrix(v0, v1, v2, v3, v4, v5, v6, v7, v8, v9, v10, v11, v12, v13, v14, v15)
+        return _matResult(out, v0, v1, v2, v3, v4, v5, v6, v7, v8, v9, v10, v11, v12, v13, v14, v15)
 
     @staticmethod
-    def matRotZ(th=0.0):
+    def matRotZ(th=0.0, out=None):
         """ Return a column-major matrix for rotation about the z axis, by th RADIANS
         
             th is short for theta.
         """
-        v0  = math.cos(th)
-        v1  = math.sin(th)
+        s, c = _sinCos(th)
+
+        v0  = c
+        v1  = s
         v2  = 0.0
         v3  = 0.0
 
-        v4  = -math.sin(th)
-        v5  =  math.cos(th)
+        v4  = -s
+        v5  =  c
         v6  = 0.0
         v7  = 0.0
 
@@ -130,44 +214,45 @@ class Matrix(object):
         v14 = 0.0
         v15 = 1.0
 
-        return Matrix(v0, v1, v2, v3, v4, v5, v6, v7, v8, v9, v10, v11, v12, v13, v14, v15)
+        return _matResult(out, v0, v1, v2, v3, v4, v5, v6, v7, v8, v9, v10, v11, v12, v13, v14, v15)
 
     @staticmethod
-    def matRotArb(th, px, py, pz, dx, dy, dz):
+    def matRotArb(th, px, py, pz, dx, dy, dz, out=None):
         """ Return a matrix for rotation about an arbitrary axis
             p (x,y,z) defines a point that the axis goes through
             d (x,y,z) defines the direction. d MUST BE NORMALIZED!
         """
-        v0  = dx*dx + (dy*dy + dz*dz) * math.cos(th)
-        v1  = dx * dy * (1.0 - math.cos(th)) + dz * math.sin(th)
-        v2  = dx * dz * (1.0 - math.cos(th)) - dy * math.sin(th)
+        s, c = _sinCos(th)
+
+        v0  = dx*dx + (dy*dy + dz*dz) * c
+        v1  = dx * dy * (1.0 - c) + dz * s
+        v2  = dx * dz * (1.0 - c) - dy * s
         v3  = 0.0
 
-        v4  = dx * dy * (1.0 - math.cos(th)) - dz * math.sin(th)
-        v5  = dy*dy + (dx*dx + dz*dz) * math.cos(th)
-        v6  = dy * dz * (1.0 - math.cos(th)) + dx * math.sin(th)
+        v4  = dx * dy * (1.0 - c) - dz * s
+        v5  = dy*dy + (dx*dx + dz*dz) * c
+        v6  = dy * dz * (1.0 - c) + dx * s
         v7  = 0.0
 
-        v8  = dx * dz * (1.0 - math.cos(th)) + dy * math.sin(th)
-        v9  = dy * dz * (1.0 - math.cos(th)) - dx * math.sin(th)
-        v10 = dz*dz * (dx*dx + dy*dy) * math.cos(th)
+        v8  = dx * dz * (1.0 - c) + dy * s
+        v9  = dy * dz * (1.0 - c) - dx * s
+        v10 = dz*dz * (dx*dx + dy*dy) * c
         v11 = 0.0
 
-        v12 = (px * (dy*dy + dz*dz) - dx * (py*dy + pz*dz)) * (1 - math.cos(th)) + (py*dz - pz*dy) * math.sin(th)
-        v13 = (py * (dx*dx + dz*dz) - dy * (px*dx + pz*dz)) * (1 - math.cos(th)) + (pz*dx - px*dz) * math.sin(th)
-        v14 = (pz * (dx*dx + dy*dy) - dz * (px*dx + py*dy)) * (1 - math.cos(th)) + (px*dy - py*dx) * math.sin(th)
+        v12 = (px * (dy*dy + dz*dz) - dx * (py*dy + pz*dz)) * (1 - c) + (py*dz - pz*dy) * s
+        v13 = (py * (dx*dx + dz*dz) - dy * (px*dx + pz*dz)) * (1 - c) + (pz*dx - px*dz) * s
+        v14 = (pz * (dx*dx + dy*dy) - dz * (px*dx + py*dy)) * (1 - c) + (px*dy - py*dx) * s
         v15 = 1.0
 
-        return Matrix(v0, v1, v2, v3, v4, v5, v6, v7, v8, v9, v10, v11, v12, v13, v14, v15)
+        return _matResult(out, v0, v1, v2, v3, v4, v5, v6, v7, v8, v9, v10, v11, v12, v13, v14, v15)
 
     @staticmethod
-    def matRotFromAxisAngle(th, ax, ay, az):
+    def matRotFromAxisAngle(th, ax, ay, az, out=None):
         """ Compute a rotation matrix from an axis and angle
 
             NOTE: The axis must be normalized, and th given in RADIANS
         """
-        c = math.cos(th)
-        s = math.sin(th)
+        s, c = _sinCos(th)
         t = 1 - c
 
         v0  = t*ax*ax + c
@@ -190,23 +275,23 @@ class Matrix(object):
         v14 = 0.0
         v15 = 1.0
 
-        return Matrix(v0, v1, v2, v3, v4, v5, v6, v7, v8, v9, v10, v11, v12, v13, v14, v15)
+        return _matResult(out, v0, v1, v2, v3, v4, v5, v6, v7, v8, v9, v10, v11, v12, v13, v14, v15)
 
     @staticmethod
-    def matScale(sx=1.0, sy=1.0, sz=1.0):
-        v0  = sx
+    def matScale(sx=1.0, sy=1.0, sz=1.0, out=None):
+        v0  = float(sx)
         v1  = 0.0
         v2  = 0.0
         v3  = 0.0
 
         v4  = 0.0
-        v5  = sy
+        v5  = float(sy)
         v6  = 0.0
         v7  = 0.0
 
         v8  = 0.0
         v9  = 0.0
-        v10 = sz
+        v10 = float(sz)
         v11 = 0.0
 
         v12 = 0.0
@@ -214,10 +299,10 @@ class Matrix(object):
         v14 = 0.0
         v15 = 1.0
 
-        return Matrix(v0, v1, v2, v3, v4, v5, v6, v7, v8, v9, v10, v11, v12, v13, v14, v15)
+        return _matResult(out, v0, v1, v2, v3, v4, v5, v6, v7, v8, v9, v10, v11, v12, v13, v14, v15)
 
     @staticmethod
-    def matTrans(tx=0.0, ty=0.0, tz=0.0):
+    def matTrans(tx=0.0, ty=0.0, tz=0.0, out=None):
         v0  = 1.0
         v1  = 0.0
         v2  = 0.0
@@ -233,15 +318,15 @@ class Matrix(object):
         v10 = 1.0 
         v11 = 0.0
 
-        v12 = tx
-        v13 = ty
-        v14 = tz
+        v12 = float(tx)
+        v13 = float(ty)
+        v14 = float(tz)
         v15 = 1.0
 
-        return Matrix(v0, v1, v2, v3, v4, v5, v6, v7, v8, v9, v10, v11, v12, v13, v14, v15)
+        return _matResult(out, v0, v1, v2, v3, v4, v5, v6, v7, v8, v9, v10, v11, v12, v13, v14, v15)
 
     @staticmethod
-    def matIdent():
+    def matIdent(out=None):
         ## TODO maybe make the ident matrix a member function? e.g., in-place set matrix to identity?
         v0  = 1.0
         v1  = 0.0
@@ -263,15 +348,15 @@ class Matrix(object):
         v14 = 0.0
         v15 = 1.0
 
-        return Matrix(v0, v1, v2, v3, v4, v5, v6, v7, v8, v9, v10, v11, v12, v13, v14, v15)
+        return _matResult(out, v0, v1, v2, v3, v4, v5, v6, v7, v8, v9, v10, v11, v12, v13, v14, v15)
 
     @staticmethod
-    def matZero():
+    def matZero(out=None):
         ## TODO maybe make the zero matrix a member function? e.g., in-place set matrix to zero?
         v0  = 0.0
+        v1  = 0.0
         v2  = 0.0
         v3  = 0.0
-        v4  = 0.0
 
         v4  = 0.0
         v5  = 0.0
@@ -288,7 +373,85 @@ class Matrix(object):
         v14 = 0.0
         v15 = 0.0
 
-        return Matrix(v0, v1, v2, v3, v4, v5, v6, v7, v8, v9, v10, v11, v12, v13, v14, v15)
+        return _matResult(out, v0, v1, v2, v3, v4, v5, v6, v7, v8, v9, v10, v11, v12, v13, v14, v15)
+
+    @staticmethod
+    def matTRS(pos, euler, scale=(1.0, 1.0, 1.0), out=None, rotCache=None):
+        """ Return a model matrix that scales, then rotates, then translates, i.e. T * Rz * Ry * Rx * S
+
+            pos is the translation (x, y, z); euler is the rotation about x, y and z, in RADIANS (applied in that
+            order); scale is the scale along x, y and z. Any indexable works (Vector, tuple, list, ...).
+
+            The 16 coefficients are computed directly, so this replaces 5 builder calls and 4 mMultmat calls.
+            If rotCache (a RotationCache) is given, the rotation comes from the cache (see RotationCache)
+        """
+        if rotCache is None:
+            r0, r1, r2, r4, r5, r6, r8, r9, r10 = _rotZYX(euler[0], euler[1], euler[2])
+        else:
+            r0, r1, r2, r4, r5, r6, r8, r9, r10 = rotCache.get(euler[0], euler[1], euler[2])
+
+        kx = float(scale[0])
+        ky = float(scale[1])
+        kz = float(scale[2])
+
+        return _matResult(out, r0 * kx, r1 * kx, r2  * kx, 0.0,
+                               r4 * ky, r5 * ky, r6  * ky, 0.0,
+                               r8 * kz, r9 * kz, r10 * kz, 0.0,
+                               float(pos[0]), float(pos[1]), float(pos[2]), 1.0)
+
+    @staticmethod
+    def matTRSBatch(positions, eulers, scales=None, out=None, rotCache=None):
+        """ Return a list of model matrices, one per object, like matTRS
+
+            positions, eulers and scales are parallel VectorBatches (scales may be None, for no scaling). If out is
+            given, it must be a list of (at least) positions.n Matrix objects, which are overwritten
+
+            Like matTRS, sin/cos come from the table installed with setTrigTable, if any, on either backend
+        """
+        n = positions.n
+        if out is None:
+            out = [ Matrix() for _ in range(0, n) ]
+
+        if positions.isNumpy and rotCache is None:
+            e = eulers.data
+            if _trigTable is None:
+                sx, cx = numpy.sin(e[:, 0]), numpy.cos(e[:, 0])
+                sy, cy = numpy.sin(e[:, 1]), numpy.cos(e[:, 1])
+                sz, cz = numpy.sin(e[:, 2]), numpy.cos(e[:, 2])
+            else:
+                sx, cx = _trigTable.sinCosBatch(e[:, 0])
+                sy, cy = _trigTable.sinCosBatch(e[:, 1])
+                sz, cz = _trigTable.sinCosBatch(e[:, 2])
+
+            coeffs = numpy.zeros((n, 16))
+            coeffs[:, 0]  = cy * cz
+            coeffs[:, 1]  = cy * sz
+            coeffs[:, 2]  = -sy
+            coeffs[:, 4]  = sx * sy * cz - cx * sz
+            coeffs[:, 5]  = sx * sy * sz + cx * cz
+            coeffs[:, 6]  = sx * cy
+            coeffs[:, 8]  = cx * sy * cz + sx * sz
+            coeffs[:, 9]  = cx * sy * sz - sx * cz
+            coeffs[:, 10] = cx * cy
+            if scales is not None:
+                k = scales.data
+                coeffs[:, 0:3]  *= k[:, 0:1]
+                coeffs[:, 4:7]  *= k[:, 1:2]
+                coeffs[:, 8:11] *= k[:, 2:3]
+            coeffs[:, 12:15] = positions.data[:, 0:3]
+            coeffs[:, 15] = 1.0
+
+            rows = coeffs.tolist()
+            for i in range(0, n):
+                out[i].v[:] = rows[i]
+            return out
+
+        unitScale = (1.0, 1.0, 1.0)
+        for i in range(0, n):
+            Matrix.matTRS(positions.getVector(i, _scratchPos), eulers.getVector(i, _scratchEuler),
+                          unitScale if scales is None else scales.getVector(i, _scratchScale), out[i], rotCache)
+        return out
+
     # TODO also compute matrix for rotation about an arbitrary axis?
 
     def __init__(self, v00=0.0, v01=0.0, v02=0.0, v03=0.0, v04=0.0, v05=0.0, v06=0.0, v07=0.0, v08=0.0, v09=0.0, v10=0.0, v11=0.0, v12=0.0, v13=0.0, v14=0.0, v15=0.0):
@@ -325,7 +488,7 @@ class Matrix(object):
         self.v[item] = float(value)
 
     def __neg__(self):
-        return Matrix(-self.v[0], -self.v[1], -self.v[2], -self.v[3], -self.v[4], -self.v[5], -self.v[6], -self.v[7], -self.v[8] )
+        return Matrix(*[ -c for c in self.v ])
 
     def __eq__(self, m):
         """ Test equality
@@ -348,13 +511,19 @@ class Matrix(object):
         return True
 
 
-def mMultvec(m, v):
+_scratchPos = Vector()      # Scratch space for matTRSBatch (avoids allocating 3 Vectors per object)
+_scratchEuler = Vector()
+_scratchScale = Vector()
+
+def mMultvec(m, v, out=None):
     """ Multiply Vector v with Matrix m
 
         Post-multiply m by v.
         Note: m is 4x4. v is 4x1. The resulting vector is 4x1
 
         This function handles points with a homogeneous coordinate (i.e. 4D, w == 1), and true "vectors", 3D
+
+        If out is given, the result is written into it (out may be v), instead of into a new Vector
     """
     x = m[0]*v[0] + m[4]*v[1] + m[8] *v[2] + m[12]*v[3]    # m[12] is, e.g. the position in matrix for tx (translate)
     y = m[1]*v[0] + m[5]*v[1] + m[9] *v[2] + m[13]*v[3]
@@ -368,13 +537,123 @@ def mMultvec(m, v):
         z /= w
         w = 1.0
 
-    return Vector(x, y, z, w)
+    if out is None:
+        return Vector(x, y, z, w)
+
+    out.v[0] = x
+    out.v[1] = y
+    out.v[2] = z
+    out.v[3] = w
+    return out
 
 
-def mMultmat(ma, mb):
+def mMultvecBatch(m, points, out=None, matPost=None):
+    """ Multiply every point/vector in the VectorBatch points with Matrix m
+
+        This is the batched version of mMultvec, with the same homogeneous handling: for each input with w == 1.0
+        whose transformed w != 1.0, x, y, z are divided by the transformed w (the perspective divide), and w
+        becomes 1.0. The matrix coefficients are read once per call, instead of once per point.
+
+        If matPost is given, each transformed point is then multiplied by matPost (e.g. a viewport matrix), with
+        a second homogeneous divide, all in the same pass. The result is the same as calling mMultvec(matPost,
+        mMultvec(m, v)) on each point.
+
+        The result is written into out, if given (out must be a VectorBatch with the same size and storage type
+        as points; it may be points itself, to transform in-place). Otherwise, a new VectorBatch is returned
+    """
+    if out is None:
+        out = VectorBatch(points.n, points.isNumpy)
+
+    if points.isNumpy:
+        _mMultvecBatchNumpy(m, points.data, out.data)
+        if matPost is not None:
+            _mMultvecBatchNumpy(matPost, out.data, out.data)
+        return out
+
+    m0, m1, m2, m3, m4, m5, m6, m7, m8, m9, m10, m11, m12, m13, m14, m15 = m.v
+    src = points.data
+    dst = out.data
+
+    if matPost is None:
+        for i in range(0, 4 * points.n, 4):
+            vx = src[i]
+            vy = src[i + 1]
+            vz = src[i + 2]
+            vw = src[i + 3]
+
+            x = m0*vx + m4*vy + m8 *vz + m12*vw
+            y = m1*vx + m5*vy + m9 *vz + m13*vw
+            z = m2*vx + m6*vy + m10*vz + m14*vw
+            w = m3*vx + m7*vy + m11*vz + m15*vw
+
+            if vw == 1.0 and w != 1.0:
+                x /= w
+                y /= w
+                z /= w
+                w = 1.0
+
+            dst[i]     = x
+            dst[i + 1] = y
+            dst[i + 2] = z
+            dst[i + 3] = w
+    else:
+        p0, p1, p2, p3, p4, p5, p6, p7, p8, p9, p10, p11, p12, p13, p14, p15 = matPost.v
+        for i in range(0, 4 * points.n, 4):
+            vx = src[i]
+            vy = src[i + 1]
+            vz = src[i + 2]
+            vw = src[i + 3]
+
+            x = m0*vx + m4*vy + m8 *vz + m12*vw
+            y = m1*vx + m5*vy + m9 *vz + m13*vw
+            z = m2*vx + m6*vy + m10*vz + m14*vw
+            w = m3*vx + m7*vy + m11*vz + m15*vw
+
+            if vw == 1.0 and w != 1.0:
+                x /= w
+                y /= w
+                z /= w
+                w = 1.0
+
+            # Second transform (e.g. viewport), applied to the intermediate result
+            tx = p0*x + p4*y + p8 *z + p12*w
+            ty = p1*x + p5*y + p9 *z + p13*w
+            tz = p2*x + p6*y + p10*z + p14*w
+            tw = p3*x + p7*y + p11*z + p15*w
+
+            if w == 1.0 and tw != 1.0:
+                tx /= tw
+                ty /= tw
+                tz /= tw
+                tw = 1.0
+
+            dst[i]     = tx
+            dst[i + 1] = ty
+            dst[i + 2] = tz
+            dst[i + 3] = tw
+
+    return out
+
+def _mMultvecBatchNumpy(m, src, dst):
+    """ NumPy kernel for mMultvecBatch. src and dst are N x 4 arrays (dst may be src) """
+    # Column-major storage means that reshaping m.v row-by-row gives the transpose of m, which is exactly what we
+    # need to post-multiply row vectors: (M v)^T = v^T M^T
+    result = numpy.dot(src, numpy.array(m.v).reshape(4, 4))
+
+    # Masked perspective divide (only for points, i.e. w == 1.0, whose transformed w is not 1.0)
+    mask = (src[:, 3] == 1.0) & (result[:, 3] != 1.0)
+    result[mask, :3] /= result[mask, 3:4]
+    result[mask, 3] = 1.0
+
+    dst[:] = result
+
+
+def mMultmat(ma, mb, out=None):
     """ Multiply matrix ma and mb
 
         Postmultiply mb
+
+        If out is given, the result is written into it (out may be ma or mb), instead of into a new Matrix
     """
     ## TODO test this matrix multiplication
     v0  = ma[0]*mb[0] + ma[4]*mb[1] + ma[8] *mb[2] + ma[12]*mb[3]
@@ -397,16 +676,155 @@ def mMultmat(ma, mb):
     v14 = ma[2]*mb[12] + ma[6]*mb[13] + ma[10]*mb[14] + ma[14]*mb[15]
     v15 = ma[3]*mb[12] + ma[7]*mb[13] + ma[11]*mb[14] + ma[15]*mb[15]
 
-    return Matrix(v0, v1, v2, v3, v4, v5, v6, v7, v8, v9, v10, v11, v12, v13, v14, v15)
+    return _matResult(out, v0, v1, v2, v3, v4, v5, v6, v7, v8, v9, v10, v11, v12, v13, v14, v15)
+
+
+def mCopy(m, out=None):
+    """ Return a copy of Matrix m (written into out, if given) """
+    if out is None:
+        return Matrix(*m.v)
+
+    out.v[:] = m.v
+    return out
+
+
+def mTranspose(m, out=None):
+    """ Return the transpose of Matrix m (written into out, if given; out may be m) """
+    v = m.v
+    return _matResult(out, v[0], v[4], v[8],  v[12],
+                           v[1], v[5], v[9],  v[13],
+                           v[2], v[6], v[10], v[14],
+                           v[3], v[7], v[11], v[15])
+
+
+def _cofactors(v):
+    """ Return the 16 cofactors of the 4x4 matrix stored in v (i.e. the adjugate, in the same storage order)
+
+        The expansion works on indexes only, so it's the same for column-major and row-major storage (the inverse
+        of the transpose is the transpose of the inverse)
+    """
+    v0, v1, v2, v3, v4, v5, v6, v7, v8, v9, v10, v11, v12, v13, v14, v15 = v
+
+    # 2x2 sub-determinants, shared by many of the cofactors
+    s0 = v0 * v5  - v4 * v1
+    s1 = v0 * v6  - v4 * v2
+    s2 = v0 * v7  - v4 * v3
+    s3 = v1 * v6  - v5 * v2
+    s4 = v1 * v7  - v5 * v3
+    s5 = v2 * v7  - v6 * v3
+
+    c5 = v10 * v15 - v14 * v11
+    c4 = v9  * v15 - v13 * v11
+    c3 = v9  * v14 - v13 * v10
+    c2 = v8  * v15 - v12 * v11
+    c1 = v8  * v14 - v12 * v10
+    c0 = v8  * v13 - v12 * v9
+
+    return ( ( v5 * c5 - v6 * c4 + v7 * c3), (-v1 * c5 + v2 * c4 - v3 * c3), ( v13 * s5 - v14 * s4 + v15 * s3), (-v9 * s5 + v10 * s4 - v11 * s3),
+             (-v4 * c5 + v6 * c2 - v7 * c1), ( v0 * c5 - v2 * c2 + v3 * c1), (-v12 * s5 + v14 * s2 - v15 * s1), ( v8 * s5 - v10 * s2 + v11 * s1),
+             ( v4 * c4 - v5 * c2 + v7 * c0), (-v0 * c4 + v1 * c2 - v3 * c0), ( v12 * s4 - v13 * s2 + v15 * s0), (-v8 * s4 + v9 * s2 - v11 * s0),
+             (-v4 * c3 + v5 * c1 - v6 * c0), ( v0 * c3 - v1 * c1 + v2 * c0), (-v12 * s3 + v13 * s1 - v14 * s0), ( v8 * s3 - v9 * s1 + v10 * s0) )
+
+
+def mDeterminant(m):
+    """ Return the determinant of Matrix m """
+    v0, v1, v2, v3, v4, v5, v6, v7, v8, v9, v10, v11, v12, v13, v14, v15 = m.v
+
+    s0 = v0 * v5  - v4 * v1
+    s1 = v0 * v6  - v4 * v2
+    s2 = v0 * v7  - v4 * v3
+    s3 = v1 * v6  - v5 * v2
+    s4 = v1 * v7  - v5 * v3
+    s5 = v2 * v7  - v6 * v3
+
+    c5 = v10 * v15 - v14 * v11
+    c4 = v9  * v15 - v13 * v11
+    c3 = v9  * v14 - v13 * v10
+    c2 = v8  * v15 - v12 * v11
+    c1 = v8  * v14 - v12 * v10
+    c0 = v8  * v13 - v12 * v9
+
+    return s0 * c5 - s1 * c4 + s2 * c3 + s3 * c2 - s4 * c1 + s5 * c0
+
+
+def mInverse(m, out=None):
+    """ Return the inverse of Matrix m (written into out, if given; out may be m)
+
+        This is the general 4x4 inverse (cofactor expansion), which works for any invertible matrix, including
+        projection matrices. If you know m is affine (bottom row is 0, 0, 0, 1), or a rotation + translation, use
+        mInverseAffine or mInverseOrthonormal, which are much cheaper.
+
+        Raises an exception if m is singular
+    """
+    adj = _cofactors(m.v)
+    det = m.v[0] * adj[0] + m.v[1] * adj[4] + m.v[2] * adj[8] + m.v[3] * adj[12]
+    if det == 0.0:
+        raise Exception("mInverse: matrix is singular, and cannot be inverted")
+
+    invDet = 1.0 / det
+    return _matResult(out, *[ c * invDet for c in adj ])
+
+
+def mInverseAffine(m, out=None):
+    """ Return the inverse of affine Matrix m (written into out, if given; out may be m)
+
+        m must be affine, i.e. its bottom row must be 0, 0, 0, 1 (rotation, scale, shear and translation are all
+        fine; projection is not). The inverse is [ A^-1 | -A^-1 t ], where A is the upper-left 3x3 and t is the
+        translation column, so only a 3x3 inverse is needed.
+
+        Raises an exception if m is singular
+    """
+    v = m.v
+    a, d, g = v[0], v[1], v[2]      # A, by rows: | a b c |
+    b, e, h = v[4], v[5], v[6]      #             | d e f |
+    c, f, i = v[8], v[9], v[10]     #             | g h i |
+    tx, ty, tz = v[12], v[13], v[14]
+
+    co0 = e * i - f * h
+    co1 = f * g - d * i
+    co2 = d * h - e * g
+    det = a * co0 + b * co1 + c * co2
+    if det == 0.0:
+        raise Exception("mInverseAffine: matrix is singular, and cannot be inverted")
+    invDet = 1.0 / det
+
+    # Inverse of A, by rows (r00 = row 0, col 0, etc)
+    r00 = co0 * invDet
+    r01 = (c * h - b * i) * invDet
+    r02 = (b * f - c * e) * invDet
+    r10 = co1 * invDet
+    r11 = (a * i - c * g) * invDet
+    r12 = (c * d - a * f) * invDet
+    r20 = co2 * invDet
+    r21 = (b * g - a * h) * invDet
+    r22 = (a * e - b * d) * invDet
+
+    return _matResult(out, r00, r10, r20, 0.0,
+                           r01, r11, r21, 0.0,
+                           r02, r12, r22, 0.0,
+                           -(r00 * tx + r01 * ty + r02 * tz), -(r10 * tx + r11 * ty + r12 * tz), -(r20 * tx + r21 * ty + r22 * tz), 1.0)
+
+
+def mInverseOrthonormal(m, out=None):
+    """ Return the inverse of Matrix m, a rotation + translation (written into out, if given; out may be m)
+
+        The upper-left 3x3 of m must be orthonormal (i.e. a pure rotation: unit-length, mutually perpendicular
+        columns, no scale), and the bottom row must be 0, 0, 0, 1. That's the case for e.g. camera/view matrices
+        and rigid-body transforms. The inverse is then just [ R^T | -R^T t ]; no division at all.
+    """
+    v = m.v
+    tx, ty, tz = v[12], v[13], v[14]
+
+    return _matResult(out, v[0], v[4], v[8],  0.0,
+                           v[1], v[5], v[9],  0.0,
+                           v[2], v[6], v[10], 0.0,
+                           -(v[0] * tx + v[1] * ty + v[2]  * tz),
+                           -(v[4] * tx + v[5] * ty + v[6]  * tz),
+                           -(v[8] * tx + v[9] * ty + v[10] * tz), 1.0)
 
 
 ## TODO 
-# matrix inverse
-# matrix transpose (for a matrix composed of orthonormal vectors, the transpose is the inverse)
-# determinant
 # perhaps some static functions for the class:
-# zero out matrix (in-place)
-# make matrix identity matrix (in-place)
 # - getRotMat
 # - getTransMat
 # - getScaleMat
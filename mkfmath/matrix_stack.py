@@ -21,11 +21,16 @@ class MatrixStack(object):
     
         Stack will grow toward increasing list indices
 
+        Like OpenGL, each stack entry holds the composed product of everything pushed so far, so getMatrix() is a
+        copy of the top entry (no re-composing), and popMatrix() restores the previous product for free. Entry
+        matrices are kept and reused across push/pop, so pushing doesn't allocate once the stack has grown to its
+        working depth.
+
         (I've always wanted to write one of these.. Why not just use OpenGL? Because I want to learn)
     '''
     def __init__(self):
-        self._m = []        # We're going to implement a stack using a list
-        self._sp = 0        # Stack pointer
+        self._m = []        # We're going to implement a stack using a list. _m[i] is the composed product of matrices 0..i
+        self._sp = 0        # Stack pointer (# of entries in use; _m can hold more, left over from deeper pushes)
 
     def pushMatrix(self, m):
         ''' Push a matrix onto the stack
@@ -35,27 +40,59 @@ class MatrixStack(object):
             translate first. That way, rotate is _accessed_ and multiplied first, during matrix
             composition
         '''
+        if self._sp == len(self._m):
+            self._m.append(matrix.Matrix())
+
+        # The new entry is (product so far) * m. m itself is not kept, so the caller is free to modify it afterwards
+        if self._sp == 0:
+            matrix.mCopy(m, out=self._m[0])
+        else:
+            matrix.mMultmat(self._m[self._sp - 1], m, out=self._m[self._sp])
+        self._sp += 1
+
+    def popMatrix(self, m=None):
+        ''' Pop head of the stack and discard it
+
+            Raises IndexError if the stack is empty (an unbalanced push/pop)
+
+            NOTE: m is not used; it's only accepted so that older code that passes it keeps working
+        '''
+        if self._sp == 0:
+            raise IndexError("MatrixStack.popMatrix: pop from an empty stack")
+        self._sp -= 1
 
-        # Make a deep copy of the incoming matrix
-        matrix_copy = matrix.Matrix(
-            m.v[0], m.v[1], m.v[2], m.v[3]
-        ,   m.v[4], m.v[5], m.v[6], m.v[7]
-        ,   m.v[8], m.v[9], m.v[10], m.v[11]
-        ,   m.v[12], m.v[13], m.v[14], m.v[15]
-        )
+    def multMatrix(self, m):
+        ''' Post-multiply the top of the stack by m, in place (like glMultMatrix)
 
-        self._m.append(matrix_copy)
+            If the stack is empty, this is the same as pushMatrix(m)
+        '''
+        if self._sp == 0:
+            self.pushMatrix(m)
+        else:
+            top = self._m[self._sp - 1]
+            matrix.mMultmat(top, m, out=top)
 
-    def popMatrix(self, m):
-        ''' Pop head of the stack and discard it '''
-        self._m.pop()
+    def loadMatrix(self, m):
+        ''' Replace the matrix at the top of the stack with m (like glLoadMatrix, but relative to the entries below)
 
-    def getMatrix(self):
+            The top entry becomes (product of the entries below) * m. If the stack is empty, this is the same as
+            pushMatrix(m)
+        '''
+        if self._sp == 0:
+            self.pushMatrix(m)
+        else:
+            self._sp -= 1
+            self.pushMatrix(m)
+
+    def getMatrix(self, out=None):
         ''' Return the composed matrix resulting from multiplying all of the matrices in the stack
+
+            The result is a copy (written into out, if given), so it's safe to modify
         '''
-        composed_matrix = matrix.Matrix.matIdent()
+        if self._sp == 0:
+            return matrix.Matrix.matIdent(out=out)
 
-        for mat in reversed(self._m):
-            composed_matrix = matrix.mMultmat(mat, composed_matrix)
+        return matrix.mCopy(self._m[self._sp - 1], out=out)
 
-        return composed_matrix
+    def __len__(self):
+        return self._sp
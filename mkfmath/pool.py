@@ -0,0 +1,143 @@
+#############################################################################
+# Copyright 2016 Mass KonFuzion
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#############################################################################
+
+"""
+Frame-scoped scratch arena for Vector and Matrix temporaries
+
+Most of the Vectors and Matrices created during update and render are dead by the end of the frame. Instead of
+allocating them (and leaving them for the garbage collector), ask the arena for them, and use them as out= targets
+for the vector/matrix functions. The arena hands out the same objects again after reset() is called, once per
+frame (GameApplication does this for you, at the end of postRenderScene()).
+
+NOTE: Anything you get from the arena is only valid until the next reset(). Do not hold onto it across frames. If
+you need to keep a value, copy it (e.g. with vCopy/mCopy) into an object you own.
+
+In debug mode, the arena "poisons" every object it handed out when it is reset, so any use of that object after
+the reset raises an exception (instead of silently reading/writing data that now belongs to someone else). Each
+request then gets a new Vector/Matrix wrapped around the pooled storage, so an old object stays poisoned even after
+its storage is handed out again.
+"""
+
+from pymkfgame.mkfmath.vector import Vector
+from pymkfgame.mkfmath.matrix import Matrix
+
+_ZERO4 = (0.0, 0.0, 0.0, 0.0)
+_ZERO16 = (0.0,) * 16
+
+class _ExpiredStorage(object):
+    ''' Stand-in for the component list of an arena object that was used after the arena was reset
+    '''
+    __slots__ = ('frame',)
+
+    def __init__(self, frame):
+        self.frame = frame
+
+    def _raise(self, *args):
+        raise Exception("FrameArena object used after reset (it was handed out during frame {})".format(self.frame))
+
+    __getitem__ = _raise
+    __setitem__ = _raise
+    __iter__ = _raise
+    __len__ = _raise
+
+class FrameArena(object):
+    ''' A pool of reusable Vector and Matrix objects, reset once per frame
+    '''
+    def __init__(self, debug=False):
+        self._vectors = []      # Every Vector the arena has ever created. The pool grows as needed, but never shrinks
+        self._matrices = []
+        self._numVectors = 0    # Number of Vectors handed out since the last reset
+        self._numMatrices = 0
+
+        self._debug = debug
+        self._vectorStorage = []    # In debug mode, the real component lists of the pooled objects (their .v gets poisoned on reset)
+        self._matrixStorage = []
+        self._frame = 0
+
+        self.peakVectors = 0    # High-water marks; useful for picking reserve() sizes
+        self.peakMatrices = 0
+
+    def reserve(self, numVectors, numMatrices):
+        ''' Pre-allocate pooled objects, so the pool doesn't have to grow mid-game '''
+        while len(self._vectors) < numVectors:
+            self._newVector()
+        while len(self._matrices) < numMatrices:
+            self._newMatrix()
+
+    def _newVector(self):
+        v = Vector()
+        self._vectors.append(v)
+        self._vectorStorage.append(v.v)
+
+    def _newMatrix(self):
+        m = Matrix()
+        self._matrices.append(m)
+        self._matrixStorage.append(m.v)
+
+    def vector(self, x=0.0, y=0.0, z=0.0, w=0.0):
+        ''' Return a scratch Vector, initialized like Vector(x, y, z, w). Valid until the next reset() '''
+        i = self._numVectors
+        if i == len(self._vectors):
+            self._newVector()
+        self._numVectors = i + 1
+
+        if self._debug:
+            v = Vector()
+            v.v = self._vectorStorage[i]
+            self._vectors[i] = v
+        else:
+            v = self._vectors[i]
+
+        if x == 0.0 and y == 0.0 and z == 0.0 and w == 0.0:
+            v.v[:] = _ZERO4
+        else:
+            v.v[:] = (float(x), float(y), float(z), float(w))
+        return v
+
+    def matrix(self):
+        ''' Return a scratch zero Matrix (like Matrix()). Valid until the next reset() '''
+        i = self._numMatrices
+        if i == len(self._matrices):
+            self._newMatrix()
+        self._numMatrices = i + 1
+
+        if self._debug:
+            m = Matrix()
+            m.v = self._matrixStorage[i]
+            self._matrices[i] = m
+        else:
+            m = self._matrices[i]
+
+        m.v[:] = _ZERO16
+        return m
+
+    def reset(self):
+        ''' Reclaim every object handed out since the last reset. Call this once per frame '''
+        if self._numVectors > self.peakVectors:
+            self.peakVectors = self._numVectors
+        if self._numMatrices > self.peakMatrices:
+            self.peakMatrices = self._numMatrices
+
+        if self._debug:
+            expired = _ExpiredStorage(self._frame)
+            for i in range(0, self._numVectors):
+                self._vectors[i].v = expired
+            for i in range(0, self._numMatrices):
+                self._matrices[i].v = expired
+
+        self._numVectors = 0
+        self._numMatrices = 0
+        self._frame += 1
@@ -0,0 +1,297 @@
+#############################################################################
+# Copyright 2016 Mass KonFuzion
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#############################################################################
+
+"""
+Quaternion math, for storing and composing orientations
+
+A quaternion is stored as 4 floats, [x, y, z, w], where (x, y, z) is the "vector" part and w is the "scalar"
+part. That's the same layout as a Vector, so a list of orientations can be stored in a VectorBatch (see
+qToMatrixBatch).
+
+Orientation quaternions must be unit length (see qNormalize). A rotation by th RADIANS about the normalized axis
+(ax, ay, az) is [ax*sin(th/2), ay*sin(th/2), az*sin(th/2), cos(th/2)]. qToMatrix produces the same matrices as
+Matrix.matRotX/matRotY/matRotZ, e.g. qToMatrix(qFromAxisAngle(th, 1, 0, 0)) == Matrix.matRotX(th)
+
+Composition follows matrix composition: qMult(a, b) is the rotation b followed by the rotation a, just like
+mMultmat(qToMatrix(a), qToMatrix(b)) -- but 16 multiplies instead of 64.
+
+Like the vector and matrix functions, functions that return a new Quaternion/Vector/Matrix take an optional out
+parameter to write the result into instead.
+"""
+
+import math
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from pymkfgame.mkfmath.vector import Vector
+from pymkfgame.mkfmath.matrix import Matrix, _matResult
+
+class Quaternion(object):
+    __slots__ = ('v',)
+
+    def __init__(self, x=0.0, y=0.0, z=0.0, w=1.0):
+        """ Initialize a quaternion. The default is the identity (no rotation) """
+        self.v = [float(x), float(y), float(z), float(w)]
+
+    def __str__(self):
+        return "( {}, {}, {}; {} )".format( self.v[0], self.v[1], self.v[2], self.v[3] )
+
+    def __getitem__(self, item):
+        return self.v[item]
+
+    def __setitem__(self, item, value):
+        self.v[item] = float(value)
+
+## ======================
+
+def _qResult(out, x, y, z, w):
+    if out is None:
+        return Quaternion(x, y, z, w)
+
+    out.v[0] = x
+    out.v[1] = y
+    out.v[2] = z
+    out.v[3] = w
+    return out
+
+def qFromAxisAngle(th, ax, ay, az, out=None):
+    """ Return the quaternion for a rotation about axis (ax, ay, az) by th RADIANS. The axis must be normalized """
+    halfTh = 0.5 * th
+    s = math.sin(halfTh)
+    return _qResult(out, ax * s, ay * s, az * s, math.cos(halfTh))
+
+def qMult(a, b, out=None):
+    """ Return the product a * b, i.e. the rotation b followed by the rotation a (written into out, if given)
+
+        out may be a or b
+    """
+    ax, ay, az, aw = a.v
+    bx, by, bz, bw = b.v
+
+    return _qResult(out, aw*bx + ax*bw + ay*bz - az*by,
+                         aw*by - ax*bz + ay*bw + az*bx,
+                         aw*bz + ax*by - ay*bx + az*bw,
+                         aw*bw - ax*bx - ay*by - az*bz)
+
+def qConjugate(q, out=None):
+    """ Return the conjugate of q. For a unit quaternion, that's also the inverse (i.e. the opposite rotation) """
+    return _qResult(out, -q.v[0], -q.v[1], -q.v[2], q.v[3])
+
+def qDot(a, b):
+    """ Return the 4D dot product of a and b """
+    return a.v[0]*b.v[0] + a.v[1]*b.v[1] + a.v[2]*b.v[2] + a.v[3]*b.v[3]
+
+def qLength(q):
+    """ Return the length (norm) of q """
+    x, y, z, w = q.v
+    return (x*x + y*y + z*z + w*w) ** 0.5
+
+def qNormalize(q):
+    """ Normalize q in-place
+
+        Do this every so often to orientations that are composed frame after frame, to keep float error from
+        creeping in
+    """
+    x, y, z, w = q.v
+    invLength = 1.0 / ((x*x + y*y + z*z + w*w) ** 0.5)
+    q.v[0] = x * invLength
+    q.v[1] = y * invLength
+    q.v[2] = z * invLength
+    q.v[3] = w * invLength
+
+def qGetNormalized(q, out=None):
+    """ Return the normalized q (written into out, if given) """
+    x, y, z, w = q.v
+    invLength = 1.0 / ((x*x + y*y + z*z + w*w) ** 0.5)
+    return _qResult(out, x * invLength, y * invLength, z * invLength, w * invLength)
+
+def qNlerp(a, b, t, out=None):
+    """ Return the normalized linear interpolation between orientations a and b, at t (0.0 = a, 1.0 = b)
+
+        Cheaper than qSlerp, and close to it when a and b are not far apart; the angular speed is not constant
+        over t, though. Always takes the shortest way around
+    """
+    ax, ay, az, aw = a.v
+    bx, by, bz, bw = b.v
+
+    # q and -q are the same orientation; flip b if needed, so we interpolate the short way around
+    if ax*bx + ay*by + az*bz + aw*bw < 0.0:
+        bx, by, bz, bw = -bx, -by, -bz, -bw
+
+    x = ax + (bx - ax) * t
+    y = ay + (by - ay) * t
+    z = az + (bz - az) * t
+    w = aw + (bw - aw) * t
+    invLength = 1.0 / ((x*x + y*y + z*z + w*w) ** 0.5)
+    return _qResult(out, x * invLength, y * invLength, z * invLength, w * invLength)
+
+def qSlerp(a, b, t, out=None):
+    """ Return the spherical linear interpolation between orientations a and b, at t (0.0 = a, 1.0 = b)
+
+        Constant angular speed over t. Always takes the shortest way around
+    """
+    ax, ay, az, aw = a.v
+    bx, by, bz, bw = b.v
+
+    cosTh = ax*bx + ay*by + az*bz + aw*bw
+    if cosTh < 0.0:
+        bx, by, bz, bw = -bx, -by, -bz, -bw
+        cosTh = -cosTh
+
+    if cosTh > 0.9995:
+        # a and b are nearly the same, so sin(th) is ~0. Fall back to nlerp, which is indistinguishable here
+        x = ax + (bx - ax) * t
+        y = ay + (by - ay) * t
+        z = az + (bz - az) * t
+        w = aw + (bw - aw) * t
+        invLength = 1.0 / ((x*x + y*y + z*z + w*w) ** 0.5)
+        return _qResult(out, x * invLength, y * invLength, z * invLength, w * invLength)
+
+    th = math.acos(cosTh)
+    invSinTh = 1.0 / math.sin(th)
+    ka = math.sin((1.0 - t) * th) * invSinTh
+    kb = math.sin(t * th) * invSinTh
+
+    return _qResult(out, ka*ax + kb*bx, ka*ay + kb*by, ka*az + kb*bz, ka*aw + kb*bw)
+
+def qRotateVec(q, v, out=None):
+    """ Return Vector v rotated by unit quaternion q (written into out, if given; out may be v)
+
+        w (i.e. whether v is a point or a vector) is passed through unchanged.
+        Uses v' = v + w*t + (q.xyz x t), where t = 2 * (q.xyz x v); cheaper than computing q * v * q^-1
+    """
+    qx, qy, qz, qw = q.v
+    vx, vy, vz, vw = v[0], v[1], v[2], v[3]
+
+    tx = 2.0 * (qy*vz - qz*vy)
+    ty = 2.0 * (qz*vx - qx*vz)
+    tz = 2.0 * (qx*vy - qy*vx)
+
+    x = vx + qw*tx + (qy*tz - qz*ty)
+    y = vy + qw*ty + (qz*tx - qx*tz)
+    z = vz + qw*tz + (qx*ty - qy*tx)
+
+    if out is None:
+        return Vector(x, y, z, vw)
+
+    out.v[0] = x
+    out.v[1] = y
+    out.v[2] = z
+    out.v[3] = vw
+    return out
+
+def qToMatrix(q, out=None):
+    """ Return the (column-major) rotation Matrix for unit quaternion q (written into out, if given) """
+    x, y, z, w = q.v
+
+    xx = x * x
+    yy = y * y
+    zz = z * z
+    xy = x * y
+    xz = x * z
+    yz = y * z
+    wx = w * x
+    wy = w * y
+    wz = w * z
+
+    return _matResult(out, 1.0 - 2.0 * (yy + zz), 2.0 * (xy + wz), 2.0 * (xz - wy), 0.0,
+                           2.0 * (xy - wz), 1.0 - 2.0 * (xx + zz), 2.0 * (yz + wx), 0.0,
+                           2.0 * (xz + wy), 2.0 * (yz - wx), 1.0 - 2.0 * (xx + yy), 0.0,
+                           0.0, 0.0, 0.0, 1.0)
+
+def qFromMatrix(m, out=None):
+    """ Return the unit quaternion for the rotation in the upper-left 3x3 of Matrix m (written into out, if given)
+
+        The 3x3 must be a pure rotation (orthonormal, no scale)
+    """
+    v = m.v
+    r00, r10, r20 = v[0], v[1], v[2]    # rNM = row N, column M
+    r01, r11, r21 = v[4], v[5], v[6]
+    r02, r12, r22 = v[8], v[9], v[10]
+
+    # Pick the numerically safest formula, based on which of w, x, y, z is largest
+    trace = r00 + r11 + r22
+    if trace > 0.0:
+        s = 0.5 / ((trace + 1.0) ** 0.5)
+        return _qResult(out, (r21 - r12) * s, (r02 - r20) * s, (r10 - r01) * s, 0.25 / s)
+    elif r00 > r11 and r00 > r22:
+        s = 2.0 * ((1.0 + r00 - r11 - r22) ** 0.5)
+        return _qResult(out, 0.25 * s, (r01 + r10) / s, (r02 + r20) / s, (r21 - r12) / s)
+    elif r11 > r22:
+        s = 2.0 * ((1.0 + r11 - r00 - r22) ** 0.5)
+        return _qResult(out, (r01 + r10) / s, 0.25 * s, (r12 + r21) / s, (r02 - r20) / s)
+    else:
+        s = 2.0 * ((1.0 + r22 - r00 - r11) ** 0.5)
+        return _qResult(out, (r02 + r20) / s, (r12 + r21) / s, 0.25 * s, (r10 - r01) / s)
+
+def qToMatrixBatch(quats, out=None):
+    """ Convert many unit quaternions to rotation matrices in one call
+
+        quats is a VectorBatch holding one quaternion [x, y, z, w] per slot. The result is a list of quats.n
+        Matrix objects. If out is given, it must be a list of (at least) quats.n Matrix objects, which are
+        overwritten; otherwise new Matrix objects are created
+    """
+    n = quats.n
+    if out is None:
+        out = [ Matrix() for _ in range(0, n) ]
+
+    if quats.isNumpy:
+        q = quats.data
+        x, y, z, w = q[:, 0], q[:, 1], q[:, 2], q[:, 3]
+
+        coeffs = numpy.zeros((n, 16))
+        coeffs[:, 0]  = 1.0 - 2.0 * (y*y + z*z)
+        coeffs[:, 1]  = 2.0 * (x*y + w*z)
+        coeffs[:, 2]  = 2.0 * (x*z - w*y)
+        coeffs[:, 4]  = 2.0 * (x*y - w*z)
+        coeffs[:, 5]  = 1.0 - 2.0 * (x*x + z*z)
+        coeffs[:, 6]  = 2.0 * (y*z + w*x)
+        coeffs[:, 8]  = 2.0 * (x*z + w*y)
+        coeffs[:, 9]  = 2.0 * (y*z - w*x)
+        coeffs[:, 10] = 1.0 - 2.0 * (x*x + y*y)
+        coeffs[:, 15] = 1.0
+
+        rows = coeffs.tolist()
+        for i in range(0, n):
+            out[i].v[:] = rows[i]
+        return out
+
+    data = quats.data
+    for i in range(0, n):
+        base = 4 * i
+        x = data[base]
+        y = data[base + 1]
+        z = data[base + 2]
+        w = data[base + 3]
+
+        xx = x * x
+        yy = y * y
+        zz = z * z
+        xy = x * y
+        xz = x * z
+        yz = y * z
+        wx = w * x
+        wy = w * y
+        wz = w * z
+
+        out[i].v[:] = (1.0 - 2.0 * (yy + zz), 2.0 * (xy + wz), 2.0 * (xz - wy), 0.0,
+                       2.0 * (xy - wz), 1.0 - 2.0 * (xx + zz), 2.0 * (yz + wx), 0.0,
+                       2.0 * (xz + wy), 2.0 * (yz - wx), 1.0 - 2.0 * (xx + yy), 0.0,
+                       0.0, 0.0, 0.0, 1.0)
+    return out
@@ -25,30 +25,105 @@ class ReferenceFrame(object):
 
         This class is based on a left-handed system. The up vector corresponds to +Y axis; the look vector
         corresponds to the +Z axis (going into the screen)
+
+        The frame, look-at, projection and view-projection matrices are cached, and only recomputed when their
+        inputs change (via setUpVector, setLookVector, setPosition, or different projection/look-at parameters).
+        So, on frames where the camera doesn't move, they cost next to nothing. If you modify
+        self.up/self.look/self.position directly, call invalidate() afterwards.
+
+        getMatrix returns a new Matrix on every call. getLookAtMatrix and getPerspectiveProjectionMatrix return a
+        new Matrix whenever their arguments change, and the same one again for repeated arguments.
+        getViewProjectionMatrix always returns the same Matrix object, updated in place; treat it as read-only.
+
+        Every orthonormalizeInterval changes to the frame, up and look are re-orthonormalized (see orthonormalize)
+        when the matrix is rebuilt, so float error from incremental updates can't accumulate into skew.
     '''
     def __init__(self):
         self.up = Vector(0, 1, 0)
         self.look = Vector(0, 0, 1)     # Left-handed coordinate system means +z looks into the screen
         self.position = Vector(0, 0, 0)
 
+        self.orthonormalizeInterval = 8 # Re-orthonormalize up/look after this many changes (1 = on every change)
+        self._changesSinceOrthonormalize = 0
+
+        self._xAxis = Vector()
+        self._matFrame = Matrix()
+        self._frameDirty = True
+        self._matView = Matrix()        # Inverse of _matFrame (world -> camera)
+
+        self._projParams = None         # (fovy, aspect, zNear, zFar) of the cached projection matrix
+        self._matProj = Matrix()
+
+        self._lookAtParams = None       # Arguments of the cached look-at matrix
+        self._matLookAt = Matrix()
+
+        self._matViewProj = Matrix()
+        self._viewProjDirty = True
+
+    def invalidate(self):
+        ''' Mark the cached frame matrix (and view-projection matrix) as out of date
+
+            Only needed if you modify self.up, self.look or self.position directly, instead of using the setters
+        '''
+        self._frameDirty = True
+        self._viewProjDirty = True
+        self._changesSinceOrthonormalize += 1
+
     def setUpVector(self, x, y, z):
-        self.up[0] = float(x)
-        self.up[1] = float(y)
-        self.up[2] = float(z)
+        x = float(x)
+        y = float(y)
+        z = float(z)
+        if x == self.up[0] and y == self.up[1] and z == self.up[2]:
+            return
+
+        self.up[0] = x
+        self.up[1] = y
+        self.up[2] = z
         self.up[3] = 0.0
+        self.invalidate()
 
     def setLookVector(self, x, y, z):
-        self.look[0] = float(x)
-        self.look[1] = float(y)
-        self.look[2] = float(z)
+        x = float(x)
+        y = float(y)
+        z = float(z)
+        if x == self.look[0] and y == self.look[1] and z == self.look[2]:
+            return
+
+        self.look[0] = x
+        self.look[1] = y
+        self.look[2] = z
         self.look[3] = 0.0
+        self.invalidate()
 
     def setPosition(self, x, y, z):
-        self.position[0] = float(x)
-        self.position[1] = float(y)
-        self.position[2] = float(z)
+        x = float(x)
+        y = float(y)
+        z = float(z)
+        if x == self.position[0] and y == self.position[1] and z == self.position[2]:
+            return
+
+        self.position[0] = x
+        self.position[1] = y
+        self.position[2] = z
         self.position[3] = 0.0
+        self._frameDirty = True     # Moving doesn't change the axes, so it doesn't count toward re-orthonormalization
+        self._viewProjDirty = True
+
+    def orthonormalize(self):
+        ''' Make look and up unit length and perpendicular to each other (Gram-Schmidt)
+
+            look keeps its direction; up is adjusted to be perpendicular to it
+        '''
+        vNormalize(self.look)
+        k = vDot(self.up, self.look)
+        self.up[0] -= k * self.look[0]
+        self.up[1] -= k * self.look[1]
+        self.up[2] -= k * self.look[2]
+        vNormalize(self.up)
 
+        self._frameDirty = True
+        self._viewProjDirty = True
+        self._changesSinceOrthonormalize = 0
 
     def getMatrix(self):
         ''' Compute the view matrix determined by self.up and self.look
@@ -57,16 +132,49 @@ class ReferenceFrame(object):
 
             Also, remember that matrices are column-major, so what look likes like a row in this return value
             is actually a column. The columns are | x axis | up vec | look vec | translate/position vec |
+
+            Returns a new Matrix (a copy of the cached one; see the class docs)
         '''
-        # cross(yAxis, zAxis) gives you xAxis
-        xAxis = vCross(self.up, self.look)
+        return mCopy(self._getFrameMatrix())
+
+    def _getFrameMatrix(self):
+        ''' Return the cached frame matrix (see getMatrix), rebuilding it if it is out of date '''
+        if self._frameDirty:
+            if self._changesSinceOrthonormalize >= self.orthonormalizeInterval:
+                self.orthonormalize()
+
+            # cross(yAxis, zAxis) gives you xAxis
+            xAxis = vCross(self.up, self.look, out=self._xAxis)
+
+            self._matFrame.v[:] = (
+            xAxis[0], xAxis[1], xAxis[2], 0.0,
+            self.up[0], self.up[1], self.up[2], 0.0,  # self.up[3] should be 0, but just in case, force the issue
+            self.look[0], self.look[1], self.look[2], 0.0,
+            self.position[0], self.position[1], self.position[2], 1.0
+            )
+            self._frameDirty = False
 
-        return Matrix(
-        xAxis[0], xAxis[1], xAxis[2], 0,
-        self.up[0], self.up[1], self.up[2], 0,  # self.up[3] should be 0, but just in case, force the issue
-        self.look[0], self.look[1], self.look[2], 0,
-        self.position[0], self.position[1], self.position[2], 1
-        )
+        return self._matFrame
+
+    def getViewProjectionMatrix(self):
+        ''' Return the combined projection * view matrix, mapping world space to clip space
+
+            getMatrix() is the camera-to-world frame, so the view (world-to-camera) matrix is its inverse. The frame
+            is kept orthonormal (see orthonormalize), so the inverse is the cheap one, mInverseOrthonormal; up and
+            look should be unit length and perpendicular when they are set.
+
+            The projection is the one from the most recent getPerspectiveProjectionMatrix call (which must have
+            been made at least once). The matrix is cached (see the class docs); treat it as read-only
+        '''
+        if self._projParams is None:
+            raise Exception("ReferenceFrame.getViewProjectionMatrix: no projection has been set up (call getPerspectiveProjectionMatrix first)")
+
+        if self._viewProjDirty or self._frameDirty:
+            mInverseOrthonormal(self._getFrameMatrix(), out=self._matView)
+            mMultmat(self._matProj, self._matView, out=self._matViewProj)
+            self._viewProjDirty = False
+
+        return self._matViewProj
 
     #def getLookAtMatrix(self, eyeX, eyeY, eyeZ, ctrX, ctrY, ctrZ, upX, upY, upZ):
     #    up = Vector(upX, upY, upZ)  # No real need to normalize up, because we're going to normalize all of our vectors later
@@ -79,6 +187,11 @@ class ReferenceFrame(object):
     #    return Matrix(x[0], x[1], x[2], 0, y[0], y[1], y[2], 0, z[0], z[1], z[2], 0, -eyeX, -eyeY, -eyeZ, 1)
 
     def getLookAtMatrix(self, eyeX, eyeY, eyeZ, ctrX, ctrY, ctrZ, upX, upY, upZ):
+        ''' Return a look-at view matrix. The matrix is cached for repeated arguments (see the class docs) '''
+        params = (eyeX, eyeY, eyeZ, ctrX, ctrY, ctrZ, upX, upY, upZ)
+        if params == self._lookAtParams:
+            return self._matLookAt
+
         eye = Vector(eyeX, eyeY, eyeZ)
         up = Vector(upX, upY, upZ)  # No real need to normalize up, because we're going to normalize all of our vectors later
         z = vGetNormalized( Vector(ctrX - eyeX, ctrY - eyeY, ctrZ - eyeZ) )   # z is a vector pointing 'forward' from the eye to the center point
@@ -86,7 +199,9 @@ class ReferenceFrame(object):
         y = vGetNormalized( vCross(z, x) )
 
         #return Matrix(x[0], x[1], x[2], 0, y[0], y[1], y[2], 0, z[0], z[1], z[2], 0, -vDot(eye, x), -vDot(eye, y), -vDot(eye, z), 1)
-        return Matrix(x[0], x[1], x[2], 0, y[0], y[1], y[2], 0, z[0], z[1], z[2], 0, -vDot(eye, x), -vDot(eye, y), vDot(eye, z), 1)    # This is what is needed for left hand coordinate system - the translation puts the model into the space in front of the camera. i.e. if the camera is mapped to 0,0,0, then a visible object is at -xpos, -ypos, zpos (because +z is in front of the camera). This is different than the right-handed coordinate frame, in which objects visible to the camera have a negative z position
+        self._lookAtParams = params
+        self._matLookAt = Matrix(x[0], x[1], x[2], 0.0, y[0], y[1], y[2], 0.0, z[0], z[1], z[2], 0.0, -vDot(eye, x), -vDot(eye, y), vDot(eye, z), 1.0)     # This is what is needed for left hand coordinate system - the translation puts the model into the space in front of the camera. i.e. if the camera is mapped to 0,0,0, then a visible object is at -xpos, -ypos, zpos (because +z is in front of the camera). This is different than the right-handed coordinate frame, in which objects visible to the camera have a negative z position
+        return self._matLookAt
 
     #def getPerspectiveProjectionMatrix(self, fovy, aspect, zNear, zFar):
     #    ''' fovy is the field of view in the y direction (plays a role in calculating the view frustum (in degrees)
@@ -105,13 +220,23 @@ class ReferenceFrame(object):
             Also, viewport transformation must be done elsewhere
 
             Note, this is for a left-handed coordinate system
+
+            The matrix is cached for repeated arguments (see the class docs). These parameters also become the
+            projection used by getViewProjectionMatrix
         '''
+        params = (fovy, aspect, zNear, zFar)
+        if params == self._projParams:
+            return self._matProj
+
         top = common.tann(fovy / 2.0) * zNear
         bottom = -top
         right = top * aspect
         left = bottom * aspect
 
-        return Matrix(2.0 * zNear / (right - left), 0.0, 0.0, 0.0, 0.0, 2.0 * zNear / (top - bottom), 0.0, 0.0, (right + left) / (right - left), (top + bottom) / (top - bottom), -(zFar + zNear) / (zFar - zNear), -1.0, 0.0, 0.0, -(2.0 * zFar * zNear) / (zFar - zNear), 0.0)   # This is for a right-handed coordinate system, I think (from scratchapixel.com)
+        self._projParams = params
+        self._viewProjDirty = True
+        self._matProj = Matrix(2.0 * zNear / (right - left), 0.0, 0.0, 0.0, 0.0, 2.0 * zNear / (top - bottom), 0.0, 0.0, (right + left) / (right - left), (top + bottom) / (top - bottom), -(zFar + zNear) / (zFar - zNear), -1.0, 0.0, 0.0, -(2.0 * zFar * zNear) / (zFar - zNear), 0.0)   # This is for a right-handed coordinate system, I think (from scratchapixel.com)
+        return self._matProj
         #return Matrix(2.0 * zNear / (right - left), 0.0, 0.0, 0.0, 0.0, 2.0 * zNear / (top - bottom), 0.0, 0.0, (right + left) / (right - left), (top + bottom) / (top - bottom), (zFar + zNear) / (zFar - zNear), 1.0, 0.0, 0.0, (2.0 * zFar * zNear) / (zFar - zNear), 0.0)
         #return Matrix(2.0 * zNear / (right - left), 0.0, 0.0, 0.0, 0.0, 2.0 * zNear / (top - bottom), 0.0, 0.0, -(right + left) / (right - left), -(top + bottom) / (top - bottom), -(zNear + zFar) / (zNear - zFar), 1.0, 0.0, 0.0, (2.0 * zNear * zFar) / (zNear - zFar), 0.0)   # Self-derived coefficients.. Are they correct? Or wrong? I think it is wrong.. I think the NDC cube mapping needs to be in the opposite handed-ness of the normal coordinate system. That's because the pinhole camera model implemented by a projection matrix uses the eye (camera position) as the point of convergence (i.e., the "vanishing" point, but on-screen, the vanishing point needs to be off in the distance. I.e., the NDC cube needs to be the z-flip of the camera system. Sooo, see below
         #return Matrix(2.0 * zNear / (right - left), 0.0, 0.0, 0.0, 
@@ -0,0 +1,172 @@
+#############################################################################
+# Copyright 2016 Mass KonFuzion
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#############################################################################
+
+"""
+Sin/cos lookup tables with selectable resolution
+
+A TrigTable samples sin and cos at steps_per_degree steps per degree (e.g. 16 -> 1/16 degree resolution), over
+one full turn. Lookups take radians (sinRad, cosRad, sinCosRad, ...) or degrees (sinDeg, cosDeg, ...), wrap
+around correctly for negative angles and angles beyond a full turn, and either interpolate linearly between
+samples (the default), or snap to the nearest sample (faster, less accurate).
+
+sinCosBatch evaluates sin and cos for a whole array of angles in one call.
+
+To make the Matrix.matRot* builders use a table instead of math.sin/math.cos, call matrix.setTrigTable(table).
+
+Whether a table actually beats math.sin depends on the Python implementation (in CPython, math.sin is a single C
+call, which is hard to beat from Python code). Run benchmarks/bench_trig_table.py to see the accuracy and speed of
+each setting on your machine, and pick one per game.
+"""
+
+import math
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+TWO_PI = 2.0 * math.pi
+
+class TrigTable(object):
+    def __init__(self, steps_per_degree=1, interpolate=True):
+        """ Build sin/cos tables with steps_per_degree samples per degree """
+        self.stepsPerDegree = int(steps_per_degree)
+        self.interpolate = interpolate
+        self.size = 360 * self.stepsPerDegree   # Number of samples in one full turn
+
+        # One extra sample at the end (a copy of sample 0), so interpolation never has to wrap index + 1
+        step = TWO_PI / self.size
+        self._sin = array('d', [ math.sin(i * step) for i in range(0, self.size) ])
+        self._cos = array('d', [ math.cos(i * step) for i in range(0, self.size) ])
+        self._sin.append(self._sin[0])
+        self._cos.append(self._cos[0])
+
+        self._radToIndex = self.size / TWO_PI
+        self._degToIndex = float(self.stepsPerDegree)
+
+        if numpy is not None:
+            self._npSin = numpy.array(self._sin)
+            self._npCos = numpy.array(self._cos)
+
+    def _lookup(self, table, idx):
+        """ Look up table at fractional index idx (any float; wraps around) """
+        if self.interpolate:
+            i = int(math.floor(idx))
+            frac = idx - i
+            i %= self.size
+            a = table[i]
+            return a + frac * (table[i + 1] - a)
+        return table[int(math.floor(idx + 0.5)) % self.size]
+
+    def sinRad(self, th):
+        return self._lookup(self._sin, th * self._radToIndex)
+
+    def cosRad(self, th):
+        return self._lookup(self._cos, th * self._radToIndex)
+
+    def tanRad(self, th):
+        return self.sinRad(th) / self.cosRad(th)
+
+    def sinDeg(self, deg):
+        return self._lookup(self._sin, deg * self._degToIndex)
+
+    def cosDeg(self, deg):
+        return self._lookup(self._cos, deg * self._degToIndex)
+
+    def tanDeg(self, deg):
+        return self.sinDeg(deg) / self.cosDeg(deg)
+
+    def _sinCosAtIndex(self, idx):
+        if self.interpolate:
+            i = int(math.floor(idx))
+            frac = idx - i
+            i %= self.size
+            s = self._sin[i]
+            c = self._cos[i]
+            return s + frac * (self._sin[i + 1] - s), c + frac * (self._cos[i + 1] - c)
+
+        i = int(math.floor(idx + 0.5)) % self.size
+        return self._sin[i], self._cos[i]
+
+    def sinCosRad(self, th):
+        """ Return (sin(th), cos(th)), th in RADIANS. Cheaper than calling sinRad and cosRad separately """
+        return self._sinCosAtIndex(th * self._radToIndex)
+
+    def sinCosDeg(self, deg):
+        """ Return (sin(deg), cos(deg)), deg in DEGREES """
+        return self._sinCosAtIndex(deg * self._degToIndex)
+
+    def sinCosBatch(self, angles, outSin=None, outCos=None, degrees=False):
+        """ Evaluate sin and cos for every angle in angles, in one call. Return (sins, coss)
+
+            angles is a sequence of angles (RADIANS, or DEGREES if degrees is True). If angles is a numpy array,
+            the results are numpy arrays; otherwise they are array('d')s. outSin/outCos, if given, must be buffers
+            of the matching type and length; the results are written into them
+        """
+        scale = self._degToIndex if degrees else self._radToIndex
+
+        if numpy is not None and isinstance(angles, numpy.ndarray):
+            idx = angles * scale
+            if self.interpolate:
+                i = numpy.floor(idx)
+                frac = idx - i
+                i = i.astype(numpy.int64) % self.size
+                sins = self._npSin[i] + frac * (self._npSin[i + 1] - self._npSin[i])
+                coss = self._npCos[i] + frac * (self._npCos[i + 1] - self._npCos[i])
+            else:
+                i = numpy.floor(idx + 0.5).astype(numpy.int64) % self.size
+                sins = self._npSin[i]
+                coss = self._npCos[i]
+
+            if outSin is None:
+                outSin = sins
+            else:
+                outSin[:] = sins
+            if outCos is None:
+                outCos = coss
+            else:
+                outCos[:] = coss
+            return outSin, outCos
+
+        n = len(angles)
+        if outSin is None:
+            outSin = array('d', [0.0]) * n
+        if outCos is None:
+            outCos = array('d', [0.0]) * n
+
+        sinTable = self._sin
+        cosTable = self._cos
+        size = self.size
+        floor = math.floor
+
+        if self.interpolate:
+            for k in range(0, n):
+                idx = angles[k] * scale
+                i = int(floor(idx))
+                frac = idx - i
+                i %= size
+                s = sinTable[i]
+                c = cosTable[i]
+                outSin[k] = s + frac * (sinTable[i + 1] - s)
+                outCos[k] = c + frac * (cosTable[i + 1] - c)
+        else:
+            for k in range(0, n):
+                i = int(floor(angles[k] * scale + 0.5)) % size
+                outSin[k] = sinTable[i]
+                outCos[k] = cosTable[i]
+
+        return outSin, outCos
@@ -18,6 +18,10 @@
 3D Vector math class
 
 For the purpose of doing matrix math, these vectors will be treated as column vectors (see matrix class)
+
+Functions that return a new Vector also take an optional out parameter. If out is given, the result is written
+into that Vector (which is also returned) instead of allocating a new one, so hot loops can reuse scratch objects.
+out may be one of the inputs.
 """
 
 import math
@@ -25,6 +29,8 @@ import math
 from pymkfgame.mkfmath import common
 
 class Vector(object):
+    __slots__ = ('v',)  # No per-instance __dict__; a Vector is just its component list
+
     def __init__(self, x=0.0, y=0.0, z=0.0, w=0.0):
         """ Initialize a 3D vector
             
@@ -151,12 +157,20 @@ def vScale(v, k, scale_w=False):
     if scale_w:
         v[3] *= float(k)
 
-def vGetScaled(v, k, scale_w=False):
-    """ Return a new Vector, the result of scaling v by k """
-    if scale_w:
-        return Vector(v[0] * float(k), v[1] * float(k), v[2] * float(k), v[3] * float(k))
-    else:
-        return Vector(v[0] * float(k), v[1] * float(k), v[2] * float(k))
+def vGetScaled(v, k, scale_w=False, out=None):
+    """ Return a new Vector, the result of scaling v by k (written into out, if given) """
+    k = float(k)
+    if out is None:
+        if scale_w:
+            return Vector(v[0] * k, v[1] * k, v[2] * k, v[3] * k)
+        else:
+            return Vector(v[0] * k, v[1] * k, v[2] * k)
+
+    out.v[0] = v[0] * k
+    out.v[1] = v[1] * k
+    out.v[2] = v[2] * k
+    out.v[3] = v[3] * k if scale_w else 0.0
+    return out
 
 def vLength(v):
     """ Return Vector length """
@@ -181,27 +195,82 @@ def vNormalize(v):
     v[1] *= invLength
     v[2] *= invLength
 
-def vGetNormalized(v):
-    """ Return a new Vector, which is the normalized v Vector) """
+def vGetNormalized(v, out=None):
+    """ Return a new Vector, which is the normalized v Vector (written into out, if given) """
     invLength = 1.0 / ((v[0]*v[0] + v[1]*v[1] + v[2]*v[2]) ** 0.5)
 
-    return Vector(v[0] * invLength, v[1] * invLength, v[2] * invLength)
-
-def vAdd(v, w):
-    """ Return a new Vector, which is the result of v + w """
-    return Vector(v[0] + w[0], v[1] + w[1], v[2] + w[2])
-
-def vSub(v, w):
-    """ Return a new Vector, which is the result of v - w """
-    return Vector(v[0] - w[0], v[1] - w[1], v[2] - w[2])
+    if out is None:
+        return Vector(v[0] * invLength, v[1] * invLength, v[2] * invLength)
+
+    out.v[0] = v[0] * invLength
+    out.v[1] = v[1] * invLength
+    out.v[2] = v[2] * invLength
+    out.v[3] = 0.0
+    return out
+
+def vAdd(v, w, out=None):
+    """ Return a new Vector, which is the result of v + w (written into out, if given) """
+    if out is None:
+        return Vector(v[0] + w[0], v[1] + w[1], v[2] + w[2])
+
+    out.v[0] = v[0] + w[0]
+    out.v[1] = v[1] + w[1]
+    out.v[2] = v[2] + w[2]
+    out.v[3] = 0.0
+    return out
+
+def vSub(v, w, out=None):
+    """ Return a new Vector, which is the result of v - w (written into out, if given) """
+    if out is None:
+        return Vector(v[0] - w[0], v[1] - w[1], v[2] - w[2])
+
+    out.v[0] = v[0] - w[0]
+    out.v[1] = v[1] - w[1]
+    out.v[2] = v[2] - w[2]
+    out.v[3] = 0.0
+    return out
 
 def vDot(v, w):
     """ Return the dot product of v . w """
     return v[0]*w[0] + v[1]*w[1] + v[2]*w[2]
 
-def vCross(v, w):
-    """ Return a new Vector, which is the cross product, v x w """
-    return Vector(v[1]*w[2] - w[1]*v[2], v[2]*w[0] - w[2]*v[0], v[0]*w[1] - w[0]*v[1])
+def vCross(v, w, out=None):
+    """ Return a new Vector, which is the cross product, v x w (written into out, if given) """
+    x = v[1]*w[2] - w[1]*v[2]
+    y = v[2]*w[0] - w[2]*v[0]
+    z = v[0]*w[1] - w[0]*v[1]
+
+    if out is None:
+        return Vector(x, y, z)
+
+    # Components are computed before writing, so out can be v or w
+    out.v[0] = x
+    out.v[1] = y
+    out.v[2] = z
+    out.v[3] = 0.0
+    return out
+
+def vNegate(v, out=None):
+    """ Return a new Vector, which is -v (written into out, if given). Same as the unary - operator """
+    if out is None:
+        return Vector(-v[0], -v[1], -v[2])
+
+    out.v[0] = -v[0]
+    out.v[1] = -v[1]
+    out.v[2] = -v[2]
+    out.v[3] = 0.0
+    return out
+
+def vCopy(v, out=None):
+    """ Return a copy of Vector v, including w (written into out, if given) """
+    if out is None:
+        return Vector(v[0], v[1], v[2], v[3])
+
+    out.v[0] = v[0]
+    out.v[1] = v[1]
+    out.v[2] = v[2]
+    out.v[3] = v[3]
+    return out
 
 #ret0 = v1 * w2 - v2 * w1
 #ret1 = v2 * w0 - v0 * w2
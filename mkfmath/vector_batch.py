@@ -0,0 +1,263 @@
+#############################################################################
+# Copyright 2016 Mass KonFuzion
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#############################################################################
+
+"""
+Batched 3D Vector math (structure-of-arrays)
+
+A VectorBatch stores N vectors as one contiguous N x 4 block of doubles (x, y, z, w per vector), instead of
+N Vector objects each wrapping its own list. The vb* functions below are the batched equivalents of the v*
+functions in the vector module; each one runs over the whole batch in a single call.
+
+Storage is a flat array('d') (indexes 4*i .. 4*i+3 hold vector i), or, if NumPy is installed and requested, an
+N x 4 numpy array. By default, the storage follows the selected math backend (see the backend module). The
+pure-Python kernels work one component "column" at a time (e.g. data[0::4] is every x), using map() over whole
+columns, so the per-element loop runs in C instead of in Python bytecode.
+
+The semantics match the single-Vector functions, e.g. vbAdd/vbSub/vbCross produce vectors with w = 0.0, just
+like vAdd/vSub/vCross do
+"""
+
+import math
+import operator
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from pymkfgame.mkfmath import backend
+from pymkfgame.mkfmath.vector import Vector
+
+class VectorBatch(object):
+    def __init__(self, n=0, use_numpy=None):
+        """ Initialize a batch of n zero vectors
+
+            If use_numpy is True, the batch is stored in an N x 4 numpy array (NumPy must be installed); if False,
+            in an array('d'). If None, the selected math backend decides
+        """
+        if use_numpy is None:
+            use_numpy = backend.useNumpy()
+        if use_numpy and numpy is None:
+            raise Exception("VectorBatch: NumPy storage was requested, but NumPy is not installed")
+
+        self.n = int(n)
+        self.isNumpy = bool(use_numpy)
+
+        if self.isNumpy:
+            self.data = numpy.zeros((self.n, 4))
+        else:
+            self.data = array('d', [0.0]) * (4 * self.n)
+
+    @staticmethod
+    def fromVectors(vectors, use_numpy=None):
+        """ Return a new VectorBatch holding a copy of each Vector in the given list (see __init__ for use_numpy) """
+        batch = VectorBatch(0, use_numpy)
+        batch.n = len(vectors)
+
+        if batch.isNumpy:
+            batch.data = numpy.array([ v.v for v in vectors ], dtype=float).reshape(batch.n, 4)
+        else:
+            for v in vectors:
+                batch.data.extend(v.v)
+        return batch
+
+    def toVectors(self):
+        """ Return a list of new Vector objects, one per vector in the batch """
+        return [ self.getVector(i) for i in range(0, self.n) ]
+
+    def getVector(self, i, out=None):
+        """ Return vector i as a Vector object (written into out, if given) """
+        if out is None:
+            out = Vector()
+
+        if self.isNumpy:
+            row = self.data[i]
+            out.v[0] = float(row[0])
+            out.v[1] = float(row[1])
+            out.v[2] = float(row[2])
+            out.v[3] = float(row[3])
+        else:
+            base = 4 * i
+            out.v[0:4] = self.data[base:base + 4].tolist()
+        return out
+
+    def setVector(self, i, v):
+        """ Copy the components of Vector (or any 4-item indexable) v into slot i """
+        if self.isNumpy:
+            self.data[i] = (v[0], v[1], v[2], v[3])
+        else:
+            base = 4 * i
+            self.data[base]     = v[0]
+            self.data[base + 1] = v[1]
+            self.data[base + 2] = v[2]
+            self.data[base + 3] = v[3]
+
+    def __len__(self):
+        return self.n
+
+    def __str__(self):
+        return "VectorBatch(n={}, numpy={})".format(self.n, self.isNumpy)
+
+## ======================
+
+def _getOut(a, out):
+    """ Return out if given, otherwise allocate a batch with the same size and storage as a """
+    if out is None:
+        return VectorBatch(a.n, a.isNumpy)
+    return out
+
+def _column(batch, c):
+    """ Return column c (0 = x, 1 = y, 2 = z, 3 = w) of a pure-Python batch, as an array('d') """
+    return batch.data[c::4]
+
+def _zeroW(out):
+    if out.isNumpy:
+        out.data[:, 3] = 0.0
+    else:
+        out.data[3::4] = array('d', [0.0]) * out.n
+
+def vbScale(a, k, scale_w=False):
+    """ Scale every vector in batch a by k, in-place """
+    k = float(k)
+    if a.isNumpy:
+        if scale_w:
+            a.data *= k
+        else:
+            a.data[:, :3] *= k
+    else:
+        mul = operator.mul
+        for c in range(0, 4 if scale_w else 3):
+            a.data[c::4] = array('d', map(mul, _column(a, c), [k] * a.n))
+
+def vbLength(a, out=None):
+    """ Return the length of every vector in batch a
+
+        The result is an array('d') of a.n lengths (or a 1-D numpy array, for NumPy-backed batches). If out is
+        given, it must be a buffer of the right type and size, and the lengths are written into it
+    """
+    if a.isNumpy:
+        if out is None:
+            out = numpy.empty(a.n)
+        numpy.sqrt(numpy.einsum('ij,ij->i', a.data[:, :3], a.data[:, :3]), out=out)
+        return out
+
+    lengths = array('d', map(math.sqrt, vbDot(a, a)))
+    if out is None:
+        return lengths
+    out[:] = lengths
+    return out
+
+def vbNormalize(a):
+    """ Normalize every vector in batch a, in-place
+
+        Like vNormalize, a zero-length vector raises ZeroDivisionError
+    """
+    if a.isNumpy:
+        lengths = vbLength(a)
+        if not lengths.all():
+            raise ZeroDivisionError("vbNormalize: cannot normalize a zero-length vector")
+        a.data[:, :3] /= lengths[:, numpy.newaxis]
+    else:
+        invLengths = array('d', map(operator.truediv, [1.0] * a.n, vbLength(a)))
+        mul = operator.mul
+        for c in range(0, 3):
+            a.data[c::4] = array('d', map(mul, _column(a, c), invLengths))
+
+def vbAdd(a, b, out=None):
+    """ Return a VectorBatch holding a[i] + b[i] for every i (written into out, if given) """
+    out = _getOut(a, out)
+    if a.isNumpy:
+        numpy.add(a.data[:, :3], b.data[:, :3], out=out.data[:, :3])
+    else:
+        add = operator.add
+        for c in range(0, 3):
+            out.data[c::4] = array('d', map(add, _column(a, c), _column(b, c)))
+    _zeroW(out)
+    return out
+
+def vbSub(a, b, out=None):
+    """ Return a VectorBatch holding a[i] - b[i] for every i (written into out, if given) """
+    out = _getOut(a, out)
+    if a.isNumpy:
+        numpy.subtract(a.data[:, :3], b.data[:, :3], out=out.data[:, :3])
+    else:
+        sub = operator.sub
+        for c in range(0, 3):
+            out.data[c::4] = array('d', map(sub, _column(a, c), _column(b, c)))
+    _zeroW(out)
+    return out
+
+def vbDot(a, b, out=None):
+    """ Return the dot product a[i] . b[i] for every i
+
+        The result is an array('d') of a.n values (or a 1-D numpy array, for NumPy-backed batches)
+    """
+    if a.isNumpy:
+        if out is None:
+            out = numpy.empty(a.n)
+        out[:] = numpy.einsum('ij,ij->i', a.data[:, :3], b.data[:, :3])
+        return out
+
+    add = operator.add
+    mul = operator.mul
+    dots = array('d', map(add, map(add, map(mul, _column(a, 0), _column(b, 0)),
+                                        map(mul, _column(a, 1), _column(b, 1))),
+                                        map(mul, _column(a, 2), _column(b, 2))))
+    if out is None:
+        return dots
+    out[:] = dots
+    return out
+
+def vbCross(a, b, out=None):
+    """ Return a VectorBatch holding the cross product a[i] x b[i] for every i (written into out, if given)
+
+        out may be the same batch as a or b
+    """
+    out = _getOut(a, out)
+    if a.isNumpy:
+        out.data[:, :3] = numpy.cross(a.data[:, :3], b.data[:, :3])
+    else:
+        sub = operator.sub
+        mul = operator.mul
+        ax, ay, az = _column(a, 0), _column(a, 1), _column(a, 2)
+        bx, by, bz = _column(b, 0), _column(b, 1), _column(b, 2)
+
+        # Compute all 3 columns before writing any of them, so that out can alias a or b
+        cx = array('d', map(sub, map(mul, ay, bz), map(mul, by, az)))
+        cy = array('d', map(sub, map(mul, az, bx), map(mul, bz, ax)))
+        cz = array('d', map(sub, map(mul, ax, by), map(mul, bx, ay)))
+
+        out.data[0::4] = cx
+        out.data[1::4] = cy
+        out.data[2::4] = cz
+    _zeroW(out)
+    return out
+
+def vbBounds(a):
+    """ Return the bounds of all the points in batch a, as ((xmin, ymin, zmin), (xmax, ymax, zmax))
+
+        a must not be empty. The w components are ignored
+    """
+    if a.isNumpy:
+        mn = a.data[:, :3].min(axis=0)
+        mx = a.data[:, :3].max(axis=0)
+        return (float(mn[0]), float(mn[1]), float(mn[2])), (float(mx[0]), float(mx[1]), float(mx[2]))
+
+    xs = _column(a, 0)
+    ys = _column(a, 1)
+    zs = _column(a, 2)
+    return (min(xs), min(ys), min(zs)), (max(xs), max(ys), max(zs))